@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from formula import parse_formula, FormulaSyntaxError
+from proofRules import ProofChecker, install_rules, proof_concludes
+from ruleSchemas import RuleSchemaError, load_rule_set
+
+
+# Input format, one JSON object per line:
+#   {"id": "s1", "premises": ["p ∧ q"], "conclusion": "q ∧ p",
+#    "lines": [{"line_dep": "1", "step": "q", "rule": "1 ∧E"}, ...]}
+# Premises become lines 1..n exactly as in the interactive tutor, and "lines" continue the
+# numbering from n+1. Output is one JSON object per submission, in input order. A line that
+# cites its lines correctly but is rejected also gets "rests_on" (the premise and assumption
+# lines it would depend on) and "counterexample": an assignment such as {"p": true, "q": false}
+# making those lines true and the step false, or null when the step does follow from them.
+# Input that cannot be graded gets {"id": ..., "lines": [], "complete": false, "error": "..."}.
+
+
+def grade_proof(submission):
+    # Grade one decoded submission and return its per-line verdicts. A submission whose fields
+    # are malformed gets an error record instead of stopping the batch.
+    result = {'id': submission.get('id'), 'lines': [], 'complete': False}
+    try:
+        return grade_fields(submission, result)
+    except (KeyError, TypeError, ValueError) as e:
+        return error_record(result['id'], f"Malformed submission: {e!r}")
+
+
+def error_record(submission_id, message):
+    # Result for a submission that could not be graded, with the same keys as any other result
+    return {'id': submission_id, 'lines': [], 'complete': False, 'error': message}
+
+
+def submission_error(submission):
+    # Message for a submission whose premises, conclusion or lines have the wrong shape, or None
+    premises = submission.get('premises', [])
+    if not isinstance(premises, str) and not (isinstance(premises, list) and all(isinstance(premise, str) for premise in premises)):
+        return "Premises must be a list of formulas or one comma-separated string."
+    if 'conclusion' not in submission:
+        return "Submission has no conclusion."
+    if not isinstance(submission['conclusion'], str):
+        return "The conclusion must be a formula."
+    if not isinstance(submission.get('lines', []), list):
+        return "Lines must be a list."
+    return None
+
+
+def grade_fields(submission, result):
+    error = submission_error(submission)
+    if error is not None:
+        result['error'] = error
+        return result
+    premises = submission.get('premises', [])
+    if isinstance(premises, str):
+        premises = [premise.strip() for premise in premises.split(',')]
+
+    checker = ProofChecker()
+    proof_steps = checker.proof_steps
+    try:
+        for line_number, premise in enumerate(premises, start=1):
+            checker.add_line(line_number, 'Premise', parse_formula(premise))
+        conclusion = parse_formula(submission['conclusion'])
+    except FormulaSyntaxError as e:
+        result['error'] = f"Invalid syntax in problem: {e}"
+        return result
+
+    all_lines_valid = True
+    line_number = len(proof_steps)
+    for line in submission.get('lines', []):
+        line_number += 1
+        if not isinstance(line, dict) or not isinstance(line.get('step'), str):
+            # Like an unparsable line, it is not stored and the rest of the proof is still graded
+            result['lines'].append({'line': line_number, 'ok': False, 'message': "Line has no step formula."})
+            all_lines_valid = False
+            continue
+        try:
+            proof_step = parse_formula(line['step'])
+        except FormulaSyntaxError as e:
+            # An unparsable line is not stored, so later references to it are reported as missing
+            result['lines'].append({'line': line_number, 'ok': False, 'message': f"Invalid syntax. {e}"})
+            all_lines_valid = False
+            continue
+
+        rule_applied = str(line.get('rule') or 'None').strip()
+        ok, message = checker.check(proof_step, rule_applied)
+        verdict = {'line': line_number, 'ok': ok, 'message': message}
+        if not ok:
+            checked = checker.counterexample(proof_step, rule_applied)
+            if checked is not None:
+                verdict['rests_on'], verdict['counterexample'] = checked
+        # Rejected lines are still recorded so the submission's own numbering is kept
+        checker.add_line(line_number, str(line.get('line_dep', '')), proof_step, rule_applied)
+        result['lines'].append(verdict)
+        all_lines_valid = all_lines_valid and ok
+
+    # The last line must be the conclusion and rest on the premises alone
+    result['complete'] = (all_lines_valid and proof_concludes(proof_steps, conclusion)
+                          and not checker.undischarged(line_number, len(premises)))
+    return result
+
+
+def grade_line(text):
+    # Decode and grade one input line; malformed input becomes an error record
+    try:
+        submission = json.loads(text)
+    except json.JSONDecodeError as e:
+        return error_record(None, f"Invalid JSON: {e}")
+    if not isinstance(submission, dict):
+        return error_record(None, "Expected a JSON object per line.")
+    return grade_proof(submission)
+
+
+def grade_chunk(texts):
+    # Worker entry point: grade a batch of raw input lines
+    return [grade_line(text) for text in texts]
+
+
+def read_submissions(paths):
+    # Yield the non-empty input lines of every file in order; '-' or no paths reads stdin
+    for path in paths or ['-']:
+        handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for text in handle:
+                if text.strip():
+                    yield text
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def chunked(texts, chunksize):
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def grade_stream(texts, workers=None, chunksize=64, rule_set=None):
+    # Yield graded results in input order. Submissions are sent to a process pool in chunks,
+    # with a bounded number of chunks in flight so memory stays flat on very large inputs.
+    # rule_set (see ruleSchemas.load_rule_set) is installed here and in every worker.
+    if rule_set is not None:
+        install_rules(rule_set)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for text in texts:
+            yield grade_line(text)
+        return
+
+    initializer, initargs = (install_rules, (rule_set,)) if rule_set is not None else (None, ())
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        in_flight = deque()
+        for chunk in chunked(texts, chunksize):
+            in_flight.append(executor.submit(grade_chunk, chunk))
+            if len(in_flight) >= workers * 2:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade natural-deduction proofs without the interactive tutor.")
+    parser.add_argument("inputs", nargs="*", help="JSON-lines files of submissions ('-' or nothing reads stdin).")
+    parser.add_argument("-o", "--output", help="Write results here instead of stdout.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--chunksize", type=int, default=64, help="Submissions sent to a worker at a time.")
+    parser.add_argument("--rules", help="JSON rule set adding, replacing or removing rules (see ruleSchemas.py).")
+    args = parser.parse_args(argv)
+
+    rule_set = None
+    if args.rules:
+        try:
+            rule_set = load_rule_set(args.rules)
+            install_rules(rule_set)
+        except (OSError, RuleSchemaError) as e:
+            parser.error(f"cannot use the rule set: {e}")
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    graded = complete = errors = 0
+    try:
+        for result in grade_stream(read_submissions(args.inputs), args.workers, args.chunksize, rule_set):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            graded += 1
+            complete += bool(result.get('complete'))
+            errors += 'error' in result
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"Graded {graded} proofs: {complete} complete, {errors} could not be read.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+import threading
+from functools import lru_cache
+
+from formula import VAR, NOT, AND, OR, IMPLIES, XOR, IFF, as_formula, conjuncts
+from truthTable import variables_of
+
+
+FALSE = 0
+TRUE = 1
+# Slots in the computed table; a colliding entry overwrites the old one
+CACHE_SIZE = 1 << 16
+# Nodes one manager may hold before giving up (see BDDSizeError)
+MAX_NODES = 200000
+# Nodes a manager may hold before its first collection (see BDD.tidy)
+COLLECT_MIN_NODES = 10000
+# Sequents whose BDDs are kept for later queries
+SEQUENT_CACHE_SIZE = 64
+# Most rounds of the variable ordering heuristic
+ORDER_ITERATIONS = 20
+
+TERMINAL_LEVEL = 1 << 30  # below every variable
+COMMUTATIVE = frozenset((AND, OR, XOR, IFF))
+
+
+class BDDSizeError(ValueError):
+    # The formulas need more than max_nodes nodes under the chosen variable order
+    pass
+
+
+class BDD:
+    # Reduced ordered binary decision diagrams over a growing list of variables. Nodes are ints:
+    # 0 and 1 are the constants, and every other node n tests the variable at levels[n] with
+    # children lows[n] (variable false) and highs[n] (variable true). The unique table
+    # returns the existing node for a (level, low, high) triple, so each function has exactly
+    # one node and equivalence is an int comparison. apply() results are memoised in a
+    # fixed-size computed table where a new entry evicts whatever was in its slot.
+    # Nodes nothing refers to any more are reclaimed by collect(); the owner keeps the nodes
+    # it still needs in pinned, whose values are renumbered in place.
+    def __init__(self, order=(), cache_size=CACHE_SIZE, max_nodes=MAX_NODES):
+        self.levels = [TERMINAL_LEVEL, TERMINAL_LEVEL]
+        self.lows = [FALSE, TRUE]
+        self.highs = [FALSE, TRUE]
+        self.unique = {}  # (level, low, high) -> node
+        self.cache = [None] * cache_size  # slot -> (op, u, v, result)
+        self.cache_mask = cache_size - 1
+        self.max_nodes = max_nodes
+        self.names = []  # level -> variable name
+        self.variables = {}  # variable name -> its single-variable node
+        self.built = {}  # formula node -> BDD node
+        self.pinned = {}  # owner's key -> node kept by every collection
+        self.collect_at = COLLECT_MIN_NODES
+        for name in order:
+            self.variable(name)
+
+    def variable(self, name):
+        # Node of a variable; names not in the order yet are placed below all others
+        node = self.variables.get(name)
+        if node is None:
+            self.names.append(name)
+            node = self.variables[name] = self.node(len(self.names) - 1, FALSE, TRUE)
+        return node
+
+    def node(self, level, low, high):
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = len(self.lows)
+            if node >= self.max_nodes:
+                raise BDDSizeError(f"More than {self.max_nodes} BDD nodes are needed.")
+            self.levels.append(level)
+            self.lows.append(low)
+            self.highs.append(high)
+            self.unique[key] = node
+        return node
+
+    def apply(self, op, u, v):
+        # Node of (u op v) for a binary connective. Pairs of nodes still to combine are kept on
+        # an explicit stack, so the depth of the diagrams is not limited by Python's recursion.
+        # A pair is pushed again as (-1, u, v, level, slot) to build its node once the results
+        # of both halves are on the results stack.
+        levels, lows, highs = self.levels, self.lows, self.highs
+        unique, cache, cache_mask = self.unique, self.cache, self.cache_mask
+        commutative = op in COMMUTATIVE
+        results = []
+        stack = [(u, v)]
+        while stack:
+            frame = stack.pop()
+            if frame[0] >= 0:
+                u, v = frame
+                # Only a constant operand or u == v can decide the result outright
+                result = terminal_case(op, u, v) if u < 2 or v < 2 or u == v else None
+                if result is None:
+                    if commutative and u > v:
+                        u, v = v, u
+                    slot = hash((op, u, v)) & cache_mask
+                    entry = cache[slot]
+                    if entry is not None and entry[0] == op and entry[1] == u and entry[2] == v:
+                        result = entry[3]
+                    else:
+                        u_level, v_level = levels[u], levels[v]
+                        if u_level == v_level:
+                            stack += ((-1, u, v, u_level, slot), (highs[u], highs[v]), (lows[u], lows[v]))
+                        elif u_level < v_level:
+                            stack += ((-1, u, v, u_level, slot), (highs[u], v), (lows[u], v))
+                        else:
+                            stack += ((-1, u, v, v_level, slot), (u, highs[v]), (u, lows[v]))
+                        continue
+                results.append(result)
+            else:
+                _, u, v, level, slot = frame
+                high = results.pop()
+                low = results.pop()
+                if low == high:
+                    result = low
+                else:
+                    result = unique.get((level, low, high))
+                    if result is None:
+                        result = self.node(level, low, high)
+                cache[slot] = (op, u, v, result)
+                results.append(result)
+        return results[0]
+
+    def negate(self, u):
+        return self.apply(XOR, u, TRUE)
+
+    def build(self, formula):
+        # Node of a formula, building its sub-formulas bottom-up without recursion. Results are
+        # kept per interned formula node, so asking again for a formula costs one lookup.
+        built = self.built
+        stack = [as_formula(formula)]
+        root = stack[0]
+        while stack:
+            if len(self.lows) >= self.collect_at:
+                # Only the built children of formulas still on the stack are needed from here
+                self.tidy([built[child] for pending in stack for child in pending.args
+                           if pending.op != VAR and child in built])
+                built = self.built
+            formula = stack[-1]
+            if formula in built:
+                stack.pop()
+            elif formula.op == VAR:
+                built[formula] = self.variable(formula.name)
+                stack.pop()
+            else:
+                pending = [child for child in formula.args if child not in built]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                if formula.op == NOT:
+                    built[formula] = self.negate(built[formula.operand])
+                else:
+                    built[formula] = self.apply(formula.op, built[formula.left], built[formula.right])
+                stack.pop()
+        return built[root]
+
+    def satisfying_assignment(self, u, names):
+        # Assignment over names (variable name -> bool) under which u is true, or None if u is
+        # false; variables the path does not test are false
+        if u == FALSE:
+            return None
+        assignment = dict.fromkeys(names, False)
+        while u != TRUE:
+            name = self.names[self.levels[u]]
+            if self.lows[u] != FALSE:
+                assignment[name] = False
+                u = self.lows[u]
+            else:
+                assignment[name] = True
+                u = self.highs[u]
+        return assignment
+
+    def size(self):
+        return len(self.lows)
+
+    def collect(self, roots=()):
+        # Drop every node that is not reachable from roots, pinned or a variable, renumbering
+        # the rest, and return roots renumbered. Intermediate results (each partial premise
+        # conjunction, say) would otherwise stay in the unique table for good. Children are
+        # always created before their parents, so one pass in node order renumbers children
+        # before they are needed. Memoised formulas whose nodes are dropped are forgotten and
+        # the computed table is cleared, so no stale node number survives.
+        lows, highs = self.lows, self.highs
+        live = bytearray(len(lows))
+        live[FALSE] = live[TRUE] = 1
+        stack = [*roots, *self.pinned.values(), *self.variables.values()]
+        while stack:
+            node = stack.pop()
+            if not live[node]:
+                live[node] = 1
+                stack.append(lows[node])
+                stack.append(highs[node])
+        renumbered = [FALSE, TRUE] + [0] * (len(lows) - 2)
+        levels, kept_lows, kept_highs = self.levels[:2], lows[:2], highs[:2]
+        unique = {}
+        for node in range(2, len(lows)):
+            if live[node]:
+                renumbered[node] = len(levels)
+                key = (self.levels[node], renumbered[lows[node]], renumbered[highs[node]])
+                levels.append(key[0])
+                kept_lows.append(key[1])
+                kept_highs.append(key[2])
+                unique[key] = renumbered[node]
+        self.levels, self.lows, self.highs, self.unique = levels, kept_lows, kept_highs, unique
+        self.variables = {name: renumbered[node] for name, node in self.variables.items()}
+        self.built = {formula: renumbered[node] for formula, node in self.built.items() if live[node]}
+        for key, node in self.pinned.items():
+            self.pinned[key] = renumbered[node]
+        self.cache = [None] * len(self.cache)
+        return [renumbered[root] for root in roots]
+
+    def tidy(self, roots=()):
+        # collect() once the table has doubled since the last collection (or since it was
+        # created), so collecting costs amortised constant time per node. Near max_nodes the
+        # threshold only closes half the remaining gap, so BDDSizeError is about live nodes
+        # rather than garbage left over from earlier operations.
+        if len(self.lows) < self.collect_at:
+            return list(roots)
+        roots = self.collect(roots)
+        size = len(self.lows)
+        self.collect_at = max(COLLECT_MIN_NODES, min(2 * size, (size + self.max_nodes) // 2))
+        return roots
+
+
+def terminal_case(op, u, v):
+    # Result of (u op v) when a constant operand or u == v decides it, else None
+    if op == AND:
+        if u == FALSE or v == FALSE:
+            return FALSE
+        if u == TRUE or u == v:
+            return v
+        if v == TRUE:
+            return u
+    elif op == OR:
+        if u == TRUE or v == TRUE:
+            return TRUE
+        if u == FALSE or u == v:
+            return v
+        if v == FALSE:
+            return u
+    elif op == XOR:
+        if u == v:
+            return FALSE
+        if u == FALSE:
+            return v
+        if v == FALSE:
+            return u
+    elif op == IFF:
+        if u == v:
+            return TRUE
+        if u == TRUE:
+            return v
+        if v == TRUE:
+            return u
+    elif op == IMPLIES:
+        if u == FALSE or v == TRUE or u == v:
+            return TRUE
+        if u == TRUE:
+            return v
+    return None
+
+
+def variable_order(formulas, iterations=ORDER_ITERATIONS):
+    # Ordering heuristic (FORCE): every conjunct of the formulas is a group of variables that
+    # should sit close together in the order. Starting from the order of first appearance,
+    # each variable is moved to the average centre of the groups it belongs to and the
+    # variables are re-sorted, until the order settles. Chains such as p → q, q → r, ... end
+    # up in chain order however the premises are listed, which keeps their BDDs linear.
+    order = variables_of(formulas)
+    groups = []
+    for formula in formulas:
+        for part in conjuncts(as_formula(formula)):
+            names = variables_of([part])
+            if names:
+                groups.append(names)
+    member_of = {name: [] for name in order}
+    for index, names in enumerate(groups):
+        for name in names:
+            member_of[name].append(index)
+    for _ in range(iterations):
+        position = {name: index for index, name in enumerate(order)}
+        centres = [sum(position[name] for name in names) / len(names) for names in groups]
+        moved = sorted(order, key=lambda name: (
+            sum(centres[index] for index in member_of[name]) / len(member_of[name]), position[name]))
+        if moved == order:
+            break
+        order = moved
+    return order
+
+
+class SequentBDD:
+    # The BDDs of one problem, built over a manager ordered for its formulas. The conjunction
+    # of the premises and the goal are built once, pinned in the manager and shared by every
+    # later query against the problem, so asking whether a step is equivalent to the goal only
+    # builds that step (once) and compares two ints. Intermediate results are collected as the
+    # manager grows, so long chains of premises and many queries do not fill it with garbage.
+    # Safe to share between sessions on different threads.
+    def __init__(self, premises, conclusion):
+        self.premises = tuple(as_formula(premise) for premise in premises)
+        self.conclusion = as_formula(conclusion)
+        self.names = variables_of(self.premises + (self.conclusion,))
+        self.bdd = BDD(variable_order(self.premises + (self.conclusion,)))
+        self.lock = threading.Lock()
+        self.too_big = {}  # 'premises' or 'goal' -> message of the BDDSizeError building it raised
+
+    def premises_node(self):
+        # Node numbers change when the manager is collected, so callers read it again after
+        # any later build(). The premises are conjoined in pairs, then pairs of pairs and so
+        # on: conjoining a long chain one premise at a time walks the whole conjunction so far
+        # for every premise, while the partial conjunctions of neighbouring premises stay small.
+        bdd, pinned = self.bdd, self.bdd.pinned
+        if 'premises' not in pinned:
+            self.check_size('premises')
+            try:
+                count = len(self.premises)
+                for index, premise in enumerate(self.premises):
+                    pinned[('part', index)] = bdd.build(premise)
+                while count > 1:
+                    for index in range(0, count, 2):
+                        left = pinned.pop(('part', index))
+                        right = pinned.pop(('part', index + 1), TRUE)
+                        pinned[('part', index // 2)] = bdd.apply(AND, left, right)
+                        bdd.tidy()
+                    count = (count + 1) // 2
+                pinned['premises'] = pinned.pop(('part', 0), TRUE)
+            except BDDSizeError as error:
+                self.give_up('premises', error)
+                raise
+        return pinned['premises']
+
+    def goal(self):
+        pinned = self.bdd.pinned
+        if 'goal' not in pinned:
+            self.check_size('goal')
+            try:
+                pinned['goal'] = self.bdd.build(self.conclusion)
+            except BDDSizeError as error:
+                self.give_up('goal', error)
+                raise
+        return pinned['goal']
+
+    def check_size(self, part):
+        # Fail straight away if building part already ran out of nodes, so callers go to the
+        # SAT solver without redoing the build that failed
+        if part in self.too_big:
+            raise BDDSizeError(self.too_big[part])
+
+    def give_up(self, part, error):
+        # Unpin the partial conjunctions and reclaim every node of the failed build, which
+        # later collections would otherwise keep alive for as long as the sequent is cached
+        pinned = self.bdd.pinned
+        for key in [key for key in pinned if type(key) is tuple]:
+            del pinned[key]
+        self.bdd.collect()
+        self.too_big[part] = str(error)
+
+    def entailed(self):
+        # Same contract as truthTable.entails: (True, None) if the premises entail the
+        # conclusion, otherwise (False, assignment) with a counterexample
+        with self.lock:
+            bdd = self.bdd
+            self.premises_node()
+            goal = self.goal()
+            counterexample = bdd.apply(AND, self.premises_node(), bdd.negate(goal))
+            assignment = bdd.satisfying_assignment(counterexample, self.names)
+            bdd.tidy()
+        return assignment is None, assignment
+
+    def equivalent_to_goal(self, formula):
+        with self.lock:
+            self.goal()
+            return self.bdd.build(formula) == self.bdd.pinned['goal']
+
+
+@lru_cache(maxsize=SEQUENT_CACHE_SIZE)
+def sequent_bdd(premises, conclusion):
+    # Shared SequentBDD of a problem; premises is a tuple of formula nodes
+    return SequentBDD(premises, conclusion)
+
+
+def entails(premises, conclusion):
+    # truthTable.entails without the variable limit; raises BDDSizeError if the BDDs get too big
+    return sequent_bdd(tuple(as_formula(premise) for premise in premises), as_formula(conclusion)).entailed()
+
+
+def equivalent_to(conclusion, formula, premises=()):
+    # Is formula logically equivalent to conclusion? Queries go through the SequentBDD of the
+    # problem (premises ⊢ conclusion), so every step of a proof reuses the goal's BDD and the
+    # manager that the problem's entailment check built. Raises BDDSizeError if the BDDs get
+    # too big.
+    premises = tuple(as_formula(premise) for premise in premises) if premises else ()
+    return sequent_bdd(premises, as_formula(conclusion)).equivalent_to_goal(formula)
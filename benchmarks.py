@@ -0,0 +1,315 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from formula import Var, Not, And, Or, Implies, Xor, Iff, parse_formula
+from proofRules import ProofLine, ProofRules, ruleChecker
+from hints import Hints
+import satSolver
+import bdd
+from logicTutor import LogicProofTutor, ConsoleIO, shared_problem
+
+
+# Stored baseline and default results file, kept next to this script
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results.json")
+# A case regresses when it is this much slower than its baseline
+DEFAULT_THRESHOLD = 0.25
+# Each timing repeat runs a case for at least this long
+MIN_REPEAT_SECONDS = 0.05
+
+# Workload sizes
+FORMULA_DEPTHS = (2, 4, 8, 12)
+PROOF_LENGTHS = (10, 100, 1000)
+RULE_FORMULA_DEPTH = 6
+HINT_VARIABLES = (2, 4, 8)
+SAT_VARIABLES = (12, 24, 48)
+SESSION_LINES = (0, 5, 30)
+# Sessions held at once when measuring bytes per session
+SESSION_COUNT = 300
+
+
+class QuietIO(ConsoleIO):
+    # Swallows the tutor's messages so they do not distort the timings
+    def show(self, text):
+        pass
+
+
+def balanced_formula(depth, names=("p", "q", "a")):
+    # Complete binary formula of the given depth, built bottom-up: levels alternate ∧, ∨ and →
+    # and every third level is negated
+    level = [Var(names[index % len(names)]) for index in range(2 ** depth)]
+    connectives = (And, Or, Implies)
+    height = 0
+    while len(level) > 1:
+        connective = connectives[height % len(connectives)]
+        level = [connective(level[index], level[index + 1]) for index in range(0, len(level), 2)]
+        height += 1
+        if height % 3 == 0:
+            level = [Not(node) for node in level]
+    return level[0]
+
+
+def proof_with(lines, length):
+    # Proof steps of the given length ending with `lines`, (line_dep, formula) pairs, after filler premises
+    proof_steps = {}
+    filler = length - len(lines)
+    for line_number in range(1, filler + 1):
+        proof_steps[line_number] = ProofLine('Premise', Var("p"))
+    for offset, (line_dep, formula) in enumerate(lines, start=1):
+        proof_steps[filler + offset] = ProofLine(line_dep, formula)
+    return proof_steps, filler
+
+
+def rule_workload(rule, length):
+    # (proof_step, rule_applied, proof_steps) for a valid application of rule at the end of a proof
+    a = balanced_formula(RULE_FORMULA_DEPTH)
+    b = balanced_formula(RULE_FORMULA_DEPTH, ("q", "a", "p"))
+    c = balanced_formula(RULE_FORMULA_DEPTH, ("a", "p", "q"))
+    cases = {
+        "∧I": ([('1', a), ('1', b)], And(a, b), "{0},{1} ∧I"),
+        "∧E": ([('1', And(a, b))], a, "{0} ∧E"),
+        "∨I": ([('1', a)], Or(a, b), "{0} ∨I"),
+        "∨E": ([('1', Or(a, b)), ('Premise', a), ('2', c), ('Premise', b), ('4', c)], c, "{0},{1},{2},{3},{4} ∨E"),
+        "→I": ([('Premise', a), ('1', b)], Implies(a, b), "{0},{1} →I"),
+        "→E": ([('1', Implies(a, b)), ('1', a)], b, "{0},{1} →E"),
+        "¬I": ([('Premise', a), ('1', Not(a))], Not(a), "{0},{1} ¬I"),
+        "¬E": ([('1', Not(Not(a)))], a, "{0} ¬E"),
+        "↔I": ([('1', Implies(a, b)), ('1', Implies(b, a))], Iff(a, b), "{0},{1} ↔I"),
+        "⊕E": ([('1', Xor(a, b)), ('1', Not(b))], a, "{1},{0} ⊕E"),
+        "MT": ([('1', Implies(a, b)), ('1', Not(b))], Not(a), "{0},{1} MT"),
+        "DS": ([('1', Or(a, b)), ('1', Not(a))], b, "{0},{1} DS"),
+    }
+    lines, proof_step, template = cases[rule]
+    proof_steps, filler = proof_with(lines, length)
+    rule_applied = template.format(*range(filler + 1, filler + 1 + len(lines)))
+    return proof_step, rule_applied, proof_steps
+
+
+def chain_problem(count):
+    # p1 → p2, ..., p(n-1) → pn ⊢ p1 → pn over `count` variables
+    names = [f"p{index}" for index in range(1, count + 1)]
+    premises = [f"{names[index]} → {names[index + 1]}" for index in range(count - 1)]
+    return premises, f"{names[0]} → {names[-1]}"
+
+
+def build_cases():
+    # Benchmark name -> zero-argument callable timing one operation
+    cases = {}
+    tutor = LogicProofTutor(io=QuietIO())
+    for depth in FORMULA_DEPTHS:
+        text = str(balanced_formula(depth))
+        cases[f"check_syntax/depth={depth}"] = lambda text=text: tutor.check_syntax(text)
+        cases[f"convert_to_sympy/depth={depth}"] = lambda text=text: tutor.convert_to_sympy(text)
+
+    for rule in ("∧I", "∧E", "∨I", "∨E", "→I", "→E", "¬I", "¬E", "↔I", "⊕E", "MT", "DS"):
+        for length in PROOF_LENGTHS:
+            proof_step, rule_applied, proof_steps = rule_workload(rule, length)
+            cases[f"ruleChecker/{rule}/lines={length}"] = (
+                lambda proof_step=proof_step, rule_applied=rule_applied, proof_steps=proof_steps:
+                ruleChecker(proof_step, rule_applied, proof_steps, cache=None)
+            )
+
+    for depth in FORMULA_DEPTHS:
+        # Contradiction hidden at the far ends of a long conjunction chain
+        chain = Var("p")
+        for _ in range(2 ** depth):
+            chain = And(chain, Var("q"))
+        rules = ProofRules({1: ProofLine('Premise', Var("a")), 2: ProofLine('1', And(chain, Not(Var("p"))))})
+        cases[f"is_contradiction/depth={depth}"] = lambda rules=rules: rules.is_contradiction(1, 2)
+
+    for count in HINT_VARIABLES:
+        premises, conclusion = chain_problem(count)
+        checker = LogicProofTutor(io=QuietIO()).checker
+        for line_number, premise in enumerate(premises, start=1):
+            checker.add_line(line_number, 'Premise', premise)
+
+        def hints(premises=premises, conclusion=conclusion, checker=checker):
+            return Hints(premises, conclusion, checker, store=False)
+
+        def low_level(hints=hints):
+            clear_proof_caches()
+            return hints().get_low_level_hint()
+
+        def high_level(hints=hints):
+            clear_proof_caches()
+            return hints().get_high_level_hint()
+
+        cases[f"hints/construct/vars={count}"] = hints
+        cases[f"hints/low_level/vars={count}"] = low_level
+        cases[f"hints/high_level/vars={count}"] = high_level
+
+    for count in SAT_VARIABLES:
+        # Past MAX_VARIABLES a truth table is refused; the SAT solver has to refute the negation
+        premises, conclusion = chain_problem(count)
+        premises = [parse_formula(premise) for premise in premises]
+        conclusion = parse_formula(conclusion)
+
+        def sat_entails(premises=premises, conclusion=conclusion):
+            satSolver._satisfying_assignment.cache_clear()
+            return satSolver.entails(premises, conclusion)
+
+        def bdd_entails(premises=tuple(premises), conclusion=conclusion):
+            bdd.sequent_bdd.cache_clear()
+            return bdd.entails(premises, conclusion)
+
+        cases[f"sat_entails/vars={count}"] = sat_entails
+        cases[f"bdd_entails/vars={count}"] = bdd_entails
+        # After the first call the goal's BDD is kept, so this times a lookup and a comparison
+        cases[f"bdd_equivalent_to_goal/vars={count}"] = lambda conclusion=conclusion: bdd.equivalent_to(conclusion, conclusion)
+    return cases
+
+
+def open_session(length):
+    # Tutor session on a fixed problem with `length` ∧E steps after its premises, in the state
+    # run_tutor and get_user_input leave it in
+    tutor = LogicProofTutor(io=QuietIO())
+    tutor.problem = shared_problem(("p ∧ q", "q → a"), "a ∧ p")
+    tutor.initialize_proof_with_premises()
+    for line_number in range(3, length + 3):
+        tutor.checker.add_line(line_number, '1', parse_formula("p"), "1 ∧E")
+    tutor.reset_hints()
+    return tutor
+
+
+def session_bytes(length, sessions=SESSION_COUNT):
+    # Heap bytes each open session holds, beyond what all sessions share (formula nodes,
+    # interned texts, the problem)
+    held = [open_session(length)]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        held += [open_session(length) for _ in range(sessions)]
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) // sessions
+
+
+def clear_proof_caches():
+    # Hint timings include the proof search, not a memoised answer
+    from prover import _prove_sequent
+    _prove_sequent.cache_clear()
+
+
+def time_case(function, repeats):
+    # Seconds per call in the fastest of `repeats` runs of at least MIN_REPEAT_SECONDS each.
+    # Slower runs measure other load on the machine, not the code.
+    function()  # warm up, and let a missing optional dependency surface here
+    timings = []
+    gc.collect()
+    gc.disable()  # as timeit does: a collection would be charged to whichever case triggers it
+    try:
+        for _ in range(repeats):
+            calls = 0
+            start = time.perf_counter()
+            elapsed = 0.0
+            while elapsed < MIN_REPEAT_SECONDS:
+                function()
+                calls += 1
+                elapsed = time.perf_counter() - start
+            timings.append(elapsed / calls)
+    finally:
+        gc.enable()
+    return min(timings)
+
+
+def run(names_filter=None, repeats=5):
+    results = {}
+    skipped = {}
+    for name, function in build_cases().items():
+        if names_filter and names_filter not in name:
+            continue
+        try:
+            results[name] = time_case(function, repeats)
+        except ImportError as e:
+            skipped[name] = f"missing dependency: {e.name}"
+    return results, skipped
+
+
+def load_json(path):
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def save_json(path, data):
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, indent=2, ensure_ascii=False)
+        handle.write("\n")
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.2f} µs"
+    return f"{seconds * 1e3:9.2f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the tutor's hot paths and compare them with the stored baseline.")
+    parser.add_argument("-k", "--filter", help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing runs per benchmark (the fastest is used).")
+    parser.add_argument("-o", "--output", default=RESULTS_FILE, help="Where to write the results (default: %(default)s).")
+    parser.add_argument("--threshold", type=float, default=None, help="Allowed slowdown before a benchmark counts as a regression (default: baseline's, else 0.25).")
+    parser.add_argument("--update", action="store_true", help="Record these results as the new baseline.")
+    parser.add_argument("--memory", action="store_true", help="Also report the bytes each open tutor session holds.")
+    args = parser.parse_args(argv)
+
+    results, skipped = run(args.filter, args.repeats)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {name: round(seconds, 9) for name, seconds in results.items()},
+        "skipped": skipped,
+    }
+    if args.memory:
+        report["session_bytes"] = {f"lines={length}": session_bytes(length) for length in SESSION_LINES}
+        for name, size in report["session_bytes"].items():
+            print(f"session/{name}  {size} bytes per session")
+    save_json(args.output, report)
+
+    baseline = load_json(BASELINE_FILE)
+    threshold = args.threshold
+    if threshold is None:
+        threshold = baseline.get("threshold", DEFAULT_THRESHOLD) if baseline else DEFAULT_THRESHOLD
+    if args.update or baseline is None:
+        # Keep baseline entries of benchmarks that were filtered out of this run
+        recorded = dict(baseline["results"]) if baseline else {}
+        recorded.update(report["results"])
+        save_json(BASELINE_FILE, {"threshold": threshold, "python": report["python"], "results": recorded})
+        print(f"Recorded {len(results)} benchmark timings as the baseline in {BASELINE_FILE}.")
+        return 0
+
+    regressions = []
+    width = max((len(name) for name in results), default=0)
+    for name, seconds in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:<{width}}  {format_time(seconds)}   (new)")
+            continue
+        ratio = seconds / previous if previous else float("inf")
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:<{width}}  {format_time(seconds)}  baseline {format_time(previous)}  x{ratio:5.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    for name, reason in skipped.items():
+        print(f"{name:<{width}}  skipped ({reason})")
+
+    print(f"Results written to {args.output}.")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline by more than {threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from formula import Var, Not, make, BINARY_OPERATORS, VAR, NOT, AND, OR, IMPLIES, XOR, IFF
+
+
+def build_random_formula(rng, depth, names=("p", "q", "a")):
+    # Random formula of at most the given depth over names, using every connective
+    if depth == 0 or rng.random() < 0.2:
+        return Var(rng.choice(names))
+    if rng.random() < 0.2:
+        return Not(build_random_formula(rng, depth - 1, names))
+    return make(rng.choice(BINARY_OPERATORS), build_random_formula(rng, depth - 1, names),
+                build_random_formula(rng, depth - 1, names))
+
+
+@pytest.fixture
+def random_formulas():
+    # random_formulas(count, depth, names) -> formulas from a fixed seed, so failures reproduce
+    rng = random.Random(2024)
+    return lambda count, depth=4, names=("p", "q", "a"): [build_random_formula(rng, depth, names) for _ in range(count)]
+
+
+def evaluate_formula(formula, assignment):
+    # Truth value of a formula under an assignment (variable name -> bool)
+    if formula.op == VAR:
+        return assignment[formula.name]
+    values = [evaluate_formula(arg, assignment) for arg in formula.args]
+    if formula.op == NOT:
+        return not values[0]
+    left, right = values
+    return {AND: left and right, OR: left or right, IMPLIES: not left or right,
+            XOR: left != right, IFF: left == right}[formula.op]
+
+
+@pytest.fixture
+def evaluate():
+    return evaluate_formula
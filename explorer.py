@@ -0,0 +1,66 @@
+from itertools import combinations
+
+from formula import AND, NOT, IMPLIES, And
+
+
+# Most consequences listed at once
+DEFAULT_LIMIT = 20
+
+
+class ConsequenceExplorer:
+    # One-step consequences of the lines of a proof: ∧E on conjunctions, ¬E on double
+    # negations and →E on implications whose antecedent is present. They are collected
+    # incrementally as lines appear, and each new line is matched through the checker's
+    # StepIndex rather than against every earlier line, so nothing is quadratic in the proof.
+    def __init__(self, checker):
+        self.checker = checker
+        self.seen = {}  # line number -> formula already processed
+        self.consequences = {}  # formula -> rule application deriving it, in discovery order
+
+    def refresh(self):
+        # Process lines added since the last call; start over if any line was removed or changed
+        proof_steps = self.checker.proof_steps
+        if any(line not in proof_steps or self.checker.line_formula(line) is not formula
+               for line, formula in self.seen.items()):
+            self.seen = {}
+            self.consequences = {}
+        for line_number in sorted(proof_steps):
+            if line_number not in self.seen:
+                self.add_line(line_number)
+
+    def add_line(self, line_number):
+        index = self.checker.index
+        formula = self.checker.line_formula(line_number)
+        self.seen[line_number] = formula
+        found = []
+        if formula.op == AND:
+            found += [(formula.left, f"{line_number} ∧E"), (formula.right, f"{line_number} ∧E")]
+        elif formula.op == NOT and formula.operand.op == NOT:
+            found.append((formula.operand.operand, f"{line_number} ¬E"))
+        elif formula.op == IMPLIES:
+            antecedent_lines = [line for line in index.by_formula.get(formula.left, ()) if line in self.seen]
+            if antecedent_lines:
+                found.append((formula.right, f"{line_number},{antecedent_lines[-1]} →E"))
+        # Implications already in the proof whose antecedent this line supplies
+        for implication_line in index.by_antecedent.get(formula, ()):
+            if implication_line in self.seen and implication_line != line_number:
+                found.append((index.by_formula_of(implication_line).right, f"{implication_line},{line_number} →E"))
+        for consequence, rule_applied in found:
+            self.consequences.setdefault(consequence, rule_applied)
+
+    def derivable(self, selected=(), limit=DEFAULT_LIMIT):
+        # Formulas one rule application away that are not in the proof yet, newest first, with
+        # the conjunctions of any selected lines (∧I) listed before them.
+        # Returns ([(formula, rule_applied), ...], number of further results left out).
+        self.refresh()
+        present = self.checker.index.by_formula
+        results = {}
+        for first, second in combinations(selected, 2):
+            left, right = self.checker.line_formula(first), self.checker.line_formula(second)
+            results.setdefault(And(left, right), f"{first},{second} ∧I")
+            results.setdefault(And(right, left), f"{second},{first} ∧I")
+        for consequence, rule_applied in reversed(self.consequences.items()):
+            if consequence not in present:
+                results.setdefault(consequence, rule_applied)
+        items = list(results.items())
+        return items[:limit], max(len(items) - limit, 0)
@@ -0,0 +1,362 @@
+import threading
+import weakref
+
+
+# Operator tags used by formula nodes. Connectives use the same symbols the student types.
+VAR = 'var'
+NOT = '¬'
+AND = '∧'
+OR = '∨'
+IMPLIES = '→'
+XOR = '⊕'
+IFF = '↔'
+BINARY_OPERATORS = (AND, OR, IMPLIES, XOR, IFF)
+# Connectives that are associative and commutative, so grouping and operand order do not matter
+AC_OPERATORS = frozenset((AND, OR, XOR, IFF))
+
+# Table of every live node keyed by (op, args). A formula only ever exists once, so two
+# equal formulas are the same object and can be compared with `is` in constant time.
+_nodes = weakref.WeakValueDictionary()
+# Guards node creation so two threads never intern two copies of the same formula.
+_nodes_lock = threading.Lock()
+
+
+class Formula:
+    # Immutable, hash-consed formula node. Create nodes through make() or the helper
+    # constructors below, never directly.
+    __slots__ = ('op', 'args', '_text', '_canonical', '__weakref__')
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Formula nodes are immutable.")
+
+    @property
+    def name(self):
+        # Variable name of an atomic formula
+        return self.args[0]
+
+    @property
+    def operand(self):
+        # Sub-formula of a negation
+        return self.args[0]
+
+    @property
+    def left(self):
+        return self.args[0]
+
+    @property
+    def right(self):
+        return self.args[1]
+
+    def is_var(self):
+        return self.op == VAR
+
+    def __str__(self):
+        text = self._text
+        if text is None:
+            text = _render(self)
+        return text
+
+    def __repr__(self):
+        return f"Formula({str(self)!r})"
+
+    def __reduce__(self):
+        # Pickling and copying rebuild the node through make(), so the copy is the interned node
+        return (make, (self.op, *self.args))
+
+
+def make(op, *args):
+    # Return the unique node for (op, args), creating it on first use
+    key = (op, args)
+    node = _nodes.get(key)
+    if node is not None:
+        return node
+    with _nodes_lock:
+        node = _nodes.get(key)
+        if node is None:
+            node = object.__new__(Formula)
+            object.__setattr__(node, 'op', op)
+            object.__setattr__(node, 'args', args)
+            object.__setattr__(node, '_text', None)
+            object.__setattr__(node, '_canonical', None)
+            _nodes[key] = node
+    return node
+
+
+def Var(name):
+    return make(VAR, name)
+
+
+def Not(operand):
+    return make(NOT, operand)
+
+
+def And(left, right):
+    return make(AND, left, right)
+
+
+def Or(left, right):
+    return make(OR, left, right)
+
+
+def Implies(left, right):
+    return make(IMPLIES, left, right)
+
+
+def Xor(left, right):
+    return make(XOR, left, right)
+
+
+def Iff(left, right):
+    return make(IFF, left, right)
+
+
+def _render(root):
+    # Build the display text of a node, bracketing any binary sub-formula. The walk emits
+    # text pieces from an explicit stack, so rendering is linear in the formula size and
+    # very deep formulas render without hitting the recursion limit.
+    pieces = []
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if item.__class__ is str:
+            pieces.append(item)
+        elif item._text is not None:
+            pieces.append(item._text)
+        elif item.op == VAR:
+            pieces.append(item.args[0])
+        elif item.op == NOT:
+            pieces.append(NOT)
+            operand = item.args[0]
+            if operand.op in BINARY_OPERATORS:
+                stack.extend((')', operand, '('))
+            else:
+                stack.append(operand)
+        else:
+            # Pushed in reverse so the left operand is emitted first
+            left, right = item.args
+            if right.op in BINARY_OPERATORS:
+                stack.extend((')', right, '('))
+            else:
+                stack.append(right)
+            stack.append(f" {item.op} ")
+            if left.op in BINARY_OPERATORS:
+                stack.extend((')', left, '('))
+            else:
+                stack.append(left)
+    text = ''.join(pieces)
+    object.__setattr__(root, '_text', text)
+    return text
+
+
+def conjuncts(node):
+    # Flatten a chain of conjunctions into its parts, e.g. (p ∧ q) ∧ a -> [p, q, a]
+    parts = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.op == AND:
+            stack.append(current.args[1])
+            stack.append(current.args[0])
+        else:
+            parts.append(current)
+    return parts
+
+
+def ac_operands(node):
+    # Maximal sub-formulas joined by node's connective, left to right: (p ∧ q) ∧ (a ∨ p) -> [p, q, a ∨ p]
+    operands = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.op == node.op:
+            stack.extend(reversed(current.args))
+        else:
+            operands.append(current)
+    return operands
+
+
+def canonical(node):
+    # Representative of node modulo associativity and commutativity of ∧, ∨, ⊕ and ↔: formulas
+    # that differ only in grouping or operand order get the identical canonical node, so they
+    # compare with `is`. Chains are flattened, their operands sorted by text and rebuilt nested
+    # to the left. The result is cached on every node visited, so repeated checks cost nothing.
+    if node._canonical is not None:
+        return node._canonical
+    stack = [node]
+    while stack:
+        current = stack[-1]
+        if current._canonical is not None:
+            stack.pop()
+            continue
+        if current.op == VAR:
+            object.__setattr__(current, '_canonical', current)
+            stack.pop()
+            continue
+        parts = ac_operands(current) if current.op in AC_OPERATORS else current.args
+        pending = [part for part in parts if part._canonical is None]
+        if pending:
+            stack.extend(pending)
+            continue
+        forms = [part._canonical for part in parts]
+        if current.op in AC_OPERATORS:
+            forms.sort(key=str)
+            result = forms[0]
+            for form in forms[1:]:
+                result = make(current.op, result, form)
+                object.__setattr__(result, '_canonical', result)
+        else:
+            result = make(current.op, *forms)
+            object.__setattr__(result, '_canonical', result)
+        object.__setattr__(current, '_canonical', result)
+        stack.pop()
+    return node._canonical
+
+
+def rename_variables(node, names):
+    # Copy of a formula with variables renamed through the names dict (missing names are kept)
+    renamed = {}
+    stack = [node]
+    while stack:
+        current = stack[-1]
+        if current in renamed:
+            stack.pop()
+        elif current.op == VAR:
+            renamed[current] = Var(names.get(current.name, current.name))
+            stack.pop()
+        else:
+            pending = [child for child in current.args if child not in renamed]
+            if pending:
+                stack.extend(pending)
+            else:
+                renamed[current] = make(current.op, *(renamed[child] for child in current.args))
+                stack.pop()
+    return renamed[node]
+
+
+# Binding strength of each binary connective; higher binds tighter. ¬ binds tighter than all of them.
+PRECEDENCE = {AND: 5, OR: 4, XOR: 3, IMPLIES: 2, IFF: 1}
+# Connectives that group to the right, e.g. p → q → a is p → (q → a)
+RIGHT_ASSOCIATIVE = {IMPLIES}
+# Every connective symbol the parser understands
+CONNECTIVES = {NOT, *BINARY_OPERATORS}
+
+# Token kinds produced by tokenize()
+TOKEN_VAR = 'var'
+TOKEN_OPERATOR = 'operator'
+TOKEN_OPEN = '('
+TOKEN_CLOSE = ')'
+
+
+class FormulaSyntaxError(ValueError):
+    # Raised for malformed formula text; position is the 0-based index of the offending character
+    def __init__(self, message, text, position):
+        super().__init__(message)
+        self.message = message
+        self.text = text
+        self.position = position
+
+    def __str__(self):
+        return f"{self.message} (at position {self.position + 1})"
+
+    def pointer(self):
+        # The formula text with a caret under the offending character
+        return f"{self.text}\n{' ' * self.position}^"
+
+
+def tokenize(text):
+    # Yield (kind, value, position) tokens in one left-to-right scan of the text.
+    # Variables are a single letter optionally followed by digits, e.g. p or p12.
+    position = 0
+    length = len(text)
+    while position < length:
+        char = text[position]
+        if char.isspace():
+            position += 1
+        elif char.isalpha():
+            start = position
+            position += 1
+            while position < length and text[position].isdigit():
+                position += 1
+            if position < length and text[position].isalpha():
+                raise FormulaSyntaxError("Consecutive letters are not allowed.", text, position)
+            yield TOKEN_VAR, text[start:position], start
+        elif char in CONNECTIVES:
+            yield TOKEN_OPERATOR, char, position
+            position += 1
+        elif char == '(' or char == ')':
+            yield char, char, position
+            position += 1
+        else:
+            raise FormulaSyntaxError(f"{char} is Invalid syntax.", text, position)
+
+
+def parse_formula(text, variables=None):
+    # Parse formula text such as "(p ∧ q) → a" into its interned node.
+    # Syntax checking and tree building happen in the same single pass over the tokens,
+    # using explicit operand/operator stacks instead of recursion so that deeply nested
+    # input cannot exhaust the Python stack. If variables is given, only those names are allowed.
+    operands = []
+    operators = []  # (symbol, position) pairs; symbol is '(', '¬' or a binary connective
+    expect_operand = True
+
+    def reduce_top():
+        op = operators.pop()[0]
+        right = operands.pop()
+        operands.append(make(op, operands.pop(), right))
+
+    def close_operand():
+        # A complete operand was just pushed; apply any negations waiting for it
+        while operators and operators[-1][0] == NOT:
+            operators.pop()
+            operands.append(Not(operands.pop()))
+
+    for kind, value, position in tokenize(text):
+        if expect_operand:
+            if kind == TOKEN_VAR:
+                if variables is not None and value not in variables:
+                    raise FormulaSyntaxError(f"{value} is not an allowed variable.", text, position)
+                operands.append(Var(value))
+                close_operand()
+                expect_operand = False
+            elif value == NOT or kind == TOKEN_OPEN:
+                operators.append((value, position))
+            elif kind == TOKEN_CLOSE:
+                raise FormulaSyntaxError("Empty brackets or missing formula before ')'.", text, position)
+            else:
+                raise FormulaSyntaxError(f"Expected a variable, '¬' or '(' before '{value}'.", text, position)
+        elif kind == TOKEN_OPERATOR and value != NOT:
+            precedence = PRECEDENCE[value]
+            while operators and operators[-1][0] in PRECEDENCE:
+                top_precedence = PRECEDENCE[operators[-1][0]]
+                if top_precedence > precedence or (top_precedence == precedence and value not in RIGHT_ASSOCIATIVE):
+                    reduce_top()
+                else:
+                    break
+            operators.append((value, position))
+            expect_operand = True
+        elif kind == TOKEN_CLOSE:
+            while operators and operators[-1][0] != '(':
+                reduce_top()
+            if not operators:
+                raise FormulaSyntaxError("Unbalanced brackets.", text, position)
+            operators.pop()
+            close_operand()
+        else:
+            raise FormulaSyntaxError(f"Missing connective before '{value}'.", text, position)
+
+    if expect_operand:
+        if not operands and not operators:
+            raise FormulaSyntaxError("Empty formula.", text, len(text))
+        raise FormulaSyntaxError("Formula ended unexpectedly.", text, len(text))
+    while operators:
+        if operators[-1][0] == '(':
+            raise FormulaSyntaxError("Unbalanced brackets.", text, operators[-1][1])
+        reduce_top()
+    return operands[0]
+
+
+def as_formula(value):
+    # Accept either a node or formula text and always return a node
+    if isinstance(value, Formula):
+        return value
+    return parse_formula(value)
@@ -1,27 +1,129 @@
+from array import array
+from functools import lru_cache
+
+from formula import Not
+from prover import next_step
+from proofRules import proof_concludes
+from metrics import instrumented
+
+
+# Position of each hint counter: one per connective the hints cycle through, then the
+# position in that cycle and the number of low- and high-level hints given
+COUNTERS = {'∧': 0, '∨': 1, '¬': 2, '→': 3, 'current': 4, 'low_level': 5, 'high_level': 6}
+
+
+@lru_cache(maxsize=4096)
+def connectives_in(conclusion):
+    # Connectives with hints in the conclusion text, shared by every session with that conclusion
+    return tuple(char for char in conclusion if char in COUNTERS)
+
+
 class Hints:
-    def __init__(self, premises, conclusion):
+    # Each session keeps one, so its state is slotted and the counters are a fixed-size array
+    __slots__ = ('premises', 'conclusion', 'checker', 'store', 'hint_counters', 'connectives_found')
+
+    @instrumented('hints_setup', "Setting up the hints for a proof")
+    def __init__(self, premises, conclusion, checker=None, store=None):
         self.premises = premises
         self.conclusion = conclusion
-        self.hint_counters = {'∧': 0, '∨': 0, '¬': 0, '→': 0, 'current': 0, 'low_level': 0, 'high_level': 0}  # Counter for each connective type
+        # ProofChecker holding the student's lines; without it only the general hints are given
+        self.checker = checker
+        # Solved-sequent store to read proofs from; None uses the shared default store and
+        # False searches for proofs without any store
+        self.store = store
+        self.hint_counters = array('I', [0]) * len(COUNTERS)  # counters indexed by COUNTERS
         self.connectives_found = self.identify_connectives_in_conclusion()
 
+    def reset(self):
+        # Start every hint cycle again, as for a new Hints
+        for position in range(len(self.hint_counters)):
+            self.hint_counters[position] = 0
    
     def identify_connectives_in_conclusion(self):
-        # Identify and return the list of unique connectives found in the conclusion
-        return [char for char in self.conclusion if char in self.hint_counters]
-
+        # Identify and return the connectives found in the conclusion
+        return connectives_in(self.conclusion) if isinstance(self.conclusion, str) else ()
+
+    def proof_plan(self):
+        # Next missing step of a proof found by the prover, matched against the lines entered
+        # so far: (node, line_refs, ancestors) from prover.next_step, 'done' when the proof
+        # already reaches the conclusion, or None when no proof was found within the search budget.
+        if self.checker is None or not self.conclusion:
+            return None
+        checker = self.checker
+        conclusion = self.conclusion if isinstance(self.conclusion, str) else self.conclusion[0]
+        # A last line matching the conclusion up to ∧/∨ grouping and order completes the proof
+        if checker.proof_steps and proof_concludes(checker.proof_steps, conclusion) \
+                and not checker.undischarged(max(checker.proof_steps), len(self.premises)):
+            return 'done'
+        # The store brings in sqlite3, so it is imported on the first hint rather than at start-up
+        from sequentStore import solved_derivation, default_store
+        store = self.store if self.store is not None else default_store()
+        if store is False:
+            store = None
+        derivation = solved_derivation(self.premises, conclusion, store)  # memoised per problem
+        if derivation is None:
+            return None
+
+        available = {}  # formula -> line numbers holding it, in ascending order
+        for line_number in sorted(self.checker.proof_steps):
+            available.setdefault(self.checker.line_formula(line_number), []).append(line_number)
+        step = next_step(derivation, available, checker.dependencies, checker.assumption_bits,
+                         checker.premise_mask(len(self.premises)))
+        return 'done' if step is None else step
+
+    def get_next_step_hint(self, plan):
+        # Concrete hint naming the next rule application and the lines it uses
+        if plan == 'done':
+            return "Your proof already derives the conclusion outside every assumption. Type 'Check' to verify it."
+        node, line_refs, ancestors = plan
+        if node.rule == 'Assume':
+            hint = f"Assume {node.formula} on a new line (enter 'Premise' as the LineDep)"
+            if ancestors and ancestors[-1].rule in ('→I', '¬I', '∨E'):
+                hint += f"; it opens the subproof for {ancestors[-1].rule} towards {ancestors[-1].formula}"
+            return hint + "."
+        refs = ",".join(str(line_ref) for line_ref in line_refs)
+        return f"Derive {node.formula} using {node.rule}: enter RuleApplied '{refs} {node.rule}'."
+
+    def get_strategy_hint(self, plan):
+        # Strategy of the nearest step above the next one that shapes the rest of the proof
+        if plan == 'done':
+            return "All the reasoning is in place. Check that the last line of your proof is the conclusion."
+        node, line_refs, ancestors = plan
+        for step in [node] + ancestors[::-1]:
+            goal = step.formula
+            if step.rule == '→I':
+                return f"To prove {goal}, assume {goal.left}, derive {goal.right} from it, then close the subproof with →I."
+            if step.rule == '¬I':
+                return f"To prove {goal}, assume {goal.operand} and derive a contradiction (a line of the form X ∧ ¬X), then use ¬I."
+            if step.rule == '∨E':
+                disjunction = step.children[0].formula
+                return f"Reason by cases on {disjunction}: derive {goal} once assuming {disjunction.left} and once assuming {disjunction.right}, then combine the cases with ∨E."
+            if step.rule == '¬E' and step.children[0].rule == '¬I':
+                return f"Argue by contradiction: assume {Not(goal)}, derive a contradiction to get {Not(Not(goal))} by ¬I, then use ¬E to reach {goal}."
+            if step.rule == '∧I':
+                return f"Prove {goal.left} and {goal.right} separately, then combine them with ∧I."
+            if step.rule == '∨I':
+                return f"It is enough to prove {step.children[0].formula} and then use ∨I to reach {goal}."
+        return f"Work forwards from the lines you have: break them apart with the elimination rules until you reach {node.formula}."
+
+    @instrumented('hint', "Producing a hint", ('level', 'low'))
     def get_low_level_hint(self):
+        plan = self.proof_plan()
+        if plan is not None:
+            self.hint_counters[COUNTERS['low_level']] += 1
+            return self.get_next_step_hint(plan)
+
         if not self.connectives_found:  # If no connectives are found, return a default hint
             return "Consider the relationships between your premises and conclusion."
 
         # Cycle through the connectives found in the conclusion, providing a hint for each
-        current_hint_index = self.hint_counters['current'] % len(self.connectives_found)
+        current_hint_index = self.hint_counters[COUNTERS['current']] % len(self.connectives_found)
         connective_for_hint = self.connectives_found[current_hint_index]
 
         # Update the counter for the next call
-        self.hint_counters['current'] += 1
+        self.hint_counters[COUNTERS['current']] += 1
         # Increment the low-level hint counter
-        self.hint_counters['low_level'] += 1
+        self.hint_counters[COUNTERS['low_level']] += 1
 
         # Dispatch to the appropriate hint method based on the connective
         return self.get_hint_for_connective(connective_for_hint)
@@ -52,10 +154,10 @@ class Hints:
         ]
 
         # Retrieve the hint based on the current counter value
-        hint = hints[self.hint_counters['∧'] % len(hints)]
+        hint = hints[self.hint_counters[COUNTERS['∧']] % len(hints)]
 
         # Increment the hint counter for conjunctions after retrieving the hint
-        self.hint_counters['∧'] += 1
+        self.hint_counters[COUNTERS['∧']] += 1
 
         return hint
 
@@ -70,10 +172,10 @@ class Hints:
         ]
 
         # Retrieve the hint based on the current counter value
-        hint = hints[self.hint_counters['∨'] % len(hints)]
+        hint = hints[self.hint_counters[COUNTERS['∨']] % len(hints)]
 
         # Increment the hint counter for conjunctions after retrieving the hint
-        self.hint_counters['∨'] += 1
+        self.hint_counters[COUNTERS['∨']] += 1
 
         return hint
     
@@ -87,10 +189,10 @@ class Hints:
         ]
 
         # Retrieve the hint based on the current counter value
-        hint = hints[self.hint_counters['¬'] % len(hints)]
+        hint = hints[self.hint_counters[COUNTERS['¬']] % len(hints)]
 
         # Increment the hint counter for conjunctions after retrieving the hint
-        self.hint_counters['¬'] += 1
+        self.hint_counters[COUNTERS['¬']] += 1
 
         return hint
     
@@ -104,26 +206,32 @@ class Hints:
         ]
 
         # Retrieve the hint based on the current counter value
-        hint = hints[self.hint_counters['→'] % len(hints)]
+        hint = hints[self.hint_counters[COUNTERS['→']] % len(hints)]
 
         # Increment the hint counter for conjunctions after retrieving the hint
-        self.hint_counters['→'] += 1
+        self.hint_counters[COUNTERS['→']] += 1
 
         return hint
         
     
+    @instrumented('hint', "Producing a hint", ('level', 'high'))
     def get_high_level_hint(self):
+        plan = self.proof_plan()
+        if plan is not None:
+            self.hint_counters[COUNTERS['high_level']] += 1
+            return self.get_strategy_hint(plan)
+
         if not self.connectives_found:  # If no connectives are found, return a default hint
             return "Reflect on the overall structure of your argument. How do your premises logically lead to your conclusion?"
 
         # Cycle through the connectives found in the conclusion, providing a hint for each
-        current_hint_index = self.hint_counters['current'] % len(self.connectives_found)
+        current_hint_index = self.hint_counters[COUNTERS['current']] % len(self.connectives_found)
         connective_for_hint = self.connectives_found[current_hint_index]
 
         # Update the counter for the next call
-        self.hint_counters['current'] += 1
+        self.hint_counters[COUNTERS['current']] += 1
         # Increment the high-level hint counter
-        self.hint_counters['high_level'] += 1
+        self.hint_counters[COUNTERS['high_level']] += 1
 
         # Dispatch to the appropriate hint method based on the connective
         return self.get_highLevel_hint_for_connective(connective_for_hint)
@@ -151,11 +259,11 @@ class Hints:
         ]
 
         # Cycle through the hints
-        current_hint_index = self.hint_counters['∧'] % len(hints)
+        current_hint_index = self.hint_counters[COUNTERS['∧']] % len(hints)
         hint = hints[current_hint_index]
 
         # Update the hint counter for material conditionals
-        self.hint_counters['∧'] += 1
+        self.hint_counters[COUNTERS['∧']] += 1
 
         return hint
 
@@ -167,11 +275,11 @@ class Hints:
         ]
 
         # Cycle through the hints
-        current_hint_index = self.hint_counters['∨'] % len(hints)
+        current_hint_index = self.hint_counters[COUNTERS['∨']] % len(hints)
         hint = hints[current_hint_index]
 
         # Update the hint counter for material conditionals
-        self.hint_counters['∨'] += 1
+        self.hint_counters[COUNTERS['∨']] += 1
 
         return hint
 
@@ -185,10 +293,10 @@ class Hints:
         ]
 
         # Cycle through the hints
-        current_hint_index = self.hint_counters['¬'] % len(hints)
+        current_hint_index = self.hint_counters[COUNTERS['¬']] % len(hints)
         hint = hints[current_hint_index]
 
-        self.hint_counters['¬'] += 1
+        self.hint_counters[COUNTERS['¬']] += 1
 
         return hint
        
@@ -203,11 +311,11 @@ class Hints:
         ]
 
         # Cycle through the hints
-        current_hint_index = self.hint_counters['→'] % len(hints)
+        current_hint_index = self.hint_counters[COUNTERS['→']] % len(hints)
         hint = hints[current_hint_index]
 
         # Update the hint counter for material conditionals
-        self.hint_counters['→'] += 1
+        self.hint_counters[COUNTERS['→']] += 1
 
         return hint
     
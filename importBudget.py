@@ -0,0 +1,121 @@
+import argparse
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Stored start-up baseline and budget, kept next to this script
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+TUTOR_SCRIPT = os.path.join(os.path.dirname(BASELINE_FILE), "logicTutor.py")
+# First line of the welcome banner; the cold start ends when it is printed
+BANNER = "Welcome to the Logic and Proof Tutor CLI!"
+# Default budget and allowed slowdown relative to the recorded baseline
+DEFAULT_BUDGET_MS = 100.0
+DEFAULT_TOLERANCE = 0.5
+
+
+def time_to_banner():
+    # Milliseconds from launching `python logicTutor.py` until its welcome banner is printed:
+    # interpreter start-up plus every import, as a student sees it
+    environment = dict(os.environ, PYTHONUNBUFFERED="1")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, TUTOR_SCRIPT], cwd=os.path.dirname(BASELINE_FILE), env=environment,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding="utf-8",
+    )
+    try:
+        for line in process.stdout:
+            if BANNER in line:
+                return (time.perf_counter() - start) * 1000
+        raise RuntimeError("logicTutor.py exited without printing its welcome banner.")
+    finally:
+        process.kill()
+        process.communicate()
+
+
+def measure_cold_start(runs):
+    # Median time to the banner over fresh processes
+    return statistics.median(time_to_banner() for _ in range(runs))
+
+
+def import_times():
+    # Per-module cumulative import times (ms) reported by `python -X importtime`, slowest first
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import logicTutor"],
+        cwd=os.path.dirname(BASELINE_FILE), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative) / 1000, name.strip()))
+    modules.sort(reverse=True)
+    return modules
+
+
+def measure_imports(runs):
+    # Median time -X importtime charges to importing logicTutor, the part of the cold start
+    # that this project's code controls
+    return statistics.median(
+        next(cumulative for cumulative, name in import_times() if name == "logicTutor") for _ in range(runs)
+    )
+
+
+def slowest_imports(limit=10):
+    return import_times()[:limit]
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE, encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(cold_start_ms, import_ms, budget_ms, tolerance):
+    with open(BASELINE_FILE, "w", encoding="utf-8") as handle:
+        json.dump({"baseline_ms": round(cold_start_ms, 2), "import_ms": round(import_ms, 2), "budget_ms": budget_ms,
+                   "tolerance": tolerance}, handle, indent=2)
+        handle.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the cold start of the tutor CLI (process launch to welcome banner) against its budget.")
+    parser.add_argument("--runs", type=int, default=15, help="Number of fresh interpreters to time (median is used).")
+    parser.add_argument("--update", action="store_true", help="Record the current measurement as the new baseline.")
+    args = parser.parse_args(argv)
+
+    # Time the bytecode a deployed tutor runs from, not a recompile of edited sources
+    compileall.compile_dir(os.path.dirname(BASELINE_FILE), maxlevels=0, quiet=1)
+    cold_start_ms = measure_cold_start(args.runs)
+    import_ms = measure_imports(args.runs)
+    baseline = load_baseline()
+
+    if args.update or baseline is None:
+        budget_ms = baseline["budget_ms"] if baseline else DEFAULT_BUDGET_MS
+        tolerance = baseline["tolerance"] if baseline else DEFAULT_TOLERANCE
+        save_baseline(cold_start_ms, import_ms, budget_ms, tolerance)
+        print(f"Recorded cold-start baseline: {cold_start_ms:.2f} ms, {import_ms:.2f} ms of it importing (budget {budget_ms:.0f} ms)")
+        return 0
+
+    allowed_ms = min(baseline["budget_ms"], baseline["baseline_ms"] * (1 + baseline["tolerance"]))
+    print(f"Cold start: {cold_start_ms:.2f} ms to the banner, {import_ms:.2f} ms of it importing "
+          f"(baseline {baseline['baseline_ms']:.2f} ms, allowed {allowed_ms:.2f} ms)")
+    if cold_start_ms <= allowed_ms:
+        return 0
+
+    # Over budget: show where the import time goes
+    print("Import time over budget. Slowest imports:")
+    for cumulative_ms, name in slowest_imports():
+        print(f"  {cumulative_ms:8.2f} ms  {name}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,356 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from proofRules import rule_label
+
+
+# Learner events, one compact JSON object per line. Every event has the session id "s", the
+# time "ts" (seconds since the epoch) and the problem key "p" (the canonical sequent key of
+# sequentStore, so renamed copies of a problem share statistics):
+#   {"t":"problem","text":"p1 ⊢ p1 ∨ p2","resumed":false}   a session starts on a problem
+#   {"t":"step","rule":"∧I","ok":false,"msg":"..."}         a step checked (msg when rejected)
+#   {"t":"hint","kind":"LH"}                                a hint request
+#   {"t":"reset"}                                           the proof was reset to the premises
+#   {"t":"check","ok":true}                                 a completion check; ok when complete
+
+# Pending events are written once this many have queued, and at the end of every session
+FLUSH_EVERY = 64
+# Rows kept per statistics table; events for further keys are counted in the OTHER row, so
+# memory stays bounded however many distinct problems or messages the logs contain
+MAX_PROBLEMS = 100000
+MAX_MESSAGES = 2000
+OTHER = "(other)"
+# With several workers, event files are split into ranges of at least this many bytes
+RANGE_BYTES = 1 << 22
+
+PROBLEM_COLUMNS = ('sessions', 'resumed', 'steps', 'rejected', 'low_hints', 'high_hints', 'resets', 'checks', 'completed')
+RULE_COLUMNS = ('attempts', 'rejected')
+MESSAGE_COLUMNS = ('count',)
+
+
+class EventLog:
+    # Append-only event file shared by every session in the process. Events are queued and
+    # written in batches of whole lines with O_APPEND, so several tutor processes can append
+    # to the same file without splitting each other's lines.
+    def __init__(self, path, flush_every=FLUSH_EVERY):
+        self.path = path
+        self.flush_every = flush_every
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def start_session(self, premises, conclusion, resumed=False):
+        # Events of one tutor session on the given problem
+        from sequentStore import canonical_sequent  # the store's key doubles as the problem id
+        key, text, _ = canonical_sequent(premises, conclusion)
+        events = SessionEvents(self, uuid.uuid4().hex[:16], key)
+        events.emit('problem', text=text, resumed=resumed)
+        return events
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self.lock:
+            self.pending.append(line)
+            if len(self.pending) >= self.flush_every:
+                self.write_pending()
+
+    def write_pending(self):
+        data = "".join(self.pending).encode('utf-8')
+        self.pending = []
+        while data:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                self.write_pending()
+
+    def close(self):
+        with self.lock:
+            if self.pending:
+                self.write_pending()
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+
+class SessionEvents:
+    # Records the events of one session into an EventLog
+    def __init__(self, log, session, problem):
+        self.log = log
+        self.session = session
+        self.problem = problem
+
+    def emit(self, event_type, **fields):
+        record = {'t': event_type, 's': self.session, 'ts': round(time.time(), 3), 'p': self.problem}
+        record.update(fields)
+        self.log.append(record)
+
+    def record_step(self, rule_applied, ok, message):
+        if ok:
+            self.emit('step', rule=rule_label(rule_applied), ok=True)
+        else:
+            self.emit('step', rule=rule_label(rule_applied), ok=False, msg=message)
+
+    def record_hint(self, kind):
+        self.emit('hint', kind=kind)
+
+    def record_reset(self):
+        self.emit('reset')
+
+    def record_check(self, ok):
+        self.emit('check', ok=ok)
+
+    def flush(self):
+        self.log.flush()
+
+
+class Columns:
+    # Table of integer counters stored column by column in typed arrays, one row per key.
+    # Past max_rows distinct keys, new keys share the OTHER row.
+    def __init__(self, names, max_rows):
+        self.names = names
+        self.max_rows = max_rows
+        self.columns = {name: array('q') for name in names}
+        self.rows = {}  # key -> row index
+        self.keys = []  # row index -> key
+
+    def row(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            if len(self.keys) >= self.max_rows:
+                key = OTHER
+                row = self.rows.get(key)
+            if row is None:
+                row = len(self.keys)
+                self.rows[key] = row
+                self.keys.append(key)
+                for column in self.columns.values():
+                    column.append(0)
+        return row
+
+    def merge(self, other):
+        for key, other_row in other.rows.items():
+            row = self.row(key)
+            for name, column in self.columns.items():
+                column[row] += other.columns[name][other_row]
+
+    def records(self):
+        # The rows as dictionaries, in the order their keys were first seen
+        return [dict(zip(('key',) + self.names, (key,) + tuple(self.columns[name][row] for name in self.names)))
+                for row, key in enumerate(self.keys)]
+
+
+class Aggregator:
+    # Folds a stream of learner events into per-problem, per-rule and per-error-message
+    # counters. Only the counters are kept, never the events, so memory depends on the number
+    # of distinct problems and messages (both capped) and not on the length of the logs.
+    # Events outside [since, until) are skipped.
+    def __init__(self, since=None, until=None, max_problems=MAX_PROBLEMS, max_messages=MAX_MESSAGES):
+        self.since = since
+        self.until = until
+        self.problems = Columns(PROBLEM_COLUMNS, max_problems)
+        self.problem_text = {}  # problem key -> canonical sequent text
+        self.rules = Columns(RULE_COLUMNS, max_messages)
+        self.messages = Columns(MESSAGE_COLUMNS, max_messages)  # keyed by (rule, message)
+        self.events = 0
+        self.skipped = 0  # malformed lines
+
+    def add(self, record):
+        timestamp = record.get('ts', 0)
+        if (self.since is not None and timestamp < self.since) or (self.until is not None and timestamp >= self.until):
+            return
+        kind = record.get('t')
+        problems = self.problems
+        row = problems.row(record.get('p'))
+        columns = problems.columns
+        self.events += 1
+        if kind == 'step':
+            rule = record.get('rule')
+            rule_row = self.rules.row(rule)
+            columns['steps'][row] += 1
+            self.rules.columns['attempts'][rule_row] += 1
+            if not record.get('ok'):
+                columns['rejected'][row] += 1
+                self.rules.columns['rejected'][rule_row] += 1
+                self.messages.columns['count'][self.messages.row((rule, record.get('msg')))] += 1
+        elif kind == 'hint':
+            columns['low_hints' if record.get('kind') == 'LH' else 'high_hints'][row] += 1
+        elif kind == 'check':
+            columns['checks'][row] += 1
+            if record.get('ok'):
+                columns['completed'][row] += 1
+        elif kind == 'reset':
+            columns['resets'][row] += 1
+        elif kind == 'problem':
+            columns['resumed' if record.get('resumed') else 'sessions'][row] += 1
+            key = record.get('p')
+            if key in problems.rows and key not in self.problem_text:
+                self.problem_text[key] = record.get('text')
+
+    def add_lines(self, lines):
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                self.skipped += 1
+                continue
+            if isinstance(record, dict):
+                self.add(record)
+            else:
+                self.skipped += 1
+
+    def merge(self, other):
+        self.problems.merge(other.problems)
+        for key, text in other.problem_text.items():
+            if key in self.problems.rows:
+                self.problem_text.setdefault(key, text)
+        self.rules.merge(other.rules)
+        self.messages.merge(other.messages)
+        self.events += other.events
+        self.skipped += other.skipped
+
+    def summary(self):
+        # Plain statistics with error and completion rates, ready for a dashboard
+        problems = []
+        for record in self.problems.records():
+            record['text'] = self.problem_text.get(record['key'])
+            record['error_rate'] = rate(record['rejected'], record['steps'])
+            record['completion_rate'] = rate(record['completed'], record['sessions'])
+            problems.append(record)
+        rules = []
+        for record in self.rules.records():
+            record['error_rate'] = rate(record['rejected'], record['attempts'])
+            rules.append(record)
+        messages = []
+        for record in self.messages.records():
+            rule, message = (OTHER, OTHER) if record['key'] == OTHER else record['key']
+            messages.append({'rule': rule, 'message': message, 'count': record['count']})
+        messages.sort(key=lambda record: -record['count'])
+        return {'events': self.events, 'skipped': self.skipped, 'problems': problems, 'rules': rules, 'messages': messages}
+
+
+def rate(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def lines_in_range(handle, start, end):
+    # Lines of a binary file that start within bytes [start, end)
+    position = start
+    if start > 0:
+        handle.seek(start - 1)
+        position += len(handle.readline()) - 1  # finish the line the range starts inside
+    else:
+        handle.seek(0)
+    while position < end:
+        line = handle.readline()
+        if not line:
+            break
+        position += len(line)
+        yield line
+
+
+def aggregate_range(path, start, end, since=None, until=None):
+    # Aggregator over the events of one byte range of an event file
+    aggregator = Aggregator(since, until)
+    with open(path, 'rb') as handle:
+        aggregator.add_lines(lines_in_range(handle, start, end))
+    return aggregator
+
+
+def aggregate(paths, since=None, until=None, workers=1):
+    # One Aggregator over every file ('-' reads stdin). With several workers, the files are
+    # cut into ranges of at least RANGE_BYTES that are folded in parallel processes and their
+    # tables merged, so one large term log is spread over the workers too.
+    paths = paths or ['-']
+    total = Aggregator(since, until)
+    if '-' in paths or workers == 1:
+        for path in paths:
+            if path == '-':
+                total.add_lines(sys.stdin)
+            else:
+                total.merge(aggregate_range(path, 0, os.path.getsize(path), since, until))
+        return total
+
+    ranges = []
+    for path in paths:
+        size = os.path.getsize(path)
+        step = max(RANGE_BYTES, -(-size // workers))
+        ranges += [(path, start, min(start + step, size)) for start in range(0, size, step)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(aggregate_range, path, start, end, since, until) for path, start, end in ranges]
+        for future in futures:
+            total.merge(future.result())
+    return total
+
+
+def parse_time(text):
+    # Seconds since the epoch for an ISO date or date-time such as 2026-09-01
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an ISO date such as 2026-09-01, not {text!r}") from None
+
+
+def format_rate(value):
+    return "   -" if value is None else f"{value:4.0%}"
+
+
+def print_report(summary, top, output):
+    problems = sorted(summary['problems'], key=lambda record: (-record['rejected'], -record['steps']))[:top]
+    output.write(f"{summary['events']} events ({summary['skipped']} unreadable lines skipped)\n\n")
+    output.write("Problems with the most rejected steps:\n")
+    output.write(f"{'sessions':>8} {'done':>5} {'steps':>7} {'errors':>7} {'err%':>5} {'LH':>5} {'HH':>5}  problem\n")
+    for record in problems:
+        output.write(f"{record['sessions']:>8} {format_rate(record['completion_rate']):>5} {record['steps']:>7} {record['rejected']:>7} "
+                     f"{format_rate(record['error_rate']):>5} {record['low_hints']:>5} {record['high_hints']:>5}  {record['text'] or record['key']}\n")
+    output.write("\nRules:\n")
+    output.write(f"{'rule':<12} {'attempts':>9} {'errors':>8} {'err%':>5}\n")
+    for record in sorted(summary['rules'], key=lambda record: -record['attempts']):
+        output.write(f"{str(record['key']):<12} {record['attempts']:>9} {record['rejected']:>8} {format_rate(record['error_rate']):>5}\n")
+    output.write("\nMost common errors:\n")
+    for record in summary['messages'][:top]:
+        output.write(f"{record['count']:>8}  {record['rule']}: {record['message']}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise learner event logs into per-problem and per-rule statistics.")
+    parser.add_argument("inputs", nargs="*", help="Event files written with --events ('-' or nothing reads stdin).")
+    parser.add_argument("--since", type=parse_time, help="Only count events from this date on, e.g. 2026-09-01.")
+    parser.add_argument("--until", type=parse_time, help="Only count events before this date.")
+    parser.add_argument("--format", choices=("text", "json", "csv"), default="text", help="Report format (csv writes the per-problem table).")
+    parser.add_argument("--top", type=int, default=20, help="Problems and error messages listed in the text report.")
+    parser.add_argument("-o", "--output", help="Write the report here instead of stdout.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Worker processes reading the event files in parallel.")
+    args = parser.parse_args(argv)
+
+    summary = aggregate(args.inputs, args.since, args.until, args.workers).summary()
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(summary, output, ensure_ascii=False, indent=2)
+            output.write("\n")
+        elif args.format == 'csv':
+            writer = csv.DictWriter(output, fieldnames=('key', 'text') + PROBLEM_COLUMNS + ('error_rate', 'completion_rate'))
+            writer.writeheader()
+            writer.writerows(summary['problems'])
+        else:
+            print_report(summary, args.top, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
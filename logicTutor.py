@@ -1,136 +1,218 @@
-import random
-from sympy import *
-from proofRules import ruleChecker
+from collections import namedtuple
+from functools import lru_cache
+
+from proofRules import ProofChecker, RULES, install_rules, interned, proof_concludes
+from metrics import instrumented
 from hints import Hints
+from formula import parse_formula, FormulaSyntaxError, VAR, NOT, AND, OR, IMPLIES, XOR, IFF, BINARY_OPERATORS
+from truthTable import TruthTable, MAX_VARIABLES, format_assignment
+from explorer import ConsequenceExplorer
+
+
+
+# Premises and conclusion of a problem, as the texts the student typed
+Problem = namedtuple('Problem', ['premises', 'conclusion'])
+# The problem of a session before the student has entered one
+NO_PROBLEM = Problem((), None)
+# Distinct problems kept for sharing between sessions
+PROBLEM_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=PROBLEM_CACHE_SIZE)
+def shared_problem(premises, conclusion):
+    # The one Problem for a tuple of premise texts and a conclusion text, so sessions working
+    # on the same problem share it and its interned texts instead of each keeping copies
+    return Problem(tuple(interned(premise) for premise in premises), interned(conclusion))
 
 
+class ConsoleIO:
+    # Terminal front end. The tutor talks to the student only through ask() and show(), so
+    # other front ends (such as tutorServer, or transcriptReplay for recorded sessions) can host the
+    # same session logic.
+    @instrumented('user_wait', "Waiting for the student's answer", ('front_end', 'console'))
+    def ask(self, prompt):
+        return input(prompt)
+
+    def show(self, text):
+        print(text)
+
 
 class LogicProofTutor:
  
     # Set containing user-defined logical operators.
-    userOperators = {'∧','∨','¬','→','⊕'} #'↔'
-    # Set containing corresponding Python logical operators.
-    pythonOperators = {'&','|','~','>>','^'}
-    # Dictionary mapping user-defined operators to Python operators.
-    user_to_python_operators = {'∧': '&', '∨': '|', '¬': '~', '→': '>>', '⊕': '^'}
+    userOperators = {NOT, *BINARY_OPERATORS}
     # Set containing valid alphabets and characters for propositional statements.
     validAlpha = {"p","q"," ","(",")", "a", ","}   
+    # Variables the parser accepts, taken from the valid alphabet.
+    validVariables = {char for char in validAlpha if char.isalpha()}
     # Initializing an empty string for user input.
     user_input = ""
+    # A server may host thousands of sessions, so a session keeps only these
+    __slots__ = ('io', 'journal', 'events', 'session_events', 'problem', 'proof_steps', 'checker',
+                 'explorer', 'hints_provider', 'hint_count', 'auto_justify', 'accept_equivalent')
     
     # Constructor method for initializing class instances.
-    def __init__(self):
-        # List to store premises.
-        self.premises = [] 
-        # List to store conclusions.
-        self.conclusion = []
+    # With auto_justify, an empty RuleApplied answer lets the tutor find the rule and lines itself.
+    # io is the front end the session talks through (ConsoleIO by default); journal, if given,
+    # is a SessionJournal that records the session so it can be resumed after a crash.
+    # With accept_equivalent, a proof whose last line is logically equivalent to the goal counts
+    # as complete; otherwise the last line must match the goal up to ∧/∨ grouping and order.
+    # events, if given, is a learnerAnalytics.EventLog that receives the session's steps,
+    # hints, resets and completion checks.
+    def __init__(self, auto_justify=False, io=None, journal=None, accept_equivalent=False, events=None):
+        self.io = io if io is not None else ConsoleIO()
+        self.journal = journal
+        self.events = events
+        self.session_events = None  # this session's learnerAnalytics.SessionEvents, once the problem is known
+        # Premises and conclusion, shared with every other session on the same problem
+        self.problem = NO_PROBLEM
         self.proof_steps = {}
-        self.hints_provider = Hints(self.premises, self.conclusion)  # Initialize Hints instance
+        # Checker that owns the proof steps and keeps their parsed state between checks
+        self.checker = ProofChecker(self.proof_steps)
+        # One-step consequences of the proof, created on the first 'Next' and kept up to date from then on
+        self.explorer = None
+        self.hints_provider = None  # the session's Hints, once the first line is entered
         self.hint_count =  {'LH': 0, 'HH': 0}  # Initialize hint counts dictionary
+        self.auto_justify = auto_justify
+        self.accept_equivalent = accept_equivalent
 
     
     def get_user_proposition(self):
+        # Ask for the premises; returns their texts
         while True:
-            user_input = input("Enter propositional premise statements separated by a comma: ")
+            user_input = self.io.ask("Enter propositional premise statements separated by a comma: ")
             premise_list = user_input.split(',')
             all_premises_valid = True  # Flag to track if all premises are valid
 
-            for premise in premise_list:
-                premise = premise.strip()  # Remove leading/trailing whitespace
-                if not self.check_syntax(premise):
-                    all_premises_valid = False
-                    break  # Exit the loop as there's an invalid premise
+            premise_list = [premise.strip() for premise in premise_list]  # Remove leading/trailing whitespace
 
-                try:
-                    self.convert_to_sympy(premise)  # Attempt to convert premise to sympy
-                except (ValueError, SympifyError):
+            for premise in premise_list:
+                if self.parse_statement(premise) is None:
                     all_premises_valid = False
                     break  # Exit the loop as there's an invalid premise
 
             if all_premises_valid:
-                self.premises.extend(premise_list) # All premises are valid; append them to the list
-                break  # Exit the while loop as we've successfully got all valid premises
+                return premise_list  # All premises are valid
  
                 
     def get_user_conclusion(self):
         while True:
-            user_input = input("Enter a propositional goal statement: ").strip()
+            user_input = self.io.ask("Enter a propositional goal statement: ").strip()
             if user_input:
                 # Keep asking until a valid statement is entered
-                while True:
-                    try:
-                        # Attempt to check syntax and convert the conclusion
-                        if not self.check_syntax(user_input):
-                            raise ValueError("Invalid syntax. Please enter a valid propositional goal statement.")
-                        parsed_expr = self.convert_to_sympy(user_input)
-                        # If successful, add to conclusions and break the loop
-                        self.conclusion.append(user_input)
-                        break  # Exit loop on successful conversion
-                    except (ValueError, SympifyError):
-                        # If either check_syntax fails or convert_to_sympy raises SympifyError, ask for input again
-                        user_input = input("Enter a valid propositional goal statement: ").strip()
-
-                return parsed_expr  # Return the valid parsed expression
+                parsed_expr = self.parse_statement(user_input)
+                while parsed_expr is None:
+                    user_input = self.io.ask("Enter a valid propositional goal statement: ").strip()
+                    parsed_expr = self.parse_statement(user_input)
+
+                return user_input  # Return the valid statement
                     
 
-    # Method to convert user-defined operators to Python operators in a given statement.            
-    def convert_to_python_operators(self, user_input):
-        for user_op, python_op in self.user_to_python_operators.items():
-            # Replacing user-defined operators with Python operators.
-             user_input = user_input.replace(user_op, python_op)
-        # Returning the modified input statement.
-        return user_input
-       
+    # Method to parse a propositional statement into a formula node in a single pass.
+    # Syntax errors are reported with the position of the offending character and None is returned.
+    @instrumented('parse', "Parsing a formula typed by the student")
+    def parse_statement(self, user_input):
+        try:
+            return parse_formula(user_input, self.validVariables)
+        except FormulaSyntaxError as e:
+            self.io.show(f"Invalid syntax. {e} Please enter a valid propositional statement.")
+            self.io.show(e.pointer())
+            return None
+
     # Method to convert a propositional statement to a Sympy expression. 
+    @instrumented('convert_to_sympy', "Building the Sympy expression of a formula")
     def convert_to_sympy(self, user_input):
-        try:
-            # Converting user-defined operators to Python operators.
-            converted_user_input = self.convert_to_python_operators(user_input)
-             # Parsing the converted input using sympify.
-            parsed_expr = sympify(converted_user_input)
-            #print(parsed_expr)
-            # Returning the parsed expression.
-            return parsed_expr
-        except SympifyError:
-                print("Conversion error. Input a valid statement.") 
-                raise
+        # Sympy is only needed here, so it is imported on first use rather than at start-up.
+        from sympy import Symbol, Not, And, Or, Implies, Xor, Equivalent
+
+        # Parsing the input natively and building the Sympy expression from the tree,
+        # instead of rewriting operators and evaluating the text with sympify.
+        formula = parse_formula(user_input, self.validVariables)
+        sympy_operators = {NOT: Not, AND: And, OR: Or, IMPLIES: Implies, XOR: Xor, IFF: Equivalent}
+        built = {}
+        stack = [formula]
+        while stack:
+            node = stack[-1]
+            if node in built:
+                stack.pop()
+            elif node.op == VAR:
+                built[node] = Symbol(node.name)
+                stack.pop()
+            else:
+                pending = [child for child in node.args if child not in built]
+                if pending:
+                    stack.extend(pending)
+                else:
+                    built[node] = sympy_operators[node.op](*(built[child] for child in node.args))
+                    stack.pop()
+        # Returning the parsed expression.
+        return built[formula]
     
     def check_syntax(self, user_input):
-        stack = []  # Stack to track opening brackets
-        last_char = None  # Variable to track last character
-
-        for char in user_input:
-            if char == '(':
-                stack.append(char)  # Push opening bracket onto stack
-            elif char == ')':
-                if not stack or stack.pop() != '(':  # If closing bracket found but no opening bracket in stack or mismatched brackets
-                    print("Invalid Syntax. Unbalanced brackets.")
-                    return False
-            elif char not in self.validAlpha and char not in self.userOperators:
-                print(char + " is Invalid syntax. Please enter a valid propositional statement.")
-                return False
-            elif char.isalpha():
-                if last_char and last_char.isalpha():  # If consecutive letters found
-                    print("Invalid syntax. Consecutive letters are not allowed.")
-                    return False
-
-
-            last_char = char  # Update last character seen
-
-        if stack:  # If stack is not empty after iteration, unbalanced brackets
-            print("Invalid syntax. Unbalanced brackets.")
-            return False
+        # Return True for valid syntax; errors are printed with their position
+        return self.parse_statement(user_input) is not None
 
-        return True  # Return True for valid syntax
 
+    def problem_truth_table(self):
+        # Truth table over the premises and conclusion, or None if there are too many variables
+        formulas = [parse_formula(premise) for premise in self.problem.premises] + [parse_formula(self.problem.conclusion)]
+        try:
+            return TruthTable(formulas)
+        except ValueError:
+            self.io.show(f"The problem has more than {MAX_VARIABLES} variables; truth tables are not available.")
+            return None
+
+    def check_entailment(self):
+        # Warn straight away when the premises do not entail the conclusion, since no proof exists
+        # then. Uses the problem's BDDs, or the SAT solver if those get too big, so problems too
+        # big for a truth table are checked as well.
+        import bdd
+        premises = [parse_formula(premise) for premise in self.problem.premises]
+        conclusion = parse_formula(self.problem.conclusion)
+        try:
+            valid, counterexample = bdd.entails(premises, conclusion)
+        except bdd.BDDSizeError:
+            import satSolver
+            valid, counterexample = satSolver.entails(premises, conclusion)
+        if not valid:
+            self.io.show("Warning: the premises do not entail the conclusion, so this problem cannot be proved.")
+            self.io.show(f"Counterexample: {format_assignment(counterexample)} makes every premise true and the conclusion false.\n")
+        return valid
+
+    def display_truth_table(self):
+        table = self.problem_truth_table()
+        if table is not None:
+            formulas = [parse_formula(premise) for premise in self.problem.premises] + [parse_formula(self.problem.conclusion)]
+            self.io.show("\n".join(table.render(formulas)))
+
+    def display_consequences(self, selection):
+        # List what follows from the current lines in one step; selected lines are also combined with ∧I
+        selected = []
+        if selection:
+            parts = [part.strip() for part in selection.split(',')]
+            if not all(part.isdigit() and int(part) in self.proof_steps for part in parts):
+                self.io.show("Select existing line numbers separated by commas, e.g. 'Next 2,3'.")
+                return
+            selected = [int(part) for part in parts]
+        if self.explorer is None:
+            self.explorer = ConsequenceExplorer(self.checker)
+        consequences, more = self.explorer.derivable(selected)
+        if not consequences:
+            self.io.show("Nothing new follows in one step by ∧E, →E or ¬E. Select lines to combine with ∧I, e.g. 'Next 2,3'.")
+            return
+        self.io.show("You can derive next:")
+        for formula, rule_applied in consequences:
+            self.io.show(f"  {formula}    RuleApplied: {rule_applied}")
+        if more:
+            self.io.show(f"  ... and {more} more.")
 
     def display_problem(self):
-        if self.premises and self.conclusion:
-            print("Current Problem:")
-            premises_str = " , ".join(self.premises)
-            print(f"{premises_str} ⊢ {self.conclusion[0]}\n")
+        if self.problem.premises and self.problem.conclusion:
+            self.io.show("Current Problem:")
+            premises_str = " , ".join(self.problem.premises)
+            self.io.show(f"{premises_str} ⊢ {self.problem.conclusion}\n")
         else:
-            print("No problem is provided yet.")
+            self.io.show("No problem is provided yet.")
         
        
     
@@ -138,18 +220,14 @@ class LogicProofTutor:
         # Start with line number 1 for the first premise
         line_number = 1
         
-        # Iterate over each premise in self.premises
-        for premise in self.premises:
-            # Add the premise to self.proof_steps with the current line number as the key
-            # The value is a dictionary with details about this proof step
-            self.proof_steps[line_number] = {
-                'step': premise,     # The proposition for this step
-                'line_dep': 'Premise',   # Indicating this step is a premise
-                'rule': None         # No rule applied to premises, they are given
-            }
+        # Iterate over each premise in self.problem.premises
+        for premise in self.problem.premises:
+            # Add the premise to self.proof_steps with the current line number as the key.
+            # It is marked as a premise and has no rule applied, since premises are given.
+            self.checker.add_line(line_number, 'Premise', parse_formula(premise))
             
             # Print the premise in a formatted way for display
-            print(f"Premise/LineDep: Premise  LineNumber: ({line_number})  ProofStep: {premise} RuleApplied: Given")
+            self.io.show(f"Premise/LineDep: Premise  LineNumber: ({line_number})  ProofStep: {premise} RuleApplied: Given")
             
             # Increment the line number for the next premise
             line_number += 1
@@ -168,70 +246,157 @@ class LogicProofTutor:
             # If the input is neither "Premise" nor a series of numbers, it's invalid
             return False
     
+    def read_step(self, line_number, position=None):
+        # Ask for a line's LineDep, ProofStep and RuleApplied until the rule checks. position is
+        # set when editing or inserting at line_number, so that only earlier lines may be cited.
+        self.io.show(f"LineNumber: ({line_number})")
+        line_dep = self.io.ask("Premise/LineDep: ").strip()
+
+        # Validate line_dep input...
+        while not self.validate_line_dep(line_dep):
+            self.io.show("Invalid input for Premise/LineDep. Please enter 'Premise' or line numbers like '1' or '1,2,3'.")
+            line_dep = self.io.ask("Premise/LineDep: ").strip()
+
+        proof_step_input = self.io.ask("ProofStep: ").strip()
+        while not proof_step_input:  # Check if proof_step_input is empty
+            self.io.show("ProofStep cannot be empty. Please enter a valid propositional statement.")
+            proof_step_input = self.io.ask("ProofStep: ").strip()
+            
+        # Parse once; the rules and the stored proof work on the formula node
+        proof_step = self.parse_statement(proof_step_input)
+        while proof_step is None:
+            proof_step_input = self.io.ask("ProofStep: ").strip()
+            proof_step = self.parse_statement(proof_step_input)
+
+        rule_applied = self.get_rule_applied(proof_step)
+        # Validate rule and apply it to the proof step...
+        rule_check_result, message = self.checker.check(proof_step, rule_applied, position)
+        if self.session_events is not None:
+            self.session_events.record_step(rule_applied, rule_check_result, message)
+
+        while not rule_check_result:
+            self.io.show(f"Rule application error: {message}")
+            self.explain_rejection(proof_step, rule_applied)
+            rule_applied = self.get_rule_applied(proof_step)
+            rule_check_result, message = self.checker.check(proof_step, rule_applied, position)
+            if self.session_events is not None:
+                self.session_events.record_step(rule_applied, rule_check_result, message)
+        return line_dep, proof_step, rule_applied
+
+    def explain_rejection(self, proof_step, rule_applied):
+        # Tell apart a step that follows from the lines it rests on but was cited wrongly from
+        # one that no rule could ever derive from them, which gets a counterexample
+        checked = self.checker.counterexample(proof_step, rule_applied)
+        if checked is None:
+            return  # the rule application itself is malformed; its error says why
+        lines, counterexample = checked
+        cited = ', '.join(str(line) for line in lines)
+        if counterexample is None:
+            self.io.show(f"The step does follow from line(s) {cited or 'none'}, so a different rule application can derive it.")
+        elif lines:
+            self.io.show(f"The step does not follow from line(s) {cited}: {format_assignment(counterexample)} makes {'them' if len(lines) > 1 else 'it'} true and the step false.")
+        else:
+            self.io.show(f"The step rests on no premises or assumptions and is not valid: {format_assignment(counterexample)} makes it false.")
+
+    def edit_proof(self, command, argument):
+        # 'Edit N' replaces line N, 'Insert N' adds a line before line N and 'Delete N' removes
+        # it; later lines are renumbered. After an edit only the lines depending on the changed
+        # line are checked again.
+        first_line = len(self.problem.premises) + 1
+        last_line = len(self.proof_steps) + (1 if command == 'insert' else 0)
+        if not argument.isdigit() or not first_line <= int(argument) <= last_line:
+            if first_line > last_line:
+                self.io.show("There are no lines to change yet; premises cannot be changed.")
+            else:
+                self.io.show(f"Give a line number from {first_line} to {last_line}, e.g. '{command.capitalize()} {first_line}'. Premises cannot be changed.")
+            return
+        line_number = int(argument)
+        if command == 'delete':
+            deleted, message = self.checker.delete_line(line_number)
+            self.io.show(message)
+            if not deleted:
+                return
+        elif command == 'insert':
+            self.checker.insert_line(line_number, *self.read_step(line_number, line_number))
+        else:
+            current = self.proof_steps[line_number]
+            self.io.show(f"Line ({line_number}) is now: {current.step}  RuleApplied: {current.rule}")
+            rechecked = self.checker.replace_line(line_number, *self.read_step(line_number, line_number))
+            for dependent, valid, message in rechecked:
+                if not valid:
+                    self.io.show(f"Line ({dependent}) no longer follows: {message}")
+            if rechecked and all(valid for _, valid, _ in rechecked):
+                self.io.show(f"The {len(rechecked)} line(s) depending on line ({line_number}) still follow.")
+        if self.journal is not None:
+            self.journal.record_lines([
+                [number, entry.line_dep, str(entry.step), entry.rule]
+                for number, entry in sorted(self.proof_steps.items()) if number >= first_line
+            ])
+        self.evaluate_user_input()
+
+    def reset_hints(self):
+        # Hints cycle afresh after every change to the proof. The session's one Hints object
+        # is reset in place instead of being rebuilt.
+        if self.hints_provider is None:
+            self.hints_provider = Hints(self.problem.premises, self.problem.conclusion, self.checker)
+        else:
+            self.hints_provider.reset()
+
     def get_user_input(self):
         while True:
-            initial_premises_count = len(self.premises)  # Count the number of given premises at the start
+            initial_premises_count = len(self.problem.premises)  # Count the number of given premises at the start
             line_number = len(self.proof_steps) + 1
-            print(f"LineNumber: ({line_number})")
-            line_dep = input("Premise/LineDep: ").strip()
-
-            # Validate line_dep input...
-            while not self.validate_line_dep(line_dep):
-                print("Invalid input for Premise/LineDep. Please enter 'Premise' or line numbers like '1' or '1,2,3'.")
-                line_dep = input("Premise/LineDep: ").strip()
-
-            proof_step_input = input("ProofStep: ").strip()
-            while not proof_step_input:  # Check if proof_step_input is empty
-                print("ProofStep cannot be empty. Please enter a valid propositional statement.")
-                proof_step_input = input("ProofStep: ").strip()
-                
-            while not self.check_syntax(proof_step_input):
-                print("Invalid syntax. Please enter a valid propositional statement.")
-                proof_step_input = input("ProofStep: ").strip()
-                
-            try:
-                self.convert_to_sympy(proof_step_input)
-            except (ValueError, SympifyError):
-                proof_step_input = input("ProofStep: ").strip()
-
-            rule_applied = input("RuleApplied: ").strip()
-            # Validate rule and apply it to the proof step...
-            rule_check_result, message = ruleChecker(proof_step_input, rule_applied, self.proof_steps)
-
-            while not rule_check_result:
-                print(f"Rule application error: {message}")
-                rule_applied = input("RuleApplied: ").strip()
-                rule_check_result, message = ruleChecker(proof_step_input, rule_applied, self.proof_steps)
-
-            self.proof_steps[line_number] = {
-                'line_dep': line_dep,
-                'step': proof_step_input,
-                'rule': rule_applied
-            }
+            line_dep, proof_step, rule_applied = self.read_step(line_number)
+            self.checker.add_line(line_number, line_dep, proof_step, rule_applied)
+            if self.journal is not None:
+                self.journal.record_step(line_number, line_dep, proof_step, rule_applied)
             
-            self.hints_provider = Hints(self.premises, self.conclusion[0])
+            self.reset_hints()
             while True:  # Inner loop for handling hints and other commands
-                check_or_continue = input("\nPress 'Enter' to add another step, 'Check' to verify the proof, 'Reset' to restart your proof, 'LH' for a next step hint, or 'HH' for a high-level hint: ").strip().lower()
+                check_or_continue = self.io.ask("\nPress 'Enter' to add another step, 'Check' to verify the proof, 'Reset' to restart your proof, 'LH' for a next step hint, 'HH' for a high-level hint, 'Next' to list steps you can take now (e.g. 'Next' or 'Next 2,3'), 'Edit N', 'Insert N' or 'Delete N' to change line N, or 'TT' for a truth table: ").strip().lower()
+                command, _, argument = check_or_continue.partition(' ')
                 
                 
                 if check_or_continue == 'lh':
                     self.hint_count['LH'] += 1  # Increment LH count
-                    print("Low-Level Hint:", self.hints_provider.get_low_level_hint())  
+                    if self.journal is not None:
+                        self.journal.record_hint('LH')
+                    if self.session_events is not None:
+                        self.session_events.record_hint('LH')
+                    self.io.show(f"Low-Level Hint: {self.hints_provider.get_low_level_hint()}")  
                 elif check_or_continue == 'hh':
                     self.hint_count['HH'] += 1  # Increment HH count
-                    print("High-Level Hint:", self.hints_provider.get_high_level_hint())
+                    if self.journal is not None:
+                        self.journal.record_hint('HH')
+                    if self.session_events is not None:
+                        self.session_events.record_hint('HH')
+                    self.io.show(f"High-Level Hint: {self.hints_provider.get_high_level_hint()}")
+                elif check_or_continue == 'tt':
+                    self.display_truth_table()
+                elif check_or_continue == 'next' or check_or_continue.startswith('next '):
+                    self.display_consequences(check_or_continue[len('next'):].strip())
+                elif command in ('edit', 'insert', 'delete'):
+                    self.edit_proof(command, argument.strip())
+                    self.reset_hints()
                 elif check_or_continue == 'check':
-                    if self.check_proof_completion():
-                        print("Proof is complete and correct!")
+                    complete = self.check_proof_completion()
+                    if self.session_events is not None:
+                        self.session_events.record_check(complete)
+                    if complete:
+                        self.io.show("Proof is complete and correct!")
                         return  # Exit the method after evaluating and displaying proof steps
                     else:
-                        print("The proof is not yet complete. Continue adding proof steps or check again.")
+                        self.io.show("The proof is not yet complete. Continue adding proof steps or check again.")
                         continue  
                 elif check_or_continue == 'reset':
-                    print("Resetting your proof. Keeping premises only.")
+                    self.io.show("Resetting your proof. Keeping premises only.")
                     # Reset logic here...
-                    self.proof_steps = {ln: self.proof_steps[ln] for ln in range(1, initial_premises_count + 1)}
-                    line_number = len(self.premises) + 1  # Reset line number to start after premises
+                    self.checker.truncate(initial_premises_count)
+                    if self.journal is not None:
+                        self.journal.record_reset()
+                    if self.session_events is not None:
+                        self.session_events.record_reset()
+                    line_number = len(self.problem.premises) + 1  # Reset line number to start after premises
                     break  # Break out of the inner loop to continue with proof steps
                 elif check_or_continue == '':
                     break  # Break out of the inner loop to add another step
@@ -239,52 +404,166 @@ class LogicProofTutor:
         # Additional logic here if needed after exiting the loop
 
 
+    def get_rule_applied(self, proof_step):
+        if not self.auto_justify:
+            return self.io.ask("RuleApplied: ").strip()
+        while True:
+            rule_applied = self.io.ask("RuleApplied (Enter to find it automatically): ").strip()
+            if rule_applied:
+                return rule_applied
+            # Look the justification up from the indexed earlier lines
+            rule_applied, message = self.checker.justify(proof_step)
+            if rule_applied is not None:
+                self.io.show(f"RuleApplied: {rule_applied}")
+                return rule_applied
+            self.io.show(f"{message} Enter the rule yourself, or 'None' for an assumption.")
+
+    @instrumented('proof_completion', "Checking whether the proof reaches the conclusion")
     def check_proof_completion(self):
         try:
-            # Retrieve the last proof step
-            last_proof_step = self.proof_steps[max(self.proof_steps.keys())]['step']
-            # Convert the conclusion to a Sympy expression for comparison
-            conclusion_sympy = self.conclusion[0]
-
-            # Compare the last proof step with the conclusion
-            if (last_proof_step)==(conclusion_sympy):
-                print("The proof successfully concludes with the given conclusion. Well done!")
+            if self.checker.invalid:
+                self.io.show(f"Line(s) {', '.join(map(str, sorted(self.checker.invalid)))} no longer follow after your changes. Edit or delete them first.")
+                return False
+            # Compare the last proof step with the conclusion, against the same problem BDDs
+            # that check_entailment built
+            premises = [parse_formula(premise) for premise in self.problem.premises]
+            if proof_concludes(self.proof_steps, self.problem.conclusion, self.accept_equivalent, premises):
+                # The conclusion must rest on the premises alone, with every assumption discharged
+                open_lines = self.checker.undischarged(max(self.proof_steps), len(self.problem.premises))
+                if open_lines:
+                    self.io.show(f"The last line still depends on the assumption(s) on line(s) {', '.join(map(str, open_lines))}. Discharge them with →I, ¬I or ∨E first.")
+                    return False
+                self.io.show("The proof successfully concludes with the given conclusion. Well done!")
                 return True
             else:
-                print("The proof does not conclude with the given conclusion. Please review your steps.")
+                self.io.show("The proof does not conclude with the given conclusion. Please review your steps.")
                 return False
         except (ValueError, KeyError) as e:
-            print(f"Error checking proof: {e}")
+            self.io.show(f"Error checking proof: {e}")
             return False
 
 
     def evaluate_user_input(self):
-        print("Evaluating your input:")
+        self.io.show("Evaluating your input:")
         for line_number, details in self.proof_steps.items():
-            formatted_step = f"Premise/LineDep: {details['line_dep']}  LineNumber: ({line_number})  ProofStep: {details['step']} RuleApplied: {details['rule']}"
-            print(formatted_step)
+            formatted_step = f"Premise/LineDep: {details.line_dep}  LineNumber: ({line_number})  ProofStep: {details.step} RuleApplied: {details.rule}"
+            if line_number in self.checker.invalid:
+                formatted_step += "  [no longer follows]"
+            self.io.show(formatted_step)
 
 
 
    
-    def start_tutor(self):
-        print("\nWelcome to the Logic and Proof Tutor CLI!")
-        print("Propositional connectives = ∧ , ∨ , ¬ , → ")
-        print("Variables allowed: p , q , a")
-        print("Rules Applied: ∧I, ∧E, ∨I, ∨E, →I, →E, ¬I, ¬E\n")
-        self.get_user_proposition()
-        self.get_user_conclusion()
-        while self.premises:
+    def restore_session(self, state):
+        # Rebuild premises, conclusion, proof lines and hint counts from a journal state
+        self.problem = shared_problem(tuple(state['premises']), state['conclusion'])
+        self.hint_count.update(state['hints'])
+        for line_number, premise in enumerate(self.problem.premises, start=1):
+            self.checker.add_line(line_number, 'Premise', parse_formula(premise))
+        for line_number, line_dep, proof_step, rule_applied in state['lines']:
+            self.checker.add_line(line_number, line_dep, parse_formula(proof_step), rule_applied)
+        # Lines left broken by an edit before the crash are marked again
+        for line_number, _, _, _ in state['lines']:
+            self.checker.verify(line_number)
+
+    def start_tutor(self, resume=None):
+        # resume is a session state from sessionJournal.load_session() to continue instead of starting afresh
+        try:
+            self.run_tutor(resume)
+        finally:
+            if self.journal is not None:
+                self.journal.close()
+            if self.session_events is not None:
+                self.session_events.flush()
+
+    def run_tutor(self, resume):
+        self.io.show("\nWelcome to the Logic and Proof Tutor CLI!")
+        self.io.show(f"Propositional connectives = {' , '.join((NOT, *BINARY_OPERATORS))} ")
+        self.io.show("Variables allowed: p , q , a")
+        self.io.show(f"Rules Applied: {', '.join(RULES)}\n")
+        if self.auto_justify:
+            self.io.show("Auto-justify is on: leave RuleApplied empty to have the rule and line numbers found for you.\n")
+        if resume is None:
+            premises = self.get_user_proposition()
+            self.problem = shared_problem(tuple(premises), self.get_user_conclusion())
+            if self.journal is not None:
+                self.journal.record_problem(self.problem.premises, self.problem.conclusion)
+            if self.events is not None:
+                self.session_events = self.events.start_session(self.problem.premises, self.problem.conclusion)
+            self.check_entailment()
+        else:
+            self.restore_session(resume)
+            if self.events is not None:
+                self.session_events = self.events.start_session(self.problem.premises, self.problem.conclusion, resumed=True)
+        while self.problem.premises:
             self.display_problem()
-            self.initialize_proof_with_premises()
+            if resume is None:
+                self.initialize_proof_with_premises()
+            else:
+                self.io.show(f"Resuming your proof at line {len(self.proof_steps) + 1}.")
+                self.evaluate_user_input()
             self.get_user_input()
             self.evaluate_user_input()
-            print(f"\nNumber of Low-Level Hints (LH): {self.hint_count['LH']}")
-            print(f"Number of High-Level Hints (HH): {self.hint_count['HH']}")
+            self.io.show(f"\nNumber of Low-Level Hints (LH): {self.hint_count['LH']}")
+            self.io.show(f"Number of High-Level Hints (HH): {self.hint_count['HH']}")
             return
         
-        print("Congratulations! You have completed all premises in the tutor.")
+        self.io.show("Congratulations! You have completed all premises in the tutor.")
 
 if __name__ == "__main__":
-    tutor = LogicProofTutor()
-    tutor.start_tutor()
+    import argparse  # only needed when run as a program
+    parser = argparse.ArgumentParser(description="Logic and Proof Tutor CLI.")
+    parser.add_argument("--auto-justify", action="store_true", help="Find the rule and line references when RuleApplied is left empty.")
+    parser.add_argument("--journal", help="Record the session in this journal file so it can be resumed.")
+    parser.add_argument("--resume", action="store_true", help="Continue the session recorded in --journal.")
+    parser.add_argument("--accept-equivalent", action="store_true", help="Accept a proof ending in any formula logically equivalent to the goal.")
+    parser.add_argument("--metrics", help="Time the tutor's hot paths and write the results here when the session ends (.json for JSON, otherwise Prometheus text).")
+    parser.add_argument("--profile", help="Run the session under cProfile and write the stats to this file.")
+    parser.add_argument("--rules", help="JSON rule set adding, replacing or removing rules (see ruleSchemas.py).")
+    parser.add_argument("--events", help="Append the session's learner events (steps, hints, resets, checks) to this file.")
+    args = parser.parse_args()
+
+    if args.rules:
+        from ruleSchemas import RuleSchemaError, load_rule_set
+        try:
+            install_rules(load_rule_set(args.rules))
+        except (OSError, RuleSchemaError) as e:
+            parser.error(f"cannot use the rule set: {e}")
+
+    journal = resume = None
+    if args.journal:
+        from sessionJournal import SessionJournal, load_session
+        loaded = load_session(args.journal) if args.resume else None
+        if args.resume and loaded is None:
+            print(f"No session journal at {args.journal}; starting a new session.")
+        if loaded is not None and loaded[0]['conclusion'] is not None:
+            resume = loaded[0]
+            journal = SessionJournal(args.journal, resume=loaded)
+        else:
+            journal = SessionJournal(args.journal)
+    elif args.resume:
+        parser.error("--resume needs --journal")
+    registry = None
+    if args.metrics:
+        import metrics
+        registry = metrics.enable()
+    events = None
+    if args.events:
+        from learnerAnalytics import EventLog
+        events = EventLog(args.events)
+    tutor = LogicProofTutor(auto_justify=args.auto_justify, journal=journal, accept_equivalent=args.accept_equivalent, events=events)
+    try:
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.runcall(tutor.start_tutor, resume)
+            finally:
+                profiler.dump_stats(args.profile)
+        else:
+            tutor.start_tutor(resume)
+    finally:
+        if registry is not None:
+            registry.write(args.metrics)
+        if events is not None:
+            events.close()
@@ -0,0 +1,179 @@
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+
+
+# Upper bounds in seconds of the latency histogram buckets. The long ones are for the time
+# spent waiting on the student.
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0)
+# Prefix of every exported metric name
+PREFIX = "logic_tutor_"
+
+HOOKS = []  # (module name, qualified name, metric, help, label) of every instrumented function
+registry = None  # the Metrics being collected into, or None while instrumentation is off
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # per bucket, the last one for anything above BUCKETS[-1]
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        # Prometheus buckets: observations at or below each bound, ending with +Inf
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class Metrics:
+    # Latency histograms keyed by metric and label. One instance collects for every session in
+    # the process; observe() may be called from any thread.
+    def __init__(self):
+        self.histograms = {}  # (metric, ((label, value), ...)) -> Histogram
+        self.help = {}  # metric -> description
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def observe(self, metric, labels, seconds):
+        with self.lock:
+            histogram = self.histograms.get((metric, labels))
+            if histogram is None:
+                histogram = self.histograms[(metric, labels)] = Histogram()
+            histogram.observe(seconds)
+
+    def series(self):
+        # metric -> [(labels, Histogram copy), ...], sorted, taken under the lock
+        with self.lock:
+            grouped = {}
+            for (metric, labels), histogram in sorted(self.histograms.items()):
+                copy = Histogram()
+                copy.counts, copy.count, copy.sum = list(histogram.counts), histogram.count, histogram.sum
+                grouped.setdefault(metric, []).append((labels, copy))
+            return grouped
+
+    def to_json(self):
+        import json  # only needed once metrics are exported
+        metrics = {}
+        for metric, series in self.series().items():
+            metrics[metric] = {
+                'help': self.help.get(metric, ""),
+                'series': [
+                    {'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum, 'buckets': histogram.cumulative()}
+                    for labels, histogram in series
+                ],
+            }
+        return json.dumps({'buckets': list(BUCKETS) + ['+Inf'], 'metrics': metrics}, ensure_ascii=False, indent=2) + "\n"
+
+    def to_prometheus(self):
+        # Prometheus text exposition format, one histogram per metric
+        lines = []
+        for metric, series in self.series().items():
+            name = f"{PREFIX}{metric}_seconds"
+            lines.append(f"# HELP {name} {self.help.get(metric, '')}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series:
+                pairs = [f"{label}={quote(value)}" for label, value in labels]
+                bounds = [repr(float(bound)) for bound in BUCKETS] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.cumulative()):
+                    lines.append(f"{name}_bucket{{{','.join(pairs + ['le=' + quote(bound)])}}} {count}")
+                selector = "{" + ",".join(pairs) + "}" if pairs else ""
+                lines.append(f"{name}_sum{selector} {histogram.sum!r}")
+                lines.append(f"{name}_count{selector} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # A path ending in .json gets the JSON dump, anything else Prometheus text. The file is
+        # replaced atomically, so a scraper never reads half of it.
+        with self.write_lock:
+            text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+            temporary = path + ".tmp"
+            with open(temporary, 'w', encoding='utf-8') as handle:
+                handle.write(text)
+            os.replace(temporary, path)
+
+
+def quote(value):
+    # Label value as a quoted Prometheus string
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'"{escaped}"'
+
+
+def timing_wrapper(function, metric, label):
+    label_name, label_value = label if label is not None else (None, None)
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            active = registry
+            if active is not None:
+                if label_name is None:
+                    labels = ()
+                elif callable(label_value):
+                    labels = ((label_name, label_value(*args, **kwargs)),)
+                else:
+                    labels = ((label_name, label_value),)
+                active.observe(metric, labels, time.perf_counter() - start)
+    timed.instrumented = True
+    return timed
+
+
+def instrumented(metric, help, label=None):
+    # Marks a hot path to be timed as metric while instrumentation is on. The function is
+    # returned unchanged and enable() installs the timing wrapper in its place, so a hook costs
+    # nothing while instrumentation is off. label is (name, value) where value is a constant or
+    # a function of the call's arguments.
+    def mark(function):
+        HOOKS.append((function.__module__, function.__qualname__, metric, help, label))
+        if registry is not None:
+            registry.help[metric] = help
+            return timing_wrapper(function, metric, label)
+        return function
+    return mark
+
+
+def hook_owner(module_name, qualified_name):
+    # The class or module holding an instrumented function, and its attribute name there
+    owner = sys.modules.get(module_name)
+    *path, name = qualified_name.split('.')
+    for part in path:
+        owner = getattr(owner, part, None)
+    return owner, name
+
+
+def enable(metrics=None):
+    # Start timing every instrumented function into metrics (a new Metrics by default) and
+    # return it. Modules imported later are timed from the start.
+    global registry
+    registry = metrics if metrics is not None else Metrics()
+    for module_name, qualified_name, metric, help, label in HOOKS:
+        registry.help[metric] = help
+        owner, name = hook_owner(module_name, qualified_name)
+        function = getattr(owner, name, None)
+        if function is not None and not getattr(function, 'instrumented', False):
+            setattr(owner, name, timing_wrapper(function, metric, label))
+    return registry
+
+
+def disable():
+    # Put the original functions back and stop collecting
+    global registry
+    registry = None
+    for module_name, qualified_name, _, _, _ in HOOKS:
+        owner, name = hook_owner(module_name, qualified_name)
+        function = getattr(owner, name, None)
+        if getattr(function, 'instrumented', False):
+            setattr(owner, name, function.__wrapped__)
@@ -0,0 +1,339 @@
+import argparse
+import json
+from bisect import bisect
+import os
+import random
+import sys
+from collections import deque
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor
+
+from formula import VAR, NOT, AND, OR, IMPLIES, CONNECTIVES, Var, make
+from prover import Prover, DEFAULT_TIME_BUDGET
+from truthTable import TruthTable, variables_of
+from sequentStore import sequent_text
+
+
+# Variable names in the order they are used. The interactive tutor accepts p, q and a, so
+# problems with up to three variables can be typed into it unchanged.
+VARIABLE_NAMES = ('p', 'q', 'a', 'r', 's', 't', 'u', 'v', 'w', 'x', 'y', 'z')
+# Relative frequency of each connective; the tutor's rules cover ∧, ∨, → and ¬
+DEFAULT_CONNECTIVES = {AND: 3, OR: 2, IMPLIES: 3, NOT: 2}
+# Chance that a position below the root becomes a leaf before the depth limit is reached
+LEAF_CHANCE = 0.3
+# Chance that a leaf of a conclusion is a sub-formula of a premise rather than a variable;
+# conclusions built from the premises' parts are far more often entailed by them
+REUSE_CHANCE = 0.5
+# Candidates tried per accepted problem before a worker gives up on its chunk
+MAX_ATTEMPTS_PER_PROBLEM = 10000
+# Draws of a premise before a tautology is kept (and the candidate rejected)
+MAX_PREMISE_DRAWS = 100
+# Chunks in a row that may bring only duplicates before the settings count as used up
+MAX_STALE_CHUNKS = 8
+
+# Output, one problem per line. JSON lines are read by sequentStore and match batchGrader:
+#   {"id": "g1", "premises": ["p → q", "p"], "conclusion": "q ∨ a", "variables": 3, "steps": 2}
+# ("steps" only when a step range was asked for), or text lines "p → q , p ⊢ q ∨ a".
+
+
+def parse_connectives(text):
+    # "∧=3,∨=2,→=3,¬=2" -> {connective: weight}
+    mix = {}
+    for part in text.split(','):
+        connective, _, weight = part.strip().partition('=')
+        connective = connective.strip()
+        if connective not in CONNECTIVES:
+            raise ValueError(f"Unknown connective {connective!r}.")
+        mix[connective] = float(weight) if weight else 1.0
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("At least one connective needs a positive weight.")
+    return mix
+
+
+def parse_range(text):
+    # "2" -> (2, 2), "1-3" -> (1, 3)
+    low, _, high = text.partition('-')
+    low = int(low)
+    high = int(high) if high else low
+    if low < 0 or high < low:
+        raise ValueError(f"Bad range {text!r}.")
+    return low, high
+
+
+def sub_formulas(formulas):
+    # Every distinct compound sub-formula of the given formulas
+    found = []
+    seen = set()
+    stack = list(formulas)
+    while stack:
+        node = stack.pop()
+        if node in seen or node.op == VAR:
+            continue
+        seen.add(node)
+        found.append(node)
+        stack.extend(node.args)
+    return found
+
+
+def proof_length(derivation):
+    # Lines a student adds after the premises to follow a derivation
+    seen = set()
+    stack = [derivation]
+    count = 0
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if node.rule != 'Premise':
+            count += 1
+        stack.extend(node.children)
+    return count
+
+
+class SequentGenerator:
+    # Produces random valid sequents by rejection sampling. A candidate's validity is read off
+    # packed truth-table columns (one bitwise operation per connective for all rows at once),
+    # so invalid candidates cost microseconds. The prover only runs when a range of proof
+    # lengths is asked for, and then only on candidates that are already known to be valid.
+    def __init__(self, variables=3, depth=3, premises=(1, 3), connectives=None, conclusion_depth=2,
+                 steps=None, time_budget=DEFAULT_TIME_BUDGET, seed=None):
+        if not 1 <= variables <= len(VARIABLE_NAMES):
+            raise ValueError(f"Between 1 and {len(VARIABLE_NAMES)} variables are supported.")
+        self.rng = random.Random(seed)
+        self.variables = [Var(name) for name in VARIABLE_NAMES[:variables]]
+        self.depth = depth
+        self.premise_counts = premises
+        self.conclusion_depth = conclusion_depth
+        mix = connectives if connectives is not None else DEFAULT_CONNECTIVES
+        self.connectives = [connective for connective, weight in mix.items() if weight > 0]
+        self.cumulative_weights = list(accumulate(mix[connective] for connective in self.connectives))
+        self.steps = steps  # (fewest, most) proof lines after the premises, or None to skip proving
+        self.time_budget = time_budget
+        self.table = TruthTable([], [variable.name for variable in self.variables])
+        self.counts = {'tried': 0, 'invalid': 0, 'trivial': 0, 'steps': 0, 'redrawn': 0}
+
+    def formula(self, leaves, depth):
+        # Random formula of at most the given depth whose root is a connective
+        uniform = self.rng.random
+        connectives, cumulative_weights = self.connectives, self.cumulative_weights
+        total_weight = cumulative_weights[-1]
+        results = []
+        stack = [(depth, None)]
+        while stack:
+            remaining, connective = stack.pop()
+            if connective is not None:
+                if connective == NOT:
+                    results.append(make(NOT, results.pop()))
+                else:
+                    right = results.pop()
+                    results.append(make(connective, results.pop(), right))
+            elif remaining == 0 or (remaining < depth and uniform() < LEAF_CHANCE):
+                results.append(leaves[int(uniform() * len(leaves))])
+            else:
+                connective = connectives[bisect(cumulative_weights, uniform() * total_weight)]
+                stack.append((remaining, connective))
+                stack.extend([(remaining - 1, None)] * (1 if connective == NOT else 2))
+        return results[0]
+
+    def premise(self):
+        # A random premise, redrawn while it is a tautology (which would add nothing to the
+        # problem) rather than discarding the whole candidate
+        table = self.table
+        for _ in range(MAX_PREMISE_DRAWS):
+            premise = self.formula(self.variables, self.depth)
+            if table.column(premise) != table.full:
+                break
+            self.counts['redrawn'] += 1
+        return premise
+
+    def candidate(self):
+        count = self.rng.randint(*self.premise_counts)
+        premises = [self.premise() for _ in range(count)]
+        parts = sub_formulas(premises)
+        if parts and self.rng.random() < REUSE_CHANCE:
+            leaves = self.variables + parts
+        else:
+            leaves = self.variables
+        return premises, self.formula(leaves, max(self.conclusion_depth, 1))
+
+    def check(self, premises, conclusion):
+        # Reason a candidate is rejected ('invalid', 'trivial' or 'steps'), or None with the
+        # proof length (None when not proved) as (None, steps)
+        table = self.table
+        if len(table.columns) > 100000:
+            table.columns = {}  # the column cache would otherwise grow with every candidate
+        full = table.full
+        satisfied = full
+        for premise in premises:
+            column = table.column(premise)
+            if column == full:
+                return 'trivial', None  # only tautologies were drawn for this premise
+            satisfied &= column
+        if not satisfied or conclusion in premises:
+            return 'trivial', None  # contradictory premises, or the conclusion is already given
+        conclusion_column = table.column(conclusion)
+        if satisfied & (full ^ conclusion_column):
+            return 'invalid', None
+        if premises and conclusion_column == full:
+            return 'trivial', None  # valid without the premises
+        if len(variables_of(premises + [conclusion])) != len(self.variables):
+            return 'trivial', None  # does not use the requested number of variables
+        if self.steps is None:
+            return None, None
+        derivation = Prover(time_budget=self.time_budget).prove(premises, conclusion)
+        if derivation is None:
+            return 'steps', None
+        steps = proof_length(derivation)
+        if not self.steps[0] <= steps <= self.steps[1]:
+            return 'steps', None
+        return None, steps
+
+    def generate(self, count):
+        # Yield (premises, conclusion, steps) for count accepted sequents
+        produced = 0
+        attempts = 0
+        while produced < count:
+            attempts += 1
+            if attempts > MAX_ATTEMPTS_PER_PROBLEM * count:
+                return  # settings that (almost) never yield a valid sequent
+            premises, conclusion = self.candidate()
+            self.counts['tried'] += 1
+            rejected, steps = self.check(premises, conclusion)
+            if rejected is not None:
+                self.counts[rejected] += 1
+                continue
+            produced += 1
+            yield premises, conclusion, steps
+
+
+def generate_chunk(settings, chunk, count):
+    # Worker entry point: `count` problems from the chunk's own random stream. Chunk seeds are
+    # derived from the run's seed, so a seeded run gives the same bank with any worker count.
+    settings = dict(settings)
+    seed = settings.pop('seed')
+    generator = SequentGenerator(seed=f"{seed}:{chunk}", **settings)
+    problems = [
+        ([str(premise) for premise in premises], str(conclusion), steps)
+        for premises, conclusion, steps in generator.generate(count)
+    ]
+    return problems, generator.counts
+
+
+def generate_stream(settings, count, workers=None, chunksize=256, totals=None):
+    # Yield (premises, conclusion, steps) for up to `count` distinct problems, with a bounded
+    # number of chunks in flight. Rejection counts are added up in totals if it is given.
+    # Settings that allow fewer distinct sequents than `count` end the stream early, once
+    # MAX_STALE_CHUNKS chunks in a row have added nothing new.
+    workers = workers or os.cpu_count() or 1
+    totals = totals if totals is not None else {}
+    seen = set()
+    produced = 0
+    stale = 0  # chunks in a row without a new problem
+    chunks = iter(range(sys.maxsize))
+
+    def exhausted(before):
+        nonlocal stale
+        stale = stale + 1 if produced == before else 0
+        return stale >= MAX_STALE_CHUNKS
+
+    def accept(results):
+        nonlocal produced
+        problems, counts = results
+        for name, value in counts.items():
+            totals[name] = totals.get(name, 0) + value
+        for premises, conclusion, steps in problems:
+            if produced == count:
+                return
+            key = sequent_text(sorted(premises), conclusion)
+            if key in seen:
+                totals['duplicate'] = totals.get('duplicate', 0) + 1
+                continue
+            seen.add(key)
+            produced += 1
+            yield premises, conclusion, steps
+
+    if workers == 1:
+        for chunk in chunks:
+            results = generate_chunk(settings, chunk, chunksize)
+            before = produced
+            yield from accept(results)
+            if produced == count or not results[0] or exhausted(before):
+                return
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        try:
+            while produced < count:
+                while len(in_flight) < workers * 2:
+                    in_flight.append(executor.submit(generate_chunk, settings, next(chunks), chunksize))
+                results = in_flight.popleft().result()
+                before = produced
+                yield from accept(results)
+                if not results[0] or exhausted(before):
+                    return
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate random valid sequents for problem banks and load tests.")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="Number of distinct problems to generate.")
+    parser.add_argument("--variables", type=int, default=3, help="Variables in every problem (p, q, a, r, ...).")
+    parser.add_argument("--depth", type=int, default=3, help="Greatest connective depth of a premise.")
+    parser.add_argument("--conclusion-depth", type=int, default=2, help="Greatest connective depth of the conclusion.")
+    parser.add_argument("--premises", type=parse_range, default=(1, 3), help="Number of premises, e.g. 2 or 1-3.")
+    parser.add_argument("--connectives", type=parse_connectives, default=None,
+                        help="Connective mix as weights, e.g. '∧=3,∨=2,→=3,¬=2' (the default). The hint prover has no rules for ⊕ and ↔.")
+    parser.add_argument("--steps", type=parse_range, default=None,
+                        help="Keep only problems the prover solves in this many lines after the premises, e.g. 3-10.")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET, help="Proof search time per problem for --steps.")
+    parser.add_argument("--seed", default=None, help="Seed for a reproducible bank.")
+    parser.add_argument("--format", choices=('json', 'text'), default='json', help="JSON lines or 'premises ⊢ conclusion' text.")
+    parser.add_argument("-o", "--output", help="Write problems here instead of stdout.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--chunksize", type=int, default=256, help="Problems generated by a worker at a time.")
+    args = parser.parse_args(argv)
+
+    settings = {
+        'variables': args.variables, 'depth': args.depth, 'premises': args.premises,
+        'connectives': args.connectives, 'conclusion_depth': args.conclusion_depth,
+        'steps': args.steps, 'time_budget': args.time_budget,
+        'seed': args.seed if args.seed is not None else random.randrange(2 ** 32),
+    }
+    try:
+        SequentGenerator(**settings)  # report bad settings before starting the workers
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    totals = {'tried': 0, 'invalid': 0, 'trivial': 0, 'steps': 0, 'redrawn': 0, 'duplicate': 0}
+    produced = 0
+    try:
+        for premises, conclusion, steps in generate_stream(settings, args.count, args.workers, args.chunksize, totals):
+            produced += 1
+            if args.format == 'text':
+                output.write(sequent_text(premises, conclusion) + "\n")
+            else:
+                problem = {'id': f"g{produced}", 'premises': premises, 'conclusion': conclusion, 'variables': args.variables}
+                if steps is not None:
+                    problem['steps'] = steps
+                output.write(json.dumps(problem, ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(
+        f"Generated {produced} problems from {totals['tried']} candidates: {totals['invalid']} invalid, "
+        f"{totals['trivial']} trivial ({totals['redrawn']} tautological premises redrawn), {totals['steps']} outside the step range, {totals['duplicate']} duplicates.",
+        file=sys.stderr,
+    )
+    if produced < args.count:
+        print("These settings rarely give a valid sequent; try more premises or a shallower conclusion.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
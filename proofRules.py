@@ -1,315 +1,107 @@
-class ProofRules:
-    def __init__(self,proof_steps):
-        self.proof_steps = proof_steps  # Store the current proof steps
-    
-    def check_rule_syntax(self, rule_applied):
-         # Allow "None" as a valid input for rule_applied, indicating no rule is applied
-        if rule_applied.strip().lower() == "none":
-            return True, "No rule applied."
-        
-        # Split the rule_applied string into the numeric part and the rule abbreviation
-        parts = rule_applied.split(" ")
-        if len(parts) != 2:
-            return False, "Incorrect format. Expected format: '1,2 ∧I or None'"
-
-        line_refs, rule = parts
-        # Check if line references are valid (either a single number or multiple numbers separated by commas)
-        if not all(ref.isdigit() for ref in line_refs.split(",")):
-            return False, "Line references must be numbers separated by commas."
-
-        # Check if the rule abbreviation is valid (you might want to expand this check based on your available rules)
-        valid_rules = {"∧I", "∧E", "∨I", "∨E", "→I", "→E", "¬I", "¬E"}  # Add all your rule abbreviations here
-        if rule not in valid_rules:
-            return False, f"Invalid rule. Expected one of {', '.join(valid_rules)}"
-
-        # If everything checks out, return True
-        return True, "Rule syntax is valid."
-    
-    
-    def and_introduction(self, proof_step, rule_applied):
-        # Split the rule_applied string to get line references and the rule abbreviation
-        try:
-            line_refs_str, rule = rule_applied.split(" ")
-            if rule != "∧I":
-                return False, "The rule applied is not and introduction (∧I)."
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '1,2 ∧I'."
-
-        # Convert line references from string to list of integers
-        try:
-            line_refs = [int(ref) for ref in line_refs_str.split(",")] 
-            if len(line_refs) != 2:
-                return False, "And introduction (∧I) requires exactly two line reference."
-        except ValueError:
-            return False, "Line references must be integers."
-
-        # Retrieve the propositions from the referenced lines
-        try:
-            line_props = [self.proof_steps[line_ref]['step'] for line_ref in line_refs]
-        except KeyError as e:
-            return False, f"Referenced line number {e.args[0]} does not exist in proof steps."
-        
-        # Construct the expected proof step based on the ∧I rule
-        expected_proof_step = [
-        f"({line_props[0]}) ∧ ({line_props[1]})", f"{line_props[0]} ∧ {line_props[1]}", f"({line_props[0]}) ∧ {line_props[1]}", f"{line_props[0]} ∧ ({line_props[1]})", f"({line_props[1]}) ∧ ({line_props[0]})",f"{line_props[1]} ∧ {line_props[0]}", f"({line_props[1]}) ∧ {line_props[0]}", f"{line_props[1]} ∧ ({line_props[0]})"   
-        ]
-        
-        # Check if the constructed proof step matches the user's proof step
-        if proof_step in expected_proof_step:
-            return True, "∧I rule applied correctly."
-        else:
-            return False, f"∧I rule not applied correctly."
-
-
-    def and_elimination(self, proof_step, rule_applied):
-        # Split the rule_applied string to get the line reference and the rule abbreviation
-        try:
-            line_ref_str, rule = rule_applied.split(" ")
-            if rule != "∧E":
-                return False, "The rule applied is not and elimination (∧E)."
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '1 ∧E'."
-
-        # Convert line reference from string to integer
-        try:
-            line_ref = int(line_ref_str)
-        except ValueError:
-            return False, "Line reference must be an integer."
-        
-        # Retrieve the proposition from the referenced line
-        try:
-            line_prop = self.proof_steps[line_ref]['step']
-        except KeyError as e:
-            return False, f"Referenced line number {e.args[0]} does not exist in proof steps."
-        
-        # Remove brackets for comparison, if present
-        line_prop = line_prop.strip("()")
+import re
+import sys
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
 
-        # Check if the referenced line's proposition is a conjunction
-        if '∧' not in line_prop:
-            return False, "The referenced line's proposition is not a conjunction."
+from formula import AND, OR, IMPLIES, NOT, Not, as_formula, canonical, conjuncts
+from metrics import instrumented
+from ruleSchemas import BUILTIN_RULES, RuleSchemaError, compile_rule, line_count, usage_message
 
-        # Split the conjunction to get the individual propositions
-        conjuncts = line_prop.split('∧')
-        # Trim whitespace around the conjuncts
-        conjuncts = [conjunct.strip() for conjunct in conjuncts]
 
-        # Check if the proof step matches either of the conjuncts
-        if proof_step.strip() in conjuncts:
-            return True, "∧E rule applied correctly."
-        else:
-            return False, "∧E rule not applied correctly. The proof step must match one of the conjuncts in the referenced line's proposition."
+# A parsed rule application such as "1,2 ∧I": a tuple of line numbers and the rule abbreviation
+RuleReference = namedtuple('RuleReference', ['line_refs', 'rule'])
 
 
-    def or_introduction(self, proof_step, rule_applied):
-        # Split the rule_applied string to get line references and the rule abbreviation
-        try:
-            line_refs_str, rule = rule_applied.split(" ")
-            if rule != "∨I":
-                return False, "The rule applied is not or introduction (∨I)."
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '1 ∨I'."
+class ProofLine:
+    # One stored proof line: its LineDep text, formula node and rule application text (None
+    # for premises), plus the rule reference a ProofChecker parsed from it. Every session
+    # keeps one per line, so it is slotted and its texts are interned; the formula nodes are
+    # shared already.
+    __slots__ = ('line_dep', 'step', 'rule', 'reference')
 
-        # Convert line references from string to list of integers
-        try:
-            line_refs = [int(ref) for ref in line_refs_str.split(",")]
-            if len(line_refs) != 1:
-                return False, "Or introduction (∨I) requires exactly one line reference."
-        except ValueError:
-            return False, "Line references must be integers."
+    def __init__(self, line_dep, step, rule=None):
+        self.line_dep = interned(line_dep)
+        self.step = step
+        self.rule = interned(rule)
+        self.reference = None  # RuleReference, or None for premises and unchecked lines
 
-        # Retrieve the proposition from the referenced line
-        try:
-            line_prop = self.proof_steps[line_refs[0]]['step']
-        except KeyError as e:
-            return False, f"Referenced line number {e.args[0]} does not exist in proof steps."
-        
-        # Remove outer brackets from proof_step for comparison, if present
-        proof_step_normalized = proof_step.strip("()")
 
-       # Check if the proof_step is in the form "line_prop ∨ something" or "something ∨ line_prop"
-        if proof_step_normalized.startswith(line_prop + " ∨") or proof_step_normalized.endswith("∨ " + line_prop):
-            return True, "∨I rule applied correctly."
-        else:
-            return False, "∨I rule not applied correctly. The proof step must include the proposition from the referenced line followed by '∨' and any other proposition."
+def interned(text):
+    # The one shared copy of a short text such as "1,2" or "1,2 ∧I"
+    return sys.intern(text) if type(text) is str else text
 
-    def or_elimination(self, proof_step, rule_applied):
-        # Split the rule_applied string to get the line references and the rule abbreviation
-        try:
-            line_refs_str, rule = rule_applied.split(" ")
-            if rule != "∨E":
-                return False, "The rule applied is not or elimination (∨E)."
-            disjunction_ref, assumption1_ref, conclusion1_ref, assumption2_ref, conclusion2_ref = map(int, line_refs_str.split(","))
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '1,2,5,6,11 ∨E'."
-
-        # Retrieve and check the disjunction
-        try:
-            disjunction = self.proof_steps[disjunction_ref]['step']
-        except KeyError:
-            return False, f"Referenced disjunction line number {disjunction_ref} does not exist in proof steps."
-        if '∨' not in disjunction:
-            return False, "The referenced line's proposition is not a disjunction."
 
-        # Check the assumptions
-        try:
-            assumption1 = self.proof_steps[assumption1_ref]['step']
-            assumption2 = self.proof_steps[assumption2_ref]['step']
-        except KeyError as e:
-            return False, f"Referenced assumption line number {e.args[0]} does not exist in proof steps."
-
-        # Retrieve and check the conclusions derived from the assumptions
-        try:
-            conclusion1 = self.proof_steps[conclusion1_ref]['step']
-            conclusion2 = self.proof_steps[conclusion2_ref]['step']
-        except KeyError as e:
-            return False, f"Referenced conclusion line number {e.args[0]} does not exist in proof steps."
-
-        # Check if the conclusions match the proof step
-        if conclusion1 != proof_step or conclusion2 != proof_step:
-            return False, "The conclusions derived from the assumptions do not match the proof step."
+@lru_cache(maxsize=4096)
+def parse_rule_reference(rule_applied):
+    # Parse a rule application such as "1,2 ∧I" once into a RuleReference.
+    # Returns (reference, message); reference is None when the text is not a valid application.
+    # Split the rule_applied string into the numeric part and the rule abbreviation
+    parts = rule_applied.split(" ")
+    if len(parts) != 2:
+        return None, "Incorrect format. Expected format: '1,2 ∧I or None'"
 
-        # Check if the disjunction matches the assumptions
-        if assumption1 not in disjunction or assumption2 not in disjunction:
-            return False, "The assumptions do not match the disjunction."
+    line_refs, rule = parts
+    # Check if line references are valid (either a single number or multiple numbers separated by commas)
+    line_refs = line_refs.split(",")
+    if not all(ref.isdigit() for ref in line_refs):
+        return None, "Line references must be numbers separated by commas."
 
-        return True, "∨E rule applied correctly."
+    # Check if the rule abbreviation is one of the registered rules
+    if rule not in RULES:
+        return None, f"Invalid rule. Expected one of {', '.join(RULES)}"
 
+    # Check the rule gets the number of line references it needs
+    line_refs = tuple(int(ref) for ref in line_refs)
+    if len(line_refs) != RULES[rule].line_count:
+        return None, RULES[rule].usage
 
-    def implies_introduction(self, proof_step, rule_applied):
-        try:
-            # Split the rule_applied string to get line references and the rule abbreviation
-            line_refs_str, rule = rule_applied.split(" ")
-            if rule != "→I":
-                return False, "The rule applied is not implies introduction (→I)."
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '3,5 →I'."
-
-        # Attempt to extract start and end lines of the subproof
-        try:
-            start_line, end_line = [int(ref) for ref in line_refs_str.split(",")]
-        except ValueError:
-            return False, "Line references for →I must specify the start and end lines of the subproof, e.g., '3,5'."
+    return RuleReference(line_refs, rule), "Rule syntax is valid."
 
-        # Validate that start_line is before end_line
-        if start_line >= end_line:
-            return False, "In the rule application, the start line must precede the end line."
-        
-            # Check if the start line is marked as a temporary assumption
-        try:
-            if 'Premise' not in self.proof_steps[start_line]['line_dep']:
-                return False, "The start line is not marked as a assumption."
-        except KeyError:
-            return False, f"Referenced start line number {start_line} does not exist in proof steps."
 
-        # Check if the end_line's proof step matches the desired conclusion B
-        try:
-            conclusion = self.proof_steps[end_line]['step']
-        except KeyError:
-            return False, f"Referenced end line number {end_line} does not exist in proof steps."
+class ProofRules:
+    __slots__ = ('proof_steps',)
 
-        # Assuming the start line contains the temporary assumption A
-        try:
-            assumption = self.proof_steps[start_line]['step']
-        except KeyError:
-            return False, f"Referenced start line number {start_line} does not exist in proof steps."
+    def __init__(self,proof_steps):
+        self.proof_steps = proof_steps  # Store the current proof steps
 
-        # Construct the expected proof step based on the →I rule
-        expected_proof_step = f"{assumption} → {conclusion}"
+    def line_formula(self, line_ref):
+        # Return the formula node stored on a proof line (raises KeyError if the line is missing)
+        return as_formula(self.proof_steps[line_ref].step)
+    
+    def check_rule_syntax(self, rule_applied):
+         # Allow "None" as a valid input for rule_applied, indicating no rule is applied
+        if rule_applied.strip().lower() == "none":
+            return True, "No rule applied."
         
-        # Check if the constructed proof step matches the user's proof step
-        if proof_step == expected_proof_step:
-            return True, "→I rule applied correctly."
-        else:
-            return False, f"→I rule not applied correctly."
-
-
-
-    def implies_elimination(self, proof_step, rule_applied):
-        # Split the rule_applied string to get the line references and the rule abbreviation (Modus Ponens)
-        try:
-            line_refs_str, rule = rule_applied.split(" ")
-            if rule != "→E":
-                return False, "The rule applied is not implies elimination (→E)."
-            line_refs = list(map(int, line_refs_str.split(",")))
-            if len(line_refs) != 2:
-                return False, "Expected two line references for →E rule."
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '1,2 →E', where 1 is the line with A → B and 2 is the line with A, or vice versa."
-
-        # Retrieve propositions from the referenced lines
-        try:
-            proposition1 = self.proof_steps[line_refs[0]]['step']
-            proposition2 = self.proof_steps[line_refs[1]]['step']
-        except KeyError as e:
-            return False, f"Referenced line number {e.args[0]} does not exist in proof steps."
-
-        # Determine which proposition is the implication and which is the antecedent
-        if '→' in proposition1:
-            implication, antecedent = proposition1, proposition2
-        elif '→' in proposition2:
-            implication, antecedent = proposition2, proposition1
-        else:
-            return False, "Neither of the referenced lines contains an implication."
-
-        # Split the implication to get A and B
-        parts = implication.split('→')
-        if len(parts) != 2:
-            return False, "Invalid implication format."
-        antecedent_part, consequent_part = parts
-
-        # Check if the antecedent from the proof matches A from the implication
-        if antecedent.strip() != antecedent_part.strip():
-            return False, "The antecedent from the proof does not match the antecedent in the implication."
-
-        # Check if the conclusion B is the proof step
-        if consequent_part.strip() != proof_step.strip():
-            return False, "The proof step does not match the consequent of the implication." 
-
-        return True, "→E rule applied correctly."
-
+        reference, message = parse_rule_reference(rule_applied)
+        return reference is not None, message
+    
     
+    # A rule method receives the proposed step and the already parsed line references (a
+    # tuple of ints of the length registered in RULES) and returns (valid, message). Most
+    # rules are compiled from schemas (see ruleSchemas.py); only rules whose side condition
+    # is not a pattern are written as methods.
+
     def is_contradiction(self, start_line, end_line):
-        try:
-            # Retrieve the propositions from the specified lines
-            start_proposition = self.proof_steps[start_line]['step']
-            end_proposition = self.proof_steps[end_line]['step']
-
-            # Check for direct contradiction between start and end lines
-            if start_proposition == f"¬{end_proposition}" or end_proposition == f"¬{start_proposition}":
-                return True  # Direct contradiction found
-
-            # Check for inherent contradiction within the end_line proposition (e.g., "P ∧ ¬P")
-            # This simple check splits the end proposition by '∧' and looks for complementary pairs (P and ¬P)
-            if "∧" in end_proposition:
-                parts = [part.strip() for part in end_proposition.split("∧")]
-                for part in parts:
-                    # Check if the negation of this part is also present in the parts list
-                    if (f"¬{part}" in parts) or (part.startswith("¬") and part[1:] in parts):
-                        return True  # Inherent contradiction found within the end_line proposition
-
-            return False  # No contradiction found
-        except KeyError as e:
-            # Handle cases where the specified line numbers do not exist in proof_steps
-            print(f"Line number {e.args[0]} does not exist in proof steps.")
-            return False
+        # Raises KeyError for a line number that does not exist; the caller reports it
+        # Retrieve the propositions from the specified lines
+        start_proposition = self.line_formula(start_line)
+        end_proposition = self.line_formula(end_line)
 
+        # Check for direct contradiction between start and end lines
+        if start_proposition is Not(end_proposition) or end_proposition is Not(start_proposition):
+            return True  # Direct contradiction found
 
+        # Check for inherent contradiction within the end_line proposition (e.g., "P ∧ ¬P")
+        return is_self_contradictory(end_proposition)
 
-    def not_introduction(self, proof_step, rule_applied):
-        # Split the rule_applied string to get line references and the rule abbreviation
-        try:
-            line_refs_str, rule = rule_applied.split(" ")
-            if rule != "¬I":
-                return False, "The rule applied is not not introduction (¬I)."
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '1,4 ¬I'."
 
-        # Extract start and end lines of the subproof where A leads to a contradiction
-        try:
-            start_line, end_line = [int(ref) for ref in line_refs_str.split(",")]
-        except ValueError:
-            return False, "Line references for ¬I must specify the start and end lines of the subproof, e.g., '1,4'."
+
+    def not_introduction(self, proof_step, line_refs):
+        # Start and end lines of the subproof where A leads to a contradiction
+        start_line, end_line = line_refs
 
         # Ensure the start line is before the end line
         if start_line >= end_line:
@@ -317,107 +109,634 @@ class ProofRules:
 
         # Verify the assumption at the start line (A)
         try:
-            assumption = self.proof_steps[start_line]['step']
+            assumption = self.line_formula(start_line)
         except KeyError:
             return False, f"Referenced start line number {start_line} does not exist in proof steps."
 
          # Check for a contradiction between the start line and the end line, or within the end line itself
-        if not self.is_contradiction(start_line, end_line):
+        try:
+            contradiction = self.is_contradiction(start_line, end_line)
+        except KeyError as e:
+            return False, f"Referenced line number {e.args[0]} does not exist in proof steps."
+        if not contradiction:
             return False, "The proof does not demonstrate a contradiction between the assumption and derived statement, or within the derived statement itself."
 
         # Check if the proof step is the negation of the assumption at the start line
         try:
-            assumption = self.proof_steps[start_line]['step']
-            expected_proof_step = f"¬({assumption})" or f"¬{assumption}"
-            if proof_step != expected_proof_step:
+            assumption = self.line_formula(start_line)
+            expected_proof_step = Not(assumption)
+            if as_formula(proof_step) is not expected_proof_step:
                 return False, f"¬I rule not applied correctly. Expected step: {expected_proof_step}"
         except KeyError:
             return False, f"Referenced line number {start_line} does not exist in proof steps."
 
         return True, "¬I rule applied correctly."
-    
 
-    def not_elimination(self, proof_step, rule_applied):
-        # Split the rule_applied string to get the line reference and the rule abbreviation
-        try:
-            line_ref_str, rule = rule_applied.split(" ")
-            if rule != "¬E":
-                return False, "The rule applied is not negation elimination (¬E)."
-            negation_line_ref = int(line_ref_str)
-        except ValueError:
-            return False, "Rule applied format is incorrect. Expected format: '1 ¬E', where 1 is the line with ¬¬A or ¬(¬A)."
-
-        # Retrieve and check the negation or potential double negation
-        try:
-            negation = self.proof_steps[negation_line_ref]['step']
-        except KeyError:
-            return False, f"Referenced negation line number {negation_line_ref} does not exist in proof steps."
-
-        # Check for double negation ¬¬A and simplify to A
-        if negation.startswith("¬¬"):
-            simplified = negation[2:]  # Remove the first two characters '¬¬' to get A
-        elif negation.startswith("¬(¬"):
-            if negation.endswith(")"):
-                simplified = negation[3:-1]  # Remove '¬(¬' from the start and ')' from the end to get A
-            else:
-                return False, "The negation format is incorrect. Expected ¬(¬A)."
-        else:
-            return False, "¬E rule is not applicable or the statement does not involve a negation pattern that can be eliminated."
 
-        # Compare the simplified statement to the proof_step
-        if simplified.strip() == proof_step.strip():
-            return True, "¬E rule applied correctly for double negation elimination."
+def is_self_contradictory(formula):
+    # True for a conjunction containing some P and ¬P, e.g. "P ∧ ¬P" or "(P ∧ Q) ∧ ¬(P ∧ Q)"
+    if formula.op != AND:
+        return False
+    left, right = formula.args
+    if left is Not(right) or right is Not(left):
+        return True  # The two halves contradict each other
+    # Flatten the conjunction and look for complementary pairs (P and ¬P)
+    parts = set(conjuncts(formula))
+    return any(Not(part) in parts for part in parts)
+
+
+# A supported rule: check(checker, proof_step, line_refs) -> (valid, message), its number of
+# line references, the message shown when that number is wrong, and the subproofs it closes
+# as {end line position: assumption line position}
+RuleSpec = namedtuple('RuleSpec', ['check', 'line_count', 'usage', 'discharges'])
+
+# Registry of supported rules: abbreviation -> RuleSpec, in the order they are listed
+RULES = {}
+# Dispatch table from rule abbreviation to its checking function
+RULE_METHODS = {}
+# Schema rules that StepIndex.candidates has no case for and finds by searching their schemas
+SEARCHED_RULES = []
+
+
+def install_rules(rule_set=None):
+    # Compile the built-in rules, changed by rule_set (see ruleSchemas.load_rule_set), into
+    # the registry. Raises RuleSchemaError for a malformed definition, leaving the registry as
+    # it was. The registry is shared by the whole process, so call this at start-up.
+    definitions = dict(BUILTIN_RULES)
+    for rule, definition in (rule_set or {}).items():
+        if definition is None:
+            definitions.pop(rule, None)
         else:
-            return False, "The proof step does not match the statement obtained by removing double negation."
-
-
-
-    def iff_introduction(self, proof_step):
-        # Implement the logic for checking if the iff-introduction (if and only if) rule is correctly applied in proof_step
-        pass
-
-    def iff_elimination(self, proof_step):
-        # Implement the logic for checking if the iff-elimination (if and only if) rule is correctly applied in proof_step
-        pass
-
-    # Add additional methods for any other rules you need to support
-
-def ruleChecker(proof_step, rule_applied, proof_steps):
-    # Handle the "None" case early to avoid splitting and accessing a non-existent index
-    if rule_applied.strip().lower() == "none":
-        # Return True, indicating no rule needs to be checked, or handle it differently as needed.
-        return True, "No rule needs to be checked."
-    
-    rules = ProofRules(proof_steps)  # Pass the current proof steps to the ProofRules instance
-    syntax_valid, syntax_message = rules.check_rule_syntax(rule_applied)
-
-    if not syntax_valid:
-        return False, syntax_message
-
-    # Safely extract the rule abbreviation from the rule_applied string
-    parts = rule_applied.split(" ")
-    if len(parts) > 1:
-        rule = parts[1]  # Extract the rule abbreviation
-    else:
-        return False, "Rule abbreviation is missing."
-
-    # Call the appropriate method based on the rule abbreviation
-    if rule == "∧I":
-        return rules.and_introduction(proof_step, rule_applied)
-    elif rule == "∨I":
-        return rules.or_introduction(proof_step,rule_applied)
-    elif rule == "→I":
-        return rules.implies_introduction(proof_step,rule_applied)
-    elif rule == "¬I":
-        return rules.not_introduction(proof_step,rule_applied)
-    elif rule == "∧E":
-        return rules.and_elimination(proof_step,rule_applied)
-    elif rule == "∨E":
-        return rules.or_elimination(proof_step,rule_applied)
-    elif rule == "→E":
-        return rules.implies_elimination(proof_step,rule_applied)
-    elif rule == "¬E":
-        return rules.not_elimination(proof_step,rule_applied)
-    
-    # If the rule abbreviation doesn't match any known rule, return an error message
-    return False, "Unknown rule."
+            definitions[rule] = definition
+    if not definitions:
+        raise RuleSchemaError("A rule set must leave at least one rule.")
+
+    rules, searched = {}, []
+    for rule, definition in definitions.items():
+        if 'method' in definition:
+            method = getattr(ProofRules, str(definition['method']), None)
+            if method is None or not callable(method):
+                raise RuleSchemaError(f"Rule {rule} names an unknown method {definition['method']!r}.")
+            try:
+                count = int(definition['lines'])
+                discharges = {int(end): int(start) for end, start in definition.get('discharges', {}).items()}
+            except (KeyError, TypeError, ValueError):
+                raise RuleSchemaError(f"Rule {rule} needs its number of lines and discharges as numbers.") from None
+            rules[rule] = RuleSpec(method, count, usage_message(rule, definition, count), discharges)
+        else:
+            compiled = compile_rule(rule, definition)
+            count = line_count(definition)
+            rules[rule] = RuleSpec(compiled.check, count, usage_message(rule, definition, count), compiled.discharges)
+            if rule not in StepIndex.INDEXED_RULES:
+                searched.append(compiled)
+
+    RULES.clear()
+    RULES.update(rules)
+    RULE_METHODS.clear()
+    RULE_METHODS.update((rule, spec.check) for rule, spec in rules.items())
+    SEARCHED_RULES[:] = searched
+    # Earlier parses and verdicts may refer to rules that changed
+    parse_rule_reference.cache_clear()
+    verdict_cache.clear()
+
+
+def rule_label(rule_applied):
+    # Rule named by a rule application, as a metrics label with a bounded set of values
+    words = rule_applied.split()
+    if not words:
+        return 'missing'
+    if rule_applied.strip().lower() == 'none':
+        return 'assumption'
+    return words[-1] if words[-1] in RULES else 'unknown'
+
+
+def proof_concludes(proof_steps, conclusion, semantic=False, premises=()):
+    # True if the last proof step is the conclusion up to the grouping and order of the operands
+    # of ∧, ∨, ⊕ and ↔, by comparing cached canonical forms. With semantic, a last step that is
+    # logically equivalent to the conclusion also counts; the check goes through the BDDs of
+    # the problem (premises ⊢ conclusion), so the goal built for its entailment check is
+    # shared and checking each step only builds that step. A proof with no steps concludes
+    # nothing.
+    if not proof_steps:
+        return False
+    last_proof_step = as_formula(proof_steps[max(proof_steps.keys())].step)
+    conclusion = as_formula(conclusion)
+    if canonical(last_proof_step) is canonical(conclusion):
+        return True
+    if not semantic:
+        return False
+    import bdd  # only needed for semantic checks
+    try:
+        return bdd.equivalent_to(conclusion, last_proof_step, premises)
+    except bdd.BDDSizeError:
+        import satSolver
+        return satSolver.equivalent(last_proof_step, conclusion)
+
+
+class StepIndex:
+    # Lookup tables over the lines of a proof, updated as lines are added and removed, so the
+    # lines that could justify a new step are found directly instead of by trying every pair
+    # (or 5-tuple) of earlier lines. Each table maps a key to the ascending line numbers it covers.
+    # Rules that candidates() has a dedicated case for; other schema rules are searched for
+    INDEXED_RULES = frozenset(('∧I', '∧E', '∨I', '∨E', '→I', '→E', '¬I', '¬E'))
+    __slots__ = ('by_formula', 'by_connective', 'by_conjunct', 'by_disjunct', 'by_antecedent',
+                 'by_consequent', 'by_assumption', 'by_contradiction', 'entries')
+
+    def __init__(self):
+        self.by_formula = {}        # formula -> lines holding it
+        self.by_connective = {}     # main connective -> lines
+        self.by_conjunct = {}       # X -> conjunctions with X as one side
+        self.by_disjunct = {}       # X -> disjunctions with X as one side
+        self.by_antecedent = {}     # A -> implications A → B
+        self.by_consequent = {}     # B -> implications A → B
+        self.by_assumption = {}     # formula -> lines marked 'Premise' holding it
+        self.by_contradiction = {}  # X ∧ ¬X style formula -> lines holding it
+        self.entries = {}           # line -> the (table, key) pairs it is filed under
+
+    def add(self, line_number, formula, line_dep):
+        if line_number in self.entries:
+            self.remove(line_number)
+        entries = [(self.by_formula, formula), (self.by_connective, formula.op)]
+        if formula.op in (AND, OR):
+            table = self.by_conjunct if formula.op == AND else self.by_disjunct
+            entries.append((table, formula.left))
+            if formula.right is not formula.left:
+                entries.append((table, formula.right))
+        elif formula.op == IMPLIES:
+            entries += [(self.by_antecedent, formula.left), (self.by_consequent, formula.right)]
+        if 'Premise' in str(line_dep):
+            entries.append((self.by_assumption, formula))
+        if is_self_contradictory(formula):
+            entries.append((self.by_contradiction, formula))
+        for table, key in entries:
+            insort(table.setdefault(key, []), line_number)
+        self.entries[line_number] = entries
+
+    def remove(self, line_number):
+        for table, key in self.entries.pop(line_number, ()):
+            lines = table[key]
+            lines.remove(line_number)
+            if not lines:
+                del table[key]
+
+    def shift(self, first_line, offset):
+        # Renumber every indexed line from first_line on by offset. Moved lines keep their
+        # relative order and stay above the others, so in every list they form a suffix that
+        # is offset in place instead of each line being removed and filed again.
+        moved = sorted((line for line in self.entries if line >= first_line), reverse=offset > 0)
+        lists = {}
+        for line in moved:
+            for table, key in self.entries[line]:
+                lines = table[key]
+                lists[id(lines)] = lines
+        for lines in lists.values():
+            start = bisect_left(lines, first_line)
+            lines[start:] = [line + offset for line in lines[start:]]
+        for line in moved:
+            self.entries[line + offset] = self.entries.pop(line)
+
+    def candidates(self, proof_step):
+        # Yield (line_refs, rule) applications that may justify proof_step, most recent lines
+        # first. Each rule is tried with at most one choice of lines.
+        formulas = self.by_formula
+        lines = self.by_conjunct.get(proof_step)
+        if lines:
+            yield (lines[-1],), '∧E'
+        for implication_line in reversed(self.by_consequent.get(proof_step, ())):
+            antecedent = self.by_formula_of(implication_line).left
+            if antecedent in formulas:
+                yield (implication_line, formulas[antecedent][-1]), '→E'
+                break
+        lines = formulas.get(Not(Not(proof_step)))
+        if lines:
+            yield (lines[-1],), '¬E'
+
+        if proof_step.op == AND:
+            left, right = formulas.get(proof_step.left), formulas.get(proof_step.right)
+            if left and right:
+                yield (left[-1], right[-1]), '∧I'
+        elif proof_step.op == OR:
+            lines = formulas.get(proof_step.left) or formulas.get(proof_step.right)
+            if lines:
+                yield (lines[-1],), '∨I'
+        elif proof_step.op == IMPLIES:
+            # Latest assumption of the antecedent that the consequent follows
+            ends = formulas.get(proof_step.right)
+            if ends:
+                for start in reversed(self.by_assumption.get(proof_step.left, ())):
+                    if start < ends[-1]:
+                        yield (start, ends[-1]), '→I'
+                        break
+        elif proof_step.op == NOT:
+            # Latest assumption of the negated formula followed by a line contradicting it
+            assumption = proof_step.operand
+            end_lists = [formulas.get(Not(assumption), ())] + list(self.by_contradiction.values())
+            if assumption.op == NOT:
+                end_lists.append(formulas.get(assumption.operand, ()))
+            last_end = max((ends[-1] for ends in end_lists if ends), default=None)
+            if last_end is not None:
+                for start in reversed(self.by_assumption.get(assumption, ())):
+                    if start < last_end:
+                        yield (start, last_end), '¬I'
+                        break
+
+        # Cases on a disjunction whose two sides were both assumed and each led to the step
+        conclusions = formulas.get(proof_step)
+        if conclusions:
+            for disjunction_line in reversed(self.by_connective.get(OR, ())):
+                disjunction = self.by_formula_of(disjunction_line)
+                cases = []
+                for disjunct in (disjunction.left, disjunction.right):
+                    for start in reversed(self.by_assumption.get(disjunct, ())):
+                        if start <= conclusions[-1]:
+                            cases += [start, conclusions[bisect_left(conclusions, start)]]
+                            break
+                if len(cases) == 4:
+                    yield (disjunction_line, *cases), '∨E'
+                    break
+
+        for rule in SEARCHED_RULES:
+            yield from rule.candidates(self, proof_step)
+
+    def by_formula_of(self, line_number):
+        # Formula on an indexed line (its first entry is always the by_formula one)
+        return self.entries[line_number][0][1]
+
+
+class VerdictCache:
+    # Bounded LRU cache of rule verdicts shared by every proof in the process.
+    # Entries are keyed by what the referenced lines say rather than where they are, so two
+    # sessions reaching the same derivation at different line numbers share one entry.
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def make_key(self, proof_step, reference, proof_steps):
+        # Build the content key for a rule check, or return None if it should not be cached
+        line_refs = reference.line_refs
+        referenced = []
+        for line_ref in line_refs:
+            line = proof_steps.get(line_ref)
+            # Verdicts about missing lines mention the line number, so they are never shared
+            if line is None:
+                return None
+            # Whether a line is an assumption matters to →I, so it is part of the content
+            referenced.append((as_formula(line.step), 'Premise' in str(line.line_dep)))
+        # The relative order of the references (and any repeats) still matters to rules such
+        # as →I and ¬I, so keep their rank pattern instead of the absolute line numbers
+        distinct = sorted(set(line_refs))
+        pattern = tuple(distinct.index(line_ref) for line_ref in line_refs)
+        return reference.rule, proof_step, tuple(referenced), pattern
+
+    def get(self, key):
+        with self.lock:
+            verdict = self.entries.get(key)
+            if verdict is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return verdict
+
+    def put(self, key, verdict):
+        with self.lock:
+            self.entries[key] = verdict
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# Process-wide verdict cache used by ruleChecker
+verdict_cache = VerdictCache()
+
+install_rules()
+
+
+class ProofChecker(ProofRules):
+    # Long-lived checker owned by one proof. Each line is parsed once when it is added (the
+    # formula node and its structured rule reference are kept), so checking a new line only
+    # touches the lines it references. Rules are dispatched through RULE_METHODS.
+    # A process may hold thousands of these, so the state is slotted and the StepIndex, which
+    # only finding rules needs, is built on first use.
+    __slots__ = ('cache', 'step_index', 'dependencies', 'assumption_bits', 'bit_lines', 'dependents', 'invalid')
+
+    def __init__(self, proof_steps=None, cache=verdict_cache, register_existing=True):
+        # register_existing=False skips indexing lines already in proof_steps, for one-off
+        # checks that never need the index or dependency sets of those lines
+        super().__init__({} if proof_steps is None else proof_steps)
+        self.cache = cache  # None disables verdict caching
+        self.step_index = None  # StepIndex of the lines once index is first used
+        self.dependencies = {}  # line number -> bitset of the premise and assumption lines it rests on
+        self.assumption_bits = {}  # premise or assumption line -> its single-bit mask
+        # Bit position -> premise or assumption line holding it (None once removed). Bits are
+        # never reused, so a mask always means the same lines.
+        self.bit_lines = []
+        self.dependents = {}  # line number -> list of the lines that cite it (the reverse of cited_lines)
+        self.invalid = {}  # line number -> why the line no longer follows after an edit
+        if register_existing:
+            for line_number in sorted(self.proof_steps):
+                self.register(line_number)
+
+    @property
+    def index(self):
+        if self.step_index is None:
+            self.step_index = StepIndex()
+            for line_number, entry in self.proof_steps.items():
+                self.step_index.add(line_number, self.line_formula(line_number), entry.line_dep)
+        return self.step_index
+
+    @instrumented('rule_check', "Checking one proof step against its rule",
+                  ('rule', lambda checker, proof_step, rule_applied, line_number=None: rule_label(rule_applied)))
+    def check(self, proof_step, rule_applied, line_number=None):
+        # Check a proposed step against a rule application such as "1,2 ∧I"; returns (valid, message).
+        # line_number places the step among existing lines (when editing or inserting), so it
+        # may only cite lines before it.
+        # Handle the "None" case early to avoid splitting and accessing a non-existent index
+        if rule_applied.strip().lower() == "none":
+            return True, "No rule needs to be checked."
+
+        reference, message = parse_rule_reference(rule_applied)
+        if reference is None:
+            return False, message
+        if line_number is not None and max(reference.line_refs) >= line_number:
+            return False, f"Line {line_number} can only cite lines before it."
+        return self.check_reference(as_formula(proof_step), reference)
+
+    def check_reference(self, proof_step, reference):
+        # Repeated checks of the same derivation are answered from the shared verdict cache
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(proof_step, reference, self.proof_steps)
+            if key is not None:
+                verdict = self.cache.get(key)
+                if verdict is not None:
+                    return verdict
+
+        verdict = RULE_METHODS[reference.rule](self, proof_step, reference.line_refs)
+        if key is not None:
+            self.cache.put(key, verdict)
+        return verdict
+
+    @instrumented('auto_justify', "Finding the rule and lines that justify a step")
+    def justify(self, proof_step):
+        # Find a rule application that justifies proof_step from the existing lines.
+        # Returns (rule_applied, message); rule_applied is None when no rule does.
+        proof_step = as_formula(proof_step)
+        for line_refs, rule in self.index.candidates(proof_step):
+            valid, message = self.check_reference(proof_step, RuleReference(line_refs, rule))
+            if valid:
+                return f"{','.join(str(line_ref) for line_ref in line_refs)} {rule}", message
+        return None, "No rule justifies this step from the earlier lines."
+
+    @instrumented('soundness_check', "Checking a rejected step against the lines it rests on")
+    def counterexample(self, proof_step, rule_applied):
+        # Semantic check of a step the rules rejected. Returns (lines, assignment): the premise
+        # and assumption lines the step would rest on under its rule application, and an
+        # assignment making all of them true and the step false, or None when the step does
+        # follow from them (so some derivation of it exists). Returns None if the rule
+        # application is malformed or cites missing lines.
+        reference, _ = parse_rule_reference(rule_applied)
+        if reference is None or not all(line_ref in self.dependencies for line_ref in reference.line_refs):
+            return None
+        lines = self.lines_of(self.compute_dependencies(None, reference))
+        import satSolver  # only needed once a step is rejected
+        _, assignment = satSolver.entails([self.proof_steps[line].step for line in lines], proof_step)
+        return lines, assignment
+
+    def add_line(self, line_number, line_dep, proof_step, rule_applied=None):
+        # Record an accepted line, keeping its parsed formula and rule reference for later checks
+        if line_number in self.proof_steps:
+            self.forget(line_number)
+        self.proof_steps[line_number] = ProofLine(line_dep, as_formula(proof_step), rule_applied)
+        self.register(line_number)
+
+    def register(self, line_number):
+        # Parse, index and compute the dependencies of a line stored in proof_steps
+        self.forget(line_number)
+        entry = self.proof_steps[line_number]
+        rule_applied = entry.rule
+        reference = None
+        if rule_applied and str(rule_applied).strip().lower() != "none":
+            reference = parse_rule_reference(str(rule_applied))[0]
+        entry.reference = reference
+        if self.step_index is not None:
+            self.step_index.add(line_number, self.line_formula(line_number), entry.line_dep)
+        self.dependencies[line_number] = self.compute_dependencies(line_number, reference)
+        self.link(line_number)
+
+    def cited_lines(self, line_number):
+        # Lines named by a line's rule reference or LineDep
+        entry = self.proof_steps[line_number]
+        cited = set(line_numbers_in(entry.line_dep))
+        if entry.reference is not None:
+            cited.update(entry.reference.line_refs)
+        cited.discard(line_number)
+        return cited
+
+    def link(self, line_number):
+        # Add a line's edges to the citation graph
+        for line_ref in self.cited_lines(line_number):
+            self.dependents.setdefault(line_ref, []).append(line_number)
+
+    def unlink(self, line_number):
+        # Remove them again; the line's LineDep and rule reference must not have changed since
+        if line_number not in self.proof_steps:
+            return
+        for line_ref in self.cited_lines(line_number):
+            citing = self.dependents.get(line_ref)
+            if citing is None or line_number not in citing:
+                continue  # never linked
+            citing.remove(line_number)
+            if not citing:
+                del self.dependents[line_ref]
+
+    def compute_dependencies(self, line_number, reference):
+        # Bitset of the premise and assumption lines a line rests on. A line without a rule
+        # (a premise, or an assumption with rule None) gets a bit of its own whatever its LineDep
+        # says, so a proof can only finish on it once it is discharged; rules OR together the sets
+        # of the lines they use, and rules closing subproofs (→I, ¬I, ∨E) clear (AND-NOT) the
+        # bits of the assumptions they discharge from the set of each subproof's end line.
+        dependencies = self.dependencies
+        if reference is None:
+            bit = 1 << len(self.bit_lines)
+            self.bit_lines.append(line_number)
+            self.assumption_bits[line_number] = bit
+            return bit
+        line_refs = reference.line_refs
+        spec = RULES.get(reference.rule)
+        if spec is not None and spec.discharges:
+            discharges = spec.discharges
+            rests_on = 0
+            for position, line_ref in enumerate(line_refs):
+                if position in discharges:
+                    assumption = line_refs[discharges[position]]
+                    rests_on |= dependencies.get(line_ref, 0) & ~self.assumption_bits.get(assumption, 0)
+                elif position not in discharges.values():
+                    rests_on |= dependencies.get(line_ref, 0)
+            return rests_on
+        rests_on = 0
+        for line_ref in line_refs:
+            rests_on |= dependencies.get(line_ref, 0)
+        return rests_on
+
+    def forget(self, line_number):
+        # Drop the parsed state of a line that is about to be removed or replaced
+        if self.step_index is not None:
+            self.step_index.remove(line_number)
+        self.dependencies.pop(line_number, None)
+        self.unlink(line_number)
+        self.invalid.pop(line_number, None)
+        bit = self.assumption_bits.pop(line_number, None)
+        if bit is not None:
+            self.bit_lines[bit.bit_length() - 1] = None
+
+    def premise_mask(self, premise_count):
+        # Bits of the given premises, lines 1..premise_count
+        mask = 0
+        for line_number in range(1, premise_count + 1):
+            mask |= self.assumption_bits.get(line_number, 0)
+        return mask
+
+    def lines_of(self, mask):
+        # Line numbers of the premises and assumptions in a dependency bitset
+        lines = []
+        while mask:
+            lowest = mask & -mask
+            lines.append(self.bit_lines[lowest.bit_length() - 1])
+            mask ^= lowest
+        return sorted(lines)
+
+    def undischarged(self, line_number, premise_count):
+        # Assumption lines (beyond the given premises) that a line still depends on
+        return self.lines_of(self.dependencies.get(line_number, 0) & ~self.premise_mask(premise_count))
+
+    def verify(self, line_number):
+        # Re-check a stored line against the lines before it, recording the verdict in invalid
+        entry = self.proof_steps[line_number]
+        valid, message = True, "No rule needs to be checked."
+        if entry.rule and str(entry.rule).strip().lower() != "none":
+            valid, message = self.check(entry.step, str(entry.rule), line_number)
+        if valid:
+            self.invalid.pop(line_number, None)
+        else:
+            self.invalid[line_number] = message
+        return valid, message
+
+    def affected_by(self, line_number):
+        # Lines whose references reach line_number, directly or through other lines, in order
+        reached = set()
+        stack = [line_number]
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in reached:
+                    reached.add(dependent)
+                    stack.append(dependent)
+        return sorted(reached)
+
+    def replace_line(self, line_number, line_dep, proof_step, rule_applied=None):
+        # Change an existing line, then re-check only the lines that depend on it, in order.
+        # Their dependency sets are refreshed on the way, since an edit can change which
+        # assumptions they rest on. Returns [(line, valid, message), ...] for the re-checked lines.
+        self.add_line(line_number, line_dep, proof_step, rule_applied)
+        results = []
+        for dependent in self.affected_by(line_number):
+            entry = self.proof_steps[dependent]
+            if dependent not in self.assumption_bits:
+                self.dependencies[dependent] = self.compute_dependencies(dependent, entry.reference)
+            results.append((dependent, *self.verify(dependent)))
+        return results
+
+    def insert_line(self, line_number, line_dep, proof_step, rule_applied=None):
+        # Insert a line before the current line_number, moving it and every later line down one.
+        # Nothing cites the new line yet, so no other line needs re-checking.
+        self.shift_lines(line_number, 1)
+        self.add_line(line_number, line_dep, proof_step, rule_applied)
+        # Keep proof_steps in line order for everything that iterates over it
+        ordered = sorted(self.proof_steps.items())
+        self.proof_steps.clear()
+        self.proof_steps.update(ordered)
+
+    def delete_line(self, line_number):
+        # Remove a line and move every later line up one. Returns (True, message), or
+        # (False, message) without changing anything while other lines still cite it.
+        citing = sorted(self.dependents.get(line_number, ()))
+        if citing:
+            return False, f"Line {line_number} is cited by line(s) {', '.join(map(str, citing))}; change or delete them first."
+        self.forget(line_number)
+        del self.proof_steps[line_number]
+        self.shift_lines(line_number + 1, -1)
+        return True, f"Line {line_number} deleted."
+
+    def shift_lines(self, first_line, offset):
+        # Renumber every line from first_line on by offset, rewriting each rule reference and
+        # LineDep that names a moved line. The parsed state of a line moves with it (nothing is
+        # re-checked) and assumptions keep their dependency bits, so no bitset is recomputed.
+        moved = sorted(line for line in self.proof_steps if line >= first_line)
+        if not moved:
+            return
+        mapping = {line: line + offset for line in moved}
+        citing = set()
+        for line in moved:
+            citing.update(self.dependents.get(line, ()))
+        for line in citing.union(moved):
+            self.unlink(line)
+
+        states = []
+        for line in moved:
+            states.append((self.proof_steps.pop(line), self.dependencies.pop(line),
+                           self.assumption_bits.pop(line, None), self.invalid.pop(line, None)))
+        if self.step_index is not None:
+            self.step_index.shift(first_line, offset)
+        for line, (entry, dependencies, bit, problem) in zip(moved, states):
+            line = mapping[line]
+            self.proof_steps[line] = entry
+            self.dependencies[line] = dependencies
+            if bit is not None:
+                self.assumption_bits[line] = bit
+                self.bit_lines[bit.bit_length() - 1] = line
+            if problem is not None:
+                self.invalid[line] = problem
+
+        for line in {mapping.get(line, line) for line in citing}:
+            entry = self.proof_steps[line]
+            entry.line_dep = interned(renumbered(entry.line_dep, mapping))
+            if entry.reference is not None:
+                entry.rule = interned(renumbered(entry.rule, mapping))
+                entry.reference = parse_rule_reference(entry.rule)[0]
+        for line in citing.union(moved):
+            self.link(mapping.get(line, line))
+
+    def truncate(self, last_line):
+        # Drop every line after last_line, keeping the same proof_steps dictionary
+        for line_number in [line for line in self.proof_steps if line > last_line]:
+            self.forget(line_number)
+            del self.proof_steps[line_number]
+
+
+def line_numbers_in(text):
+    # Line numbers named in a LineDep such as "1,2" ("Premise" names none)
+    return [int(part) for part in str(text).split(',') if part.strip().isdigit()]
+
+
+def renumbered(text, mapping):
+    # Rule application or LineDep text with the line numbers in mapping replaced
+    return re.sub(r'\d+', lambda match: str(mapping.get(int(match.group()), match.group())), str(text))
+
+
+def ruleChecker(proof_step, rule_applied, proof_steps, cache=verdict_cache):
+    # Check one step against the given proof steps. Callers that check a whole proof should
+    # keep a ProofChecker instead; pass cache=None to bypass the shared verdict cache.
+    return ProofChecker(proof_steps, cache, register_existing=False).check(proof_step, rule_applied)
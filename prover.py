@@ -0,0 +1,290 @@
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+from formula import AND, OR, IMPLIES, NOT, And, Not, as_formula
+
+
+# One node of a natural-deduction derivation. rule is 'Premise' for a given line, 'Assume'
+# for a temporary assumption, or one of the rule abbreviations in proofRules.RULES.
+# children are the derivations of the lines the rule references, in the order the rule
+# expects them (e.g. disjunction, assumption, conclusion, assumption, conclusion for ∨E).
+Derivation = namedtuple('Derivation', ['formula', 'rule', 'children'])
+
+# Default search limits, sized so that a hint comes back well inside an interactive turn
+DEFAULT_TIME_BUDGET = 0.15
+DEFAULT_NODE_BUDGET = 20000
+DEFAULT_MAX_DEPTH = 8
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+class Prover:
+    # Goal-directed proof search over the rules of ProofRules. Introduction rules are applied
+    # backwards from the goal, elimination rules forwards from the available lines, with
+    # iterative deepening on the number of backward steps and memoised subgoals.
+    def __init__(self, time_budget=DEFAULT_TIME_BUDGET, node_budget=DEFAULT_NODE_BUDGET, max_depth=DEFAULT_MAX_DEPTH):
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.max_depth = max_depth
+        self.nodes = 0
+        self.deadline = None
+        self.proved = {}  # (context, goal) -> derivation
+        self.failed = {}  # (context, goal) -> deepest depth that failed
+
+    def prove(self, premises, goal):
+        # Return a Derivation of goal from premises, or None if none was found within budget
+        goal = as_formula(goal)
+        facts = {}
+        for premise in premises:
+            premise = as_formula(premise)
+            facts[premise] = Derivation(premise, 'Premise', ())
+        self.nodes = 0
+        self.deadline = time.perf_counter() + self.time_budget
+        try:
+            facts = self.saturate(facts)
+            for depth in range(self.max_depth + 1):
+                derivation = self.search(facts, goal, depth)
+                if derivation is not None:
+                    return derivation
+        except SearchBudgetExceeded:
+            return None
+        return None
+
+    def tick(self):
+        self.nodes += 1
+        if self.nodes > self.node_budget or (self.nodes % 64 == 0 and time.perf_counter() > self.deadline):
+            raise SearchBudgetExceeded()
+
+    def saturate(self, facts):
+        # Apply ∧E, →E and ¬E forwards until nothing new follows. Everything added is a
+        # sub-formula of an existing line, so this always terminates.
+        facts = dict(facts)
+        implications = {}  # antecedent -> implications with that antecedent
+        for formula in facts:
+            if formula.op == IMPLIES:
+                implications.setdefault(formula.left, []).append(formula)
+        queue = list(facts)
+        while queue:
+            formula = queue.pop()
+            derived = []
+            if formula.op == AND:
+                derived.append(Derivation(formula.left, '∧E', (facts[formula],)))
+                derived.append(Derivation(formula.right, '∧E', (facts[formula],)))
+            elif formula.op == NOT and formula.operand.op == NOT:
+                derived.append(Derivation(formula.operand.operand, '¬E', (facts[formula],)))
+            elif formula.op == IMPLIES:
+                if formula.left in facts:
+                    derived.append(Derivation(formula.right, '→E', (facts[formula], facts[formula.left])))
+            for implication in implications.get(formula, ()):
+                derived.append(Derivation(implication.right, '→E', (facts[implication], facts[formula])))
+            for derivation in derived:
+                if derivation.formula not in facts:
+                    self.tick()
+                    facts[derivation.formula] = derivation
+                    queue.append(derivation.formula)
+                    if derivation.formula.op == IMPLIES:
+                        implications.setdefault(derivation.formula.left, []).append(derivation.formula)
+        return facts
+
+    def assume(self, facts, assumption):
+        # Open a temporary assumption; it replaces any other derivation of the same formula
+        # so that the rule closing it can reference a line marked as an assumption
+        leaf = Derivation(assumption, 'Assume', ())
+        extended = dict(facts)
+        extended[assumption] = leaf
+        return leaf, self.saturate(extended)
+
+    def search(self, facts, goal, depth):
+        if goal in facts:
+            return facts[goal]
+        if depth == 0:
+            return None
+        key = (frozenset(facts), goal)
+        if key in self.proved:
+            return self.proved[key]
+        if self.failed.get(key, -1) >= depth:
+            return None
+        self.tick()
+        derivation = self.search_rules(facts, goal, depth)
+        if derivation is None:
+            self.failed[key] = depth
+        else:
+            self.proved[key] = derivation
+        return derivation
+
+    def search_rules(self, facts, goal, depth):
+        # Introduction rules, backwards from the shape of the goal
+        if goal.op == AND:
+            left = self.search(facts, goal.left, depth - 1)
+            if left is not None:
+                right = self.search(facts, goal.right, depth - 1)
+                if right is not None:
+                    return Derivation(goal, '∧I', (left, right))
+        elif goal.op == IMPLIES:
+            leaf, extended = self.assume(facts, goal.left)
+            body = self.search(extended, goal.right, depth - 1)
+            if body is not None:
+                if not body.children:
+                    # The subproof must end after the assumption, so an existing line is
+                    # repeated inside it by combining it with the assumption and splitting again
+                    combined = Derivation(And(body.formula, leaf.formula), '∧I', (body, leaf))
+                    body = Derivation(body.formula, '∧E', (combined,))
+                return Derivation(goal, '→I', (leaf, body))
+        elif goal.op == OR:
+            for disjunct in goal.args:
+                derivation = self.search(facts, disjunct, depth - 1)
+                if derivation is not None:
+                    return Derivation(goal, '∨I', (derivation,))
+        elif goal.op == NOT:
+            derivation = self.refute(facts, goal.operand, depth - 1)
+            if derivation is not None:
+                return derivation
+
+        # Elimination rules that need a sub-proof first: prove an antecedent to use →E
+        for formula in list(facts):
+            if formula.op == IMPLIES and formula.left not in facts and formula.right not in facts:
+                antecedent = self.search(facts, formula.left, depth - 1)
+                if antecedent is not None:
+                    extended = dict(facts)
+                    extended[formula.left] = antecedent
+                    derivation = self.search(self.saturate(extended), goal, depth - 1)
+                    if derivation is not None:
+                        return derivation
+
+        # Reason by cases on an available disjunction
+        for formula in list(facts):
+            if formula.op == OR:
+                left_leaf, left_facts = self.assume(facts, formula.left)
+                left = self.search(left_facts, goal, depth - 1)
+                if left is None:
+                    continue
+                right_leaf, right_facts = self.assume(facts, formula.right)
+                right = self.search(right_facts, goal, depth - 1)
+                if right is not None:
+                    return Derivation(goal, '∨E', (facts[formula], left_leaf, left, right_leaf, right))
+
+        # Classical reductio: assume ¬goal, reach a contradiction, then ¬I and ¬E
+        if goal.op != NOT and depth >= 2:
+            negated = self.refute(facts, Not(goal), depth - 2)
+            if negated is not None:
+                return Derivation(goal, '¬E', (negated,))
+        return None
+
+    def refute(self, facts, assumption, depth):
+        # Derive ¬assumption by ¬I: assume it and reach a line that ProofRules.is_contradiction
+        # accepts (its direct negation, or a conjunction of some X and ¬X)
+        leaf, extended = self.assume(facts, assumption)
+        end = self.contradiction(extended, assumption, depth)
+        if end is None:
+            return None
+        return Derivation(Not(assumption), '¬I', (leaf, end))
+
+    def contradiction(self, facts, assumption, depth):
+        # The end line is always a new X ∧ ¬X, so it comes after the assumption even when both
+        # halves were already available (the assumption itself is one of the facts)
+        for formula in facts:
+            if formula.op == NOT and formula.operand in facts:
+                return Derivation(And(formula.operand, formula), '∧I', (facts[formula.operand], facts[formula]))
+        if depth == 0:
+            return None
+        # Try to prove the opposite of an available negation
+        for formula in list(facts):
+            if formula.op == NOT:
+                positive = self.search(facts, formula.operand, depth - 1)
+                if positive is not None:
+                    return Derivation(And(formula.operand, formula), '∧I', (positive, facts[formula]))
+        return None
+
+
+@lru_cache(maxsize=1024)
+def _prove_sequent(premises, goal):
+    return Prover().prove(premises, goal)
+
+
+def prove_sequent(premises, goal):
+    # Derivation of goal from premises (memoised per sequent), or None
+    return _prove_sequent(tuple(as_formula(premise) for premise in premises), as_formula(goal))
+
+
+# Rules that close a temporary assumption: child index -> (index of the assumption child it
+# must come after, whether it must be strictly later). ProofRules requires the end line of a
+# ¬I subproof to follow its assumption line; the search asks the same of →I.
+SUBPROOF_ORDER = {
+    '→I': {1: (0, True)},
+    '¬I': {1: (0, True)},
+    '∨E': {2: (1, False), 4: (3, False)},
+}
+
+
+def usable_line(available, dependencies, assumption_bits, node, bound, open_mask):
+    # Earliest line after `bound` that holds node.formula and may be used where only the
+    # premises and assumptions in open_mask are open, or None. An 'Assume' leaf needs a line
+    # that is itself an assumption. dependencies=None skips the scope checks.
+    lines = available.get(node.formula)
+    if not lines:
+        return None
+    for line in lines[bisect_right(lines, bound):]:
+        if dependencies is None:
+            return line
+        rests_on = dependencies.get(line, 0)
+        if node.rule == 'Assume':
+            if rests_on and rests_on == assumption_bits.get(line):
+                return line
+        elif not rests_on & ~open_mask:
+            return line
+    return None
+
+
+def next_step(derivation, available, dependencies=None, assumption_bits=None, open_mask=0):
+    # Find the first step of the derivation that is not yet in the proof.
+    # available maps formulas to the ascending line numbers where they appear. dependencies
+    # and assumption_bits are the ProofChecker bitsets of the same names and open_mask the
+    # bits of the given premises; with them, lines inside a closed or unrelated subproof are not reused.
+    # Returns (node, line_refs, ancestors) or None when the derivation is complete. For a rule
+    # node, line_refs are the lines of its children; for an 'Assume' leaf they are empty.
+    # Each frame is [node, earliest allowed line, open premise/assumption bits, lines of the children found so far]
+    frames = [[derivation, 0, open_mask, []]]
+    finished_line = None  # line of the frame that just completed, handed to its parent
+    while frames:
+        node, after, open_mask, child_lines = frames[-1]
+        if finished_line is not None:
+            child_lines.append(finished_line)
+            finished_line = None
+        elif not child_lines:
+            # A leaf or a rule that discharges nothing counts as done wherever the formula
+            # appears in scope (after any ordering constraint); rules closing subproofs are checked below
+            if node.rule not in SUBPROOF_ORDER:
+                line = usable_line(available, dependencies, assumption_bits, node, after, open_mask)
+                if line is not None:
+                    frames.pop()
+                    finished_line = line
+                    continue
+            if not node.children:
+                return node, [], [frame[0] for frame in frames[:-1]]
+
+        if len(child_lines) < len(node.children):
+            index = len(child_lines)
+            child_after = 0
+            child_open = open_mask
+            order = SUBPROOF_ORDER.get(node.rule, {}).get(index)
+            if order is not None:
+                start_index, strict = order
+                start = child_lines[start_index]
+                child_after = start if strict else start - 1
+                if assumption_bits:
+                    child_open = open_mask | assumption_bits.get(start, 0)
+            frames.append([node.children[index], child_after, child_open, []])
+            continue
+
+        # Every child is in place; the node itself is done only if it appears after all of them
+        line = usable_line(available, dependencies, assumption_bits, node, max(after, *child_lines), open_mask)
+        if line is not None:
+            frames.pop()
+            finished_line = line
+            continue
+        return node, child_lines, [frame[0] for frame in frames[:-1]]
+    return None
@@ -0,0 +1,326 @@
+from itertools import permutations
+
+from formula import VAR, as_formula, make, parse_formula, FormulaSyntaxError
+
+
+# A rule is written as a schema "premise, premise ⊢ conclusion". Letters in a schema are
+# metavariables standing for any formula, and a metavariable that occurs twice must stand for
+# the same formula both times. "[A] B" is a subproof from the assumption A to B: it takes two
+# line references (the assumption line, then the line reached) and discharges the assumption.
+# A rule may have several schemas; an application is valid when any one of them fits.
+#
+# Rule definitions are plain data, so a rule set can be loaded from JSON:
+#   schemas    the rule's schemas
+#   any_order  the premises may be cited in any order (subproofs keep their place)
+#   name       the rule's name, used in the default usage message
+#   usage      message shown when the rule is cited with the wrong number of line references
+#   method     instead of schemas, the ProofRules method checking a rule whose side condition
+#              is not a pattern, with "lines" (its number of line references) and "discharges"
+#              ({end line position: assumption line position} of its subproofs)
+# The built-in rules, in the order they are listed to the student:
+BUILTIN_RULES = {
+    "∧I": {"name": "And introduction", "schemas": ["A, B ⊢ A ∧ B"], "any_order": True,
+           "usage": "And introduction (∧I) requires exactly two line reference."},
+    "∧E": {"name": "And elimination", "schemas": ["A ∧ B ⊢ A", "A ∧ B ⊢ B"],
+           "usage": "Rule applied format is incorrect. Expected format: '1 ∧E'."},
+    "∨I": {"name": "Or introduction", "schemas": ["A ⊢ A ∨ B", "A ⊢ B ∨ A"],
+           "usage": "Or introduction (∨I) requires exactly one line reference."},
+    "∨E": {"name": "Or elimination", "schemas": ["A ∨ B, [A] C, [B] C ⊢ C", "A ∨ B, [B] C, [A] C ⊢ C"],
+           "usage": "Rule applied format is incorrect. Expected format: '1,2,5,6,11 ∨E'."},
+    "→I": {"name": "Implies introduction", "schemas": ["[A] B ⊢ A → B"],
+           "usage": "Line references for →I must specify the start and end lines of the subproof, e.g., '3,5'."},
+    "→E": {"name": "Implies elimination", "schemas": ["A → B, A ⊢ B"], "any_order": True,
+           "usage": "Expected two line references for →E rule."},
+    "¬I": {"name": "Not introduction", "method": "not_introduction", "lines": 2, "discharges": {1: 0},
+           "usage": "Line references for ¬I must specify the start and end lines of the subproof, e.g., '1,4'."},
+    "¬E": {"name": "Not elimination", "schemas": ["¬¬A ⊢ A"],
+           "usage": "Rule applied format is incorrect. Expected format: '1 ¬E', where 1 is the line with ¬¬A or ¬(¬A)."},
+    "↔I": {"name": "Iff introduction", "schemas": ["A → B, B → A ⊢ A ↔ B"], "any_order": True},
+    "↔E": {"name": "Iff elimination", "schemas": ["A ↔ B ⊢ A → B", "A ↔ B ⊢ B → A"]},
+    "⊕I": {"name": "Xor introduction", "schemas": ["A, ¬B ⊢ A ⊕ B", "¬A, B ⊢ A ⊕ B"], "any_order": True},
+    "⊕E": {"name": "Xor elimination", "schemas": ["A ⊕ B, A ⊢ ¬B", "A ⊕ B, B ⊢ ¬A", "A ⊕ B, ¬A ⊢ B", "A ⊕ B, ¬B ⊢ A"],
+           "any_order": True},
+    "MT": {"name": "Modus tollens", "schemas": ["A → B, ¬B ⊢ ¬A"], "any_order": True},
+    "DS": {"name": "Disjunctive syllogism", "schemas": ["A ∨ B, ¬A ⊢ B", "A ∨ B, ¬B ⊢ A"], "any_order": True},
+}
+
+TURNSTILE = '⊢'
+# Lines tried for each premise while searching for an application of a schema rule, most
+# recent first, so auto-justify stays quick on long proofs
+SEARCH_BRANCHING = 8
+
+
+class RuleSchemaError(ValueError):
+    # Raised for a malformed rule definition or schema
+    pass
+
+
+class Schema:
+    # One compiled schema. patterns holds the pattern of each line reference in order (a
+    # subproof contributes its assumption and its end), discharges maps the position of each
+    # subproof end to the position of its assumption, and match(step, line formulas...) is
+    # the generated matcher. Schemas are parsed and checked when the rule set is installed,
+    # but each matcher is only generated when first used, which keeps start-up quick.
+    __slots__ = ('text', 'patterns', 'conclusion', 'discharges', 'match')
+
+    def __init__(self, text, patterns, conclusion, discharges):
+        self.text = text
+        self.patterns = patterns
+        self.conclusion = conclusion
+        self.discharges = discharges
+        self.match = self.first_match
+
+    def first_match(self, step, *formulas):
+        self.match = compile_matcher(self.patterns, self.conclusion, self.text)
+        return self.match(step, *formulas)
+
+
+def parse_schema(text):
+    # "A ∨ B, [A] C, [B] C ⊢ C" -> ([(None, A ∨ B), (A, C), (B, C)], C), where a premise is
+    # (assumption or None, formula pattern)
+    if text.count(TURNSTILE) != 1:
+        raise RuleSchemaError(f"Schema {text!r} needs exactly one {TURNSTILE}.")
+    left, right = text.split(TURNSTILE)
+    premises = []
+    try:
+        for part in left.split(',') if left.strip() else []:
+            part = part.strip()
+            assumption = None
+            if part.startswith('['):
+                closing = part.find(']')
+                if closing < 0:
+                    raise RuleSchemaError(f"Schema {text!r} has an unclosed [ in {part!r}.")
+                assumption = parse_formula(part[1:closing])
+                part = part[closing + 1:]
+            premises.append((assumption, parse_formula(part)))
+        conclusion = parse_formula(right)
+    except FormulaSyntaxError as e:
+        raise RuleSchemaError(f"Schema {text!r}: {e}") from None
+    if not premises:
+        raise RuleSchemaError(f"Schema {text!r} has no premises.")
+    return premises, conclusion
+
+
+def compile_matcher(patterns, conclusion, text):
+    # Generate the source of a matcher for the patterns and conclusion, specialised to their
+    # shape: straight-line checks of each main connective and `is` comparisons for repeated
+    # metavariables (formula nodes are interned), without any pattern walking or binding
+    # dictionaries at check time. The first referenced line is tested first, so an
+    # application citing the wrong kind of line is rejected after a single comparison.
+    subjects = [f"l{position}" for position in range(len(patterns))]
+    body = []
+    bound = {}  # metavariable -> local name holding its formula
+    temporaries = 0
+    for subject, pattern in list(zip(subjects, patterns)) + [("step", conclusion)]:
+        stack = [(pattern, subject)]
+        while stack:
+            node, local = stack.pop()
+            if node.op == VAR:
+                if node.name in bound:
+                    body.append(f"if {local} is not {bound[node.name]}: return False")
+                else:
+                    bound[node.name] = local
+                continue
+            body.append(f"if {local}.op != {node.op!r}: return False")
+            names = [f"t{temporaries + index}" for index in range(len(node.args))]
+            temporaries += len(names)
+            body.append(f"{', '.join(names)}, = {local}.args")
+            stack.extend(reversed(list(zip(node.args, names))))
+    source = f"def match(step, {', '.join(subjects)}):\n" + "".join(f"    {line}\n" for line in body) + "    return True\n"
+    namespace = {}
+    exec(compile(source, f"<schema {text}>", "exec"), namespace)
+    return namespace['match']
+
+
+def unify(pattern, node, bindings):
+    # Extend bindings (metavariable -> formula) so that pattern matches node; returns the new
+    # bindings, or None if it cannot. Used by the search, not by checking.
+    bindings = dict(bindings)
+    stack = [(pattern, node)]
+    while stack:
+        pattern, node = stack.pop()
+        if pattern.op == VAR:
+            bound = bindings.setdefault(pattern.name, node)
+            if bound is not node:
+                return None
+        elif pattern.op != node.op:
+            return None
+        else:
+            stack.extend(zip(pattern.args, node.args))
+    return bindings
+
+
+def instantiate(pattern, bindings):
+    # The formula pattern stands for under bindings, or None if a metavariable is unbound
+    built = []
+    stack = [(pattern, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node.op == VAR:
+            if node.name not in bindings:
+                return None
+            built.append(bindings[node.name])
+        elif expanded:
+            args = built[len(built) - len(node.args):]
+            del built[len(built) - len(node.args):]
+            built.append(make(node.op, *args))
+        else:
+            stack.append((node, True))
+            stack.extend((arg, False) for arg in reversed(node.args))
+    return built[0]
+
+
+class SchemaRule:
+    # A rule compiled from its schemas. check(checker, proof_step, line_refs) is called like
+    # a ProofRules method and returns (valid, message).
+    def __init__(self, abbreviation, schemas, discharges):
+        self.abbreviation = abbreviation
+        self.schemas = schemas
+        self.discharges = discharges
+        self.assumptions = frozenset(discharges.values())
+        # First-argument indexing: the schemas worth trying for each main connective of the
+        # first referenced line, plus those whose first pattern is a bare metavariable
+        self.any_first = tuple(schema for schema in schemas if schema.patterns[0].op == VAR)
+        self.by_first = {}
+        for schema in schemas:
+            op = schema.patterns[0].op
+            if op != VAR:
+                self.by_first.setdefault(op, []).append(schema)
+        self.by_first = {op: tuple(first) + self.any_first for op, first in self.by_first.items()}
+        # Verdicts, built once
+        self.applied = (True, f"{abbreviation} rule applied correctly.")
+        first_forms = " or ".join(dict.fromkeys(str(schema.patterns[0]) for schema in schemas))
+        self.wrong_first = (False, f"The first referenced line is not of the form {first_forms}.")
+        forms = " or ".join(schema.text for schema in schemas)
+        self.not_applied = (False, f"{abbreviation} rule not applied correctly. Expected {forms}.")
+
+    def check(self, checker, proof_step, line_refs):
+        proof_steps = checker.proof_steps
+        try:
+            formulas = [as_formula(proof_steps[line_ref].step) for line_ref in line_refs]
+        except KeyError as e:
+            return False, f"Referenced line number {e.args[0]} does not exist in proof steps."
+
+        if self.discharges:
+            for end, start in self.discharges.items():
+                if 'Premise' not in str(proof_steps[line_refs[start]].line_dep):
+                    return False, f"The subproof cited by {self.abbreviation} does not start with a line marked as an assumption."
+                if line_refs[start] > line_refs[end]:
+                    return False, "In the rule application, the start line must precede the end line."
+
+        for schema in self.by_first.get(formulas[0].op, self.any_first):
+            if schema.match(proof_step, *formulas):
+                return self.applied
+        return self.not_applied if self.by_first.get(formulas[0].op, self.any_first) else self.wrong_first
+
+    def candidates(self, index, proof_step):
+        # Yield at most one (line_refs, rule) application that may justify proof_step, found
+        # from the StepIndex by unifying the schemas with the step and then with earlier lines
+        ends = {start: end for end, start in self.discharges.items()}
+        for schema in self.schemas:
+            bindings = unify(schema.conclusion, proof_step, {})
+            if bindings is None:
+                continue
+            # Depth-first over the premise positions: (position, bindings, lines chosen so far)
+            stack = [(0, bindings, ())]
+            while stack:
+                position, bindings, chosen = stack.pop()
+                if position == len(schema.patterns):
+                    yield chosen, self.abbreviation
+                    return
+                pattern = schema.patterns[position]
+                exact = instantiate(pattern, bindings)
+                if position in ends:
+                    lines = index.by_assumption.get(exact, ()) if exact is not None else ()
+                elif exact is not None:
+                    lines = index.by_formula.get(exact, ())
+                elif pattern.op != VAR:
+                    lines = index.by_connective.get(pattern.op, ())
+                else:
+                    break  # an unconstrained premise: searching every line is not worth it
+                start = chosen[self.discharges[position]] if position in self.discharges else None
+                options = []
+                for line in reversed(lines):
+                    if start is not None and line < start:
+                        break
+                    extended = unify(pattern, index.by_formula_of(line), bindings)
+                    if extended is not None:
+                        options.append((position + 1, extended, chosen + (line,)))
+                        if len(options) == SEARCH_BRANCHING:
+                            break
+                stack.extend(reversed(options))
+
+
+def compile_rule(abbreviation, definition):
+    # SchemaRule for a definition with schemas; raises RuleSchemaError if it is malformed
+    texts = definition.get('schemas')
+    if not texts or not isinstance(texts, list):
+        raise RuleSchemaError(f"Rule {abbreviation} needs a list of schemas or a method.")
+    schemas, seen, shape = [], set(), None
+    for text in texts:
+        premises, conclusion = parse_schema(str(text))
+        arrangements = [premises]
+        if definition.get('any_order'):
+            # Permute the plain premises among their own places; subproofs stay where they are
+            places = [position for position, (assumption, _) in enumerate(premises) if assumption is None]
+            arrangements = []
+            for order in permutations(places):
+                arranged = list(premises)
+                for place, source in zip(places, order):
+                    arranged[place] = premises[source]
+                arrangements.append(arranged)
+        for arranged in arrangements:
+            patterns, discharges = [], {}
+            for assumption, formula in arranged:
+                if assumption is not None:
+                    discharges[len(patterns) + 1] = len(patterns)
+                    patterns.append(assumption)
+                patterns.append(formula)
+            if shape is None:
+                shape = (len(patterns), discharges)
+            elif shape != (len(patterns), discharges):
+                raise RuleSchemaError(f"Every schema of rule {abbreviation} must cite the same lines in the same roles.")
+            text = f"{', '.join(premise_text(premise) for premise in arranged)} {TURNSTILE} {conclusion}"
+            if text not in seen:
+                seen.add(text)
+                schemas.append(Schema(text, patterns, conclusion, discharges))
+    return SchemaRule(abbreviation, schemas, shape[1])
+
+
+def premise_text(premise):
+    assumption, formula = premise
+    return str(formula) if assumption is None else f"[{assumption}] {formula}"
+
+
+def line_count(definition):
+    # Number of line references a schema rule takes (all its schemas agree, see compile_rule)
+    premises, _ = parse_schema(str(definition['schemas'][0]))
+    return sum(1 if assumption is None else 2 for assumption, _ in premises)
+
+
+def usage_message(abbreviation, definition, count):
+    if definition.get('usage'):
+        return definition['usage']
+    name = definition.get('name', abbreviation)
+    example = ",".join(str(line_ref) for line_ref in range(1, count + 1))
+    return f"{name} ({abbreviation}) requires {count} line reference{'s' if count != 1 else ''}, e.g. '{example} {abbreviation}'."
+
+
+def load_rule_set(path):
+    # Read a rule set: a JSON object mapping rule abbreviations to definitions as in
+    # BUILTIN_RULES. A definition replaces the built-in rule of the same abbreviation (or adds
+    # a new rule), and null removes the built-in rule.
+    import json  # only needed when a rule set is loaded
+    try:
+        with open(path, encoding='utf-8') as handle:
+            rule_set = json.load(handle)
+    except ValueError as e:
+        raise RuleSchemaError(f"Rule set {path} is not valid JSON: {e}") from None
+    if not isinstance(rule_set, dict):
+        raise RuleSchemaError(f"Rule set {path} must be a JSON object of rule definitions.")
+    for abbreviation, definition in rule_set.items():
+        if definition is not None and not isinstance(definition, dict):
+            raise RuleSchemaError(f"Rule {abbreviation} in {path} must be an object or null.")
+        if not abbreviation or any(char.isspace() or char.isdigit() or char == ',' for char in abbreviation):
+            raise RuleSchemaError(f"Rule abbreviation {abbreviation!r} may not contain digits, commas or spaces.")
+    return rule_set
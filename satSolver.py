@@ -0,0 +1,334 @@
+import heapq
+from functools import lru_cache
+
+from formula import VAR, NOT, AND, OR, IMPLIES, XOR, IFF, Not, Xor, as_formula
+from truthTable import variables_of
+
+
+# Conflicts before the first restart; later restarts follow the Luby sequence in these units
+RESTART_BASE = 64
+# Decay of the variable activities that steer decisions towards recently conflicting variables
+ACTIVITY_DECAY = 0.95
+
+
+class Solver:
+    # CDCL SAT solver over clauses of non-zero ints (v for variable v true, -v for false).
+    # Unit propagation uses two watched literals per clause, so only clauses watching a
+    # literal that just became false are visited. Conflicts are analysed to the first unique
+    # implication point, the learnt clause is added and the search jumps back to the level
+    # where it becomes unit. Decisions pick the most active variable with its saved phase,
+    # and the search restarts on the Luby schedule.
+    def __init__(self):
+        self.variables = 0
+        self.clauses = []  # every clause, original and learnt; clause[0] and clause[1] are watched
+        self.watches = [[], []]  # literal code (2v, or 2v + 1 for -v) -> clauses watching that literal
+        self.values = [0]  # variable -> 1 true, -1 false, 0 unassigned
+        self.levels = [0]
+        self.reasons = [None]  # variable -> index of the clause that implied it, None for decisions
+        self.activity = [0.0]
+        self.phase = [False]  # value each variable last had, tried first when it is decided again
+        self.trail = []  # assigned literals in order
+        self.trail_limits = []  # trail length at the start of each decision level
+        self.head = 0  # trail position up to which propagation is done
+        self.order = []  # heap of (-activity, variable), with stale entries skipped when popped
+        self.increment = 1.0
+        self.pending_units = []
+        self.unsatisfiable = False
+
+    def new_variable(self):
+        self.variables += 1
+        self.watches += [[], []]
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        heapq.heappush(self.order, (0.0, self.variables))
+        return self.variables
+
+    def value(self, literal):
+        value = self.values[literal if literal > 0 else -literal]
+        return value if literal > 0 else -value
+
+    def add_clause(self, literals):
+        # Add a clause before solving; duplicate literals are dropped and tautologies ignored
+        clause = list(dict.fromkeys(literals))
+        if any(-literal in clause for literal in clause):
+            return
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            self.pending_units.append(clause[0])
+        else:
+            self.attach(clause)
+
+    def attach(self, clause):
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[code(clause[0])].append(index)
+        self.watches[code(clause[1])].append(index)
+        return index
+
+    def assign(self, literal, reason):
+        variable = literal if literal > 0 else -literal
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        # Propagate every assignment on the trail; returns the index of a conflicting clause or None
+        clauses, values, watches = self.clauses, self.values, self.watches
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watching = watches[code(false_literal)]
+            kept = 0
+            position = 0
+            while position < len(watching):
+                index = watching[position]
+                position += 1
+                clause = clauses[index]
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                first_value = values[first] if first > 0 else -values[-first]
+                if first_value == 1:
+                    watching[kept] = index
+                    kept += 1
+                    continue
+                # Look for another literal that is not false to watch instead
+                for other in range(2, len(clause)):
+                    literal = clause[other]
+                    if (values[literal] if literal > 0 else -values[-literal]) != -1:
+                        clause[1], clause[other] = literal, false_literal
+                        watches[code(literal)].append(index)
+                        break
+                else:
+                    watching[kept] = index
+                    kept += 1
+                    if first_value == -1:
+                        watching[kept:] = watching[position:]
+                        return index
+                    self.assign(first, index)
+            del watching[kept:]
+        return None
+
+    def analyse(self, conflict):
+        # Learnt clause (asserting literal first) and the level to jump back to
+        level = len(self.trail_limits)
+        seen = set()
+        learnt = [None]
+        counter = 0
+        literal = None
+        position = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for other in (clause if literal is None else clause[1:]):
+                variable = abs(other)
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.levels[variable] == level:
+                        counter += 1
+                    else:
+                        learnt.append(other)
+            while abs(self.trail[position]) not in seen:
+                position -= 1
+            literal = self.trail[position]
+            position -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reasons[abs(literal)]]
+        learnt[0] = -literal
+        if len(learnt) == 1:
+            return learnt, 0
+        # Watch the literal from the highest remaining level second, so the clause is unit after the jump
+        highest = max(range(1, len(learnt)), key=lambda index: self.levels[abs(learnt[index])])
+        learnt[1], learnt[highest] = learnt[highest], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.order = [(-self.activity[variable], variable) for variable in range(1, self.variables + 1) if not self.values[variable]]
+            heapq.heapify(self.order)
+        elif not self.values[variable]:
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phase[variable] = literal > 0
+            self.values[variable] = 0
+            self.reasons[variable] = None
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = start
+        if len(self.order) > 4 * self.variables + 64:
+            # Too many stale entries: rebuild the heap from the unassigned variables
+            self.order = [(-self.activity[variable], variable) for variable in range(1, self.variables + 1) if not self.values[variable]]
+            heapq.heapify(self.order)
+
+    def decide(self):
+        # Most active unassigned variable, or None when every variable is assigned
+        while self.order:
+            _, variable = heapq.heappop(self.order)
+            if not self.values[variable]:
+                return variable
+        return None
+
+    def solve(self):
+        # True if the clauses are satisfiable (see model()), False if not
+        if self.unsatisfiable:
+            return False
+        for literal in self.pending_units:
+            value = self.value(literal)
+            if value == -1:
+                self.unsatisfiable = True
+                return False
+            if value == 0:
+                self.assign(literal, None)
+        self.pending_units = []
+        restarts, conflicts, limit = 0, 0, RESTART_BASE
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.trail_limits:
+                    self.unsatisfiable = True
+                    return False
+                conflicts += 1
+                learnt, level = self.analyse(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.assign(learnt[0], self.attach(learnt))
+                self.increment /= ACTIVITY_DECAY
+                continue
+            if conflicts >= limit:
+                restarts += 1
+                conflicts, limit = 0, RESTART_BASE * luby(restarts)
+                self.backtrack(0)
+                continue
+            variable = self.decide()
+            if variable is None:
+                return True
+            self.trail_limits.append(len(self.trail))
+            self.assign(variable if self.phase[variable] else -variable, None)
+
+    def model(self):
+        # Variable -> bool after a satisfiable solve(); unconstrained variables are False
+        return {variable: self.values[variable] == 1 for variable in range(1, self.variables + 1)}
+
+
+def code(literal):
+    return 2 * literal if literal > 0 else -2 * literal + 1
+
+
+def luby(index):
+    # index-th term (from 0) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+    size, power = 1, 0
+    while size < index + 1:
+        power += 1
+        size = 2 * size + 1
+    while size - 1 != index:
+        size = (size - 1) // 2
+        power -= 1
+        index %= size
+    return 1 << power
+
+
+class TseitinEncoder:
+    # Adds formulas to a Solver in conjunctive normal form, with one fresh variable per
+    # distinct sub-formula defined by clauses equivalent to its connective. Nodes are interned,
+    # so a sub-formula shared between formulas is encoded once.
+    def __init__(self, solver):
+        self.solver = solver
+        self.literals = {}  # formula node -> literal
+        self.names = {}  # variable name -> solver variable
+
+    def literal(self, formula):
+        # Literal equivalent to formula, encoding its sub-formulas bottom-up without recursion
+        literals = self.literals
+        stack = [formula]
+        while stack:
+            node = stack[-1]
+            if node in literals:
+                stack.pop()
+            elif node.op == VAR:
+                variable = self.solver.new_variable()
+                self.names[node.name] = variable
+                literals[node] = variable
+                stack.pop()
+            else:
+                pending = [child for child in node.args if child not in literals]
+                if pending:
+                    stack.extend(pending)
+                else:
+                    literals[node] = self.define(node.op, [literals[child] for child in node.args])
+                    stack.pop()
+        return literals[formula]
+
+    def define(self, op, operands):
+        if op == NOT:
+            return -operands[0]
+        a, b = operands
+        x = self.solver.new_variable()
+        add = self.solver.add_clause
+        if op == AND:
+            add([-x, a]); add([-x, b]); add([x, -a, -b])
+        elif op == OR:
+            add([-x, a, b]); add([x, -a]); add([x, -b])
+        elif op == IMPLIES:
+            add([-x, -a, b]); add([x, a]); add([x, -b])
+        elif op == XOR:
+            add([-x, a, b]); add([-x, -a, -b]); add([x, -a, b]); add([x, a, -b])
+        elif op == IFF:
+            add([-x, -a, b]); add([-x, a, -b]); add([x, a, b]); add([x, -a, -b])
+        else:
+            raise ValueError(f"Unknown connective {op}")
+        return x
+
+    def assignment(self, model, names):
+        return {name: model[self.names[name]] for name in names}
+
+
+def satisfying_assignment(formulas):
+    # Assignment (variable name -> bool, in order of first appearance) making every formula
+    # true, or None if there is none
+    formulas = tuple(as_formula(formula) for formula in formulas)
+    return _satisfying_assignment(formulas)
+
+
+@lru_cache(maxsize=4096)
+def _satisfying_assignment(formulas):
+    solver = Solver()
+    encoder = TseitinEncoder(solver)
+    for formula in formulas:
+        solver.add_clause([encoder.literal(formula)])
+    if not solver.solve():
+        return None
+    return encoder.assignment(solver.model(), variables_of(formulas))
+
+
+def entails(premises, conclusion):
+    # Same contract as truthTable.entails: (True, None) if the premises entail the conclusion,
+    # otherwise (False, assignment) with a counterexample. No limit on the number of variables.
+    premises = [as_formula(premise) for premise in premises]
+    conclusion = as_formula(conclusion)
+    counterexample = satisfying_assignment(premises + [Not(conclusion)])
+    return counterexample is None, counterexample
+
+
+def equivalent(first, second):
+    first, second = as_formula(first), as_formula(second)
+    return satisfying_assignment([Xor(first, second)]) is None
+
@@ -0,0 +1,344 @@
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import threading
+from functools import lru_cache
+from itertools import permutations
+
+from formula import as_formula, parse_formula, rename_variables, FormulaSyntaxError
+from prover import Derivation, Prover, prove_sequent, DEFAULT_TIME_BUDGET
+from truthTable import TruthTable, variables_of
+
+
+def cache_directory():
+    # Per-user cache directory of the tutor, following the XDG base directory convention
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'logictutor')
+
+
+# Store shared by every tutor session of a user; LOGIC_TUTOR_STORE points sessions at
+# another file, such as one store shared by a whole class. Nothing is written next to the code.
+DEFAULT_STORE = os.environ.get('LOGIC_TUTOR_STORE') or os.path.join(cache_directory(), 'solved_sequents.db')
+# Up to this many variables every renaming is tried, so renamed copies of a sequent always
+# share a key. Larger sequents use one heuristic order, which at worst costs a store miss.
+MAX_EXACT_VARIABLES = 6
+# Offline pre-solving can afford a far larger search than an interactive hint
+BULK_TIME_BUDGET = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solved (
+    key TEXT PRIMARY KEY,
+    sequent TEXT NOT NULL,
+    valid INTEGER,
+    derivation TEXT,
+    time_budget REAL NOT NULL
+)
+"""
+
+
+def sequent_text(premises, conclusion):
+    return " , ".join(str(premise) for premise in premises) + " ⊢ " + str(conclusion)
+
+
+def candidate_orders(variables, premises, conclusion):
+    if len(variables) <= MAX_EXACT_VARIABLES:
+        return permutations(variables)
+    # Order of first appearance, reading the conclusion and then the premises sorted by shape
+    masked = {name: 'x' for name in variables}
+    premises = sorted(premises, key=lambda premise: str(rename_variables(premise, masked)))
+    return [variables_of([conclusion] + premises)]
+
+
+@lru_cache(maxsize=4096)
+def _canonical_sequent(premises, conclusion):
+    premises = list(set(premises))
+    variables = variables_of([conclusion] + premises)
+    best = None
+    for order in candidate_orders(variables, premises, conclusion):
+        names = {name: f"p{index}" for index, name in enumerate(order, start=1)}
+        renamed = sorted({str(rename_variables(premise, names)) for premise in premises})
+        text = sequent_text(renamed, rename_variables(conclusion, names))
+        if best is None or text < best[0]:
+            best = (text, names)
+    text, names = best
+    return hashlib.sha256(text.encode('utf-8')).hexdigest(), text, names
+
+
+def canonical_sequent(premises, conclusion):
+    # Canonical form of a sequent: premise order, repeated premises and variable names do not
+    # matter. Returns (key, text, names) where names maps the sequent's variables to the
+    # canonical ones (p1, p2, ...).
+    return _canonical_sequent(tuple(as_formula(premise) for premise in premises), as_formula(conclusion))
+
+
+def encode_derivation(derivation, names):
+    # Flatten a derivation into a JSON node table [[formula, rule, [child indexes]], ...] with
+    # the root last and variables renamed through names. Shared sub-derivations are stored once.
+    index = {}  # id(node) -> position in the table
+    table = []
+    stack = [derivation]
+    while stack:
+        node = stack[-1]
+        if id(node) in index:
+            stack.pop()
+            continue
+        pending = [child for child in node.children if id(child) not in index]
+        if pending:
+            stack.extend(pending)
+            continue
+        index[id(node)] = len(table)
+        table.append([str(rename_variables(node.formula, names)), node.rule, [index[id(child)] for child in node.children]])
+        stack.pop()
+    return json.dumps(table, ensure_ascii=False)
+
+
+def decode_derivation(encoded, names):
+    # Rebuild a derivation from encode_derivation() output, renaming variables through names
+    nodes = []
+    for formula, rule, children in json.loads(encoded):
+        formula = rename_variables(parse_formula(formula), names)
+        nodes.append(Derivation(formula, rule, tuple(nodes[child] for child in children)))
+    return nodes[-1]
+
+
+def is_valid(premises, conclusion):
+    # Semantic validity of the sequent, or None when it is too big for a truth table or BDDs
+    try:
+        return TruthTable(list(premises) + [conclusion]).entails(premises, conclusion)[0]
+    except ValueError:
+        pass
+    import bdd  # only needed beyond truth-table size
+    try:
+        return bdd.entails(premises, conclusion)[0]
+    except bdd.BDDSizeError:
+        return None
+
+
+class SequentStore:
+    # SQLite file of solved sequents keyed by canonical_sequent(). The database runs in WAL
+    # mode so any number of sessions can read while one writes, and every thread gets its
+    # own connection. A read-only store never writes and never creates the file.
+    def __init__(self, path=DEFAULT_STORE, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.local = threading.local()
+        if not readonly:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            connection = self.connection()
+            with connection:
+                connection.execute(SCHEMA)
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            import sqlite3  # only needed once a store is opened
+            if self.readonly:
+                uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+                connection = sqlite3.connect(uri, uri=True, timeout=30)
+            else:
+                connection = sqlite3.connect(self.path, timeout=30)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, key):
+        # (valid, encoded derivation or None, time budget it was searched with), or None if unknown
+        return self.connection().execute(
+            "SELECT valid, derivation, time_budget FROM solved WHERE key = ?", (key,)
+        ).fetchone()
+
+    def known_keys(self):
+        # key -> (valid, solved, time budget) for every stored sequent
+        rows = self.connection().execute("SELECT key, valid, derivation IS NOT NULL, time_budget FROM solved")
+        return {key: (valid, bool(solved), time_budget) for key, valid, solved, time_budget in rows}
+
+    def put_many(self, records):
+        # Store (key, sequent, valid, encoded derivation, time budget) records in one transaction
+        if self.readonly:
+            return
+        connection = self.connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO solved (key, sequent, valid, derivation, time_budget) VALUES (?, ?, ?, ?, ?)",
+                records,
+            )
+
+    def count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM solved").fetchone()[0]
+
+    def close(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+
+@lru_cache(maxsize=None)
+def default_store():
+    # The shared store, or None when it cannot be opened (e.g. a read-only install directory)
+    import sqlite3
+    try:
+        return SequentStore(DEFAULT_STORE)
+    except (OSError, sqlite3.Error):
+        try:
+            return SequentStore(DEFAULT_STORE, readonly=True)
+        except (OSError, sqlite3.Error):
+            return None
+
+
+def solve_record(premises, conclusion, time_budget):
+    # Search for a proof and return the record to store for it
+    key, text, names = canonical_sequent(premises, conclusion)
+    valid = is_valid(premises, conclusion)
+    derivation = None
+    if valid is not False:
+        derivation = Prover(time_budget=time_budget).prove(premises, conclusion)
+        if derivation is not None:
+            valid = True
+    encoded = encode_derivation(derivation, names) if derivation is not None else None
+    return key, text, None if valid is None else int(valid), encoded, time_budget
+
+
+@lru_cache(maxsize=1024)
+def _solved_derivation(premises, conclusion, store):
+    import sqlite3
+    key, text, names = canonical_sequent(premises, conclusion)
+    try:
+        record = store.get(key)
+    except sqlite3.Error:
+        record = None
+    if record is not None:
+        encoded = record[1]
+        if encoded is None:
+            return None
+        back = {canonical: name for name, canonical in names.items()}
+        return decode_derivation(encoded, back)
+
+    derivation = prove_sequent(premises, conclusion)
+    valid = True if derivation is not None else is_valid(premises, conclusion)
+    encoded = encode_derivation(derivation, names) if derivation is not None else None
+    try:
+        store.put_many([(key, text, None if valid is None else int(valid), encoded, DEFAULT_TIME_BUDGET)])
+    except sqlite3.Error:
+        pass  # another session may hold the write lock; the result is still returned
+    return derivation
+
+
+def solved_derivation(premises, conclusion, store=None):
+    # Derivation of conclusion from premises in the problem's own variable names, or None.
+    # With a store, a sequent solved before (in any session, under any variable names) is
+    # read back instead of searched for, and new results are saved for the next session.
+    premises = tuple(as_formula(premise) for premise in premises)
+    conclusion = as_formula(conclusion)
+    if store is None:
+        return prove_sequent(premises, conclusion)
+    return _solved_derivation(premises, conclusion, store)
+
+
+# Problem bank format: one sequent per line, either as text "p ∧ q , q → a ⊢ a" or as a JSON
+# object with "premises" (list or comma-separated text) and "conclusion" like batchGrader input.
+
+def parse_problem(text):
+    text = text.strip()
+    if text.startswith('{'):
+        problem = json.loads(text)
+        premises, conclusion = problem.get('premises', []), problem['conclusion']
+        if isinstance(premises, str):
+            premises = premises.split(',')
+    else:
+        premises, separator, conclusion = text.rpartition('⊢')
+        if not separator:
+            raise ValueError("Expected 'premises ⊢ conclusion'.")
+        premises = premises.split(',')
+    premises = tuple(parse_formula(premise.strip()) for premise in premises if premise.strip())
+    return premises, parse_formula(conclusion.strip())
+
+
+def solve_chunk(problems, time_budget):
+    # Worker entry point: problems are canonical sequent texts
+    records = []
+    for text in problems:
+        premises, conclusion = parse_problem(text)
+        records.append(solve_record(premises, conclusion, time_budget))
+    return records
+
+
+def presolve(texts, store, workers=None, chunksize=16, time_budget=BULK_TIME_BUDGET):
+    # Solve every sequent of a problem bank that the store does not already answer, across
+    # worker processes. Duplicates and renamed copies are solved once. Returns counts.
+    counts = {'read': 0, 'unreadable': 0, 'known': 0, 'solved': 0, 'unsolved': 0}
+    known = store.known_keys()
+    pending = {}  # key -> canonical text
+    for text in texts:
+        counts['read'] += 1
+        try:
+            premises, conclusion = parse_problem(text)
+        except (ValueError, KeyError, FormulaSyntaxError):
+            counts['unreadable'] += 1
+            continue
+        key, canonical, _ = canonical_sequent(premises, conclusion)
+        stored = known.get(key)
+        # Unsolved valid sequents are retried when the new search budget is larger
+        if key in pending or (stored is not None and (stored[1] or stored[0] == 0 or stored[2] >= time_budget)):
+            counts['known'] += 1
+            continue
+        pending[key] = canonical
+
+    problems = list(pending.values())
+    chunks = [problems[start:start + chunksize] for start in range(0, len(problems), chunksize)]
+    workers = workers or os.cpu_count() or 1
+
+    def record_results(records):
+        store.put_many(records)
+        for record in records:
+            counts['solved' if record[3] is not None else 'unsolved'] += 1
+
+    if workers == 1:
+        for chunk in chunks:
+            record_results(solve_chunk(chunk, time_budget))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for records in executor.map(solve_chunk, chunks, [time_budget] * len(chunks)):
+                record_results(records)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-solve a bank of sequents into the shared solved-sequent store.")
+    parser.add_argument("inputs", nargs="*", help="Problem bank files, one sequent per line ('-' or nothing reads stdin).")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="SQLite store to fill (default: %(default)s).")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--chunksize", type=int, default=16, help="Sequents sent to a worker at a time.")
+    parser.add_argument("--time-budget", type=float, default=BULK_TIME_BUDGET, help="Search time per sequent in seconds.")
+    args = parser.parse_args(argv)
+
+    texts = []
+    for path in args.inputs or ['-']:
+        handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            texts.extend(text for text in handle if text.strip() and not text.lstrip().startswith('#'))
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+    store = SequentStore(args.store)
+    try:
+        counts = presolve(texts, store, args.workers, args.chunksize, args.time_budget)
+        total = store.count()
+    finally:
+        store.close()
+    print(
+        f"Read {counts['read']} sequents: {counts['solved']} solved, {counts['unsolved']} unsolved, "
+        f"{counts['known']} already stored, {counts['unreadable']} could not be read. Store holds {total}.",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import json
+import os
+import queue
+import threading
+import time
+
+
+# Seconds between fsyncs of the journal; a crash loses at most this much of the session
+FSYNC_INTERVAL = 0.2
+# Records between snapshots. A resume reads the latest snapshot and replays only the records
+# written after it, so resuming stays fast however long the session gets.
+SNAPSHOT_EVERY = 256
+
+# Journal records, one compact JSON object per line:
+#   {"t":"problem","premises":[...],"conclusion":"..."}   a new problem (clears the proof)
+#   {"t":"step","n":4,"dep":"1","step":"q","rule":"1 ∧E"}  an accepted line (replaces line n onwards)
+#   {"t":"hint","kind":"LH"}                              a hint request
+#   {"t":"reset"}                                         the proof was reset to the premises
+#   {"t":"lines","lines":[[4,"1","q","1 ∧E"],...]}       every line after the premises, after an edit
+
+_CLOSE = object()  # tells the writer thread to finish
+
+
+def new_state():
+    # Session state rebuilt from a journal; lines are [line number, line_dep, step, rule]
+    return {'premises': [], 'conclusion': None, 'lines': [], 'hints': {'LH': 0, 'HH': 0}}
+
+
+def apply_record(state, record):
+    kind = record['t']
+    if kind == 'step':
+        lines = state['lines']
+        del lines[record['n'] - len(state['premises']) - 1:]
+        lines.append([record['n'], record['dep'], record['step'], record['rule']])
+    elif kind == 'hint':
+        state['hints'][record['kind']] = state['hints'].get(record['kind'], 0) + 1
+    elif kind == 'reset':
+        state['lines'] = []
+    elif kind == 'lines':
+        state['lines'] = [list(line) for line in record['lines']]
+    elif kind == 'problem':
+        state['premises'] = list(record['premises'])
+        state['conclusion'] = record['conclusion']
+        state['lines'] = []
+
+
+def snapshot_path(path):
+    return path + ".snapshot"
+
+
+def load_session(path):
+    # Rebuild a session from its journal: returns (state, offset of the end of the last
+    # complete record), or None if there is no journal. A torn record at the end, left by a
+    # crash in the middle of a write, is ignored.
+    if not os.path.exists(path):
+        return None
+    state, offset = new_state(), 0
+    try:
+        with open(snapshot_path(path), encoding='utf-8') as handle:
+            snapshot = json.load(handle)
+        if snapshot['offset'] <= os.path.getsize(path):
+            state, offset = snapshot['state'], snapshot['offset']
+    except (OSError, ValueError, KeyError):
+        pass  # no usable snapshot: replay the whole journal
+
+    with open(path, 'rb') as handle:
+        handle.seek(offset)
+        for raw in handle:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            apply_record(state, record)
+            offset += len(raw)
+    return state, offset
+
+
+class SessionJournal:
+    # Append-only journal of one tutor session. append() only queues the record; a writer
+    # thread writes queued records in batches, fsyncs at most every fsync_interval seconds
+    # and writes a snapshot every snapshot_every records, all off the interactive path.
+    def __init__(self, path, resume=None, fsync_interval=FSYNC_INTERVAL, snapshot_every=SNAPSHOT_EVERY):
+        # resume is the (state, offset) pair from load_session() to continue that session;
+        # without it any existing journal at path is replaced
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.queue = queue.Queue()
+        if resume is None:
+            self.state = new_state()  # what the journal on disk describes, kept by the writer thread
+            self.handle = open(path, 'wb')
+            try:
+                os.remove(snapshot_path(path))
+            except FileNotFoundError:
+                pass
+        else:
+            self.state, offset = resume
+            self.handle = open(path, 'r+b')
+            self.handle.truncate(offset)  # drop a torn record left by a crash
+            self.handle.seek(offset)
+        self.since_snapshot = 0
+        self.thread = threading.Thread(target=self.run, name='session-journal', daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        self.queue.put(record)
+
+    def record_problem(self, premises, conclusion):
+        self.append({'t': 'problem', 'premises': list(premises), 'conclusion': str(conclusion)})
+
+    def record_step(self, line_number, line_dep, proof_step, rule_applied):
+        self.append({'t': 'step', 'n': line_number, 'dep': line_dep, 'step': str(proof_step), 'rule': rule_applied})
+
+    def record_hint(self, kind):
+        self.append({'t': 'hint', 'kind': kind})
+
+    def record_reset(self):
+        self.append({'t': 'reset'})
+
+    def record_lines(self, lines):
+        # Edits renumber and rewrite lines, so the whole proof after the premises is recorded
+        self.append({'t': 'lines', 'lines': lines})
+
+    def run(self):
+        last_sync = time.monotonic()
+        unsynced = False
+        closing = False
+        while not closing:
+            try:
+                batch = [self.queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not _CLOSE]
+            closing = len(records) != len(batch)
+
+            if records:
+                self.handle.write("".join(
+                    json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n" for record in records
+                ).encode('utf-8'))
+                for record in records:
+                    apply_record(self.state, record)
+                self.since_snapshot += len(records)
+                unsynced = True
+
+            now = time.monotonic()
+            if unsynced and (closing or now - last_sync >= self.fsync_interval):
+                self.handle.flush()
+                os.fsync(self.handle.fileno())
+                last_sync = now
+                unsynced = False
+                # Only a synced journal may be referenced by a snapshot
+                if self.since_snapshot >= self.snapshot_every:
+                    self.write_snapshot()
+        self.handle.close()
+
+    def write_snapshot(self):
+        # Replace the snapshot atomically so a crash leaves either the old or the new one
+        temporary = snapshot_path(self.path) + ".tmp"
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump({'offset': self.handle.tell(), 'state': self.state}, handle, ensure_ascii=False, separators=(',', ':'))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, snapshot_path(self.path))
+        self.since_snapshot = 0
+
+    def close(self):
+        # Write and sync everything queued so far, then stop the writer thread
+        self.queue.put(_CLOSE)
+        self.thread.join()
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from batchGrader import grade_line, grade_stream
+
+
+@pytest.mark.parametrize("submission", [
+    {"premises": None, "conclusion": "p"},
+    {"premises": [1], "conclusion": "p"},
+    {"premises": ["p"]},
+    {"premises": ["p"], "conclusion": 3},
+    {"premises": ["p"], "conclusion": "p", "lines": "1 ∧E"},
+])
+def test_malformed_submission_is_an_error_record(submission):
+    result = grade_line(json.dumps(submission))
+    assert result["error"] and result["complete"] is False
+
+
+def test_line_without_step_fails_only_that_line():
+    result = grade_line(json.dumps({"premises": ["p"], "conclusion": "p", "lines": [{"rule": "1 ∧E"}]}))
+    assert "error" not in result
+    assert [line["ok"] for line in result["lines"]] == [False]
+    assert result["complete"] is False
+
+
+def test_no_premises_and_no_lines():
+    assert grade_line(json.dumps({"conclusion": "p"}))["complete"] is False
+
+
+def test_bad_record_does_not_stop_the_batch():
+    texts = [json.dumps({"id": 1, "premises": None, "conclusion": "p"}),
+             json.dumps({"id": 2, "premises": ["p ∧ q"], "conclusion": "q",
+                         "lines": [{"line_dep": "1", "step": "q", "rule": "1 ∧E"}]})]
+    results = list(grade_stream(texts, workers=1))
+    assert "error" in results[0]
+    assert results[1]["complete"] is True
+
+
+def test_undecodable_lines_get_the_same_record_shape():
+    texts = ['{"id": 1, "premises"', '[1, 2]', json.dumps({"id": 3, "premises": None, "conclusion": "p"})]
+    results = list(grade_stream(texts, workers=1))
+    assert [sorted(result) for result in results] == [['complete', 'error', 'id', 'lines']] * 3
+    assert [(result['id'], result['lines'], result['complete']) for result in results] == \
+        [(None, [], False), (None, [], False), (3, [], False)]
+
+
+def test_unjustified_line_does_not_finish_the_proof():
+    result = grade_line(json.dumps({"premises": ["p"], "conclusion": "q",
+                                    "lines": [{"line_dep": "1", "step": "q", "rule": "None"}]}))
+    assert result["complete"] is False
+
+
+def test_discharged_assumption_finishes_the_proof():
+    result = grade_line(json.dumps({"premises": ["p"], "conclusion": "q → p", "lines": [
+        {"line_dep": "Premise", "step": "q", "rule": "None"},
+        {"line_dep": "1", "step": "p ∧ q", "rule": "1,2 ∧I"},
+        {"line_dep": "1", "step": "p", "rule": "3 ∧E"},
+        {"line_dep": "1", "step": "q → p", "rule": "2,4 →I"},
+    ]}))
+    assert result["complete"] is True
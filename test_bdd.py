@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+import bdd
+from formula import Var, And, Implies, parse_formula
+from proofRules import ProofLine, proof_concludes
+from truthTable import TruthTable, entails as table_entails
+
+
+def test_entailment_and_equivalence_match_the_truth_table(random_formulas, evaluate):
+    rng = random.Random(23)
+    for _ in range(300):
+        premises = random_formulas(rng.randint(0, 3), depth=3)
+        conclusion = random_formulas(1, depth=3)[0]
+        holds, counterexample = bdd.entails(premises, conclusion)
+        assert holds == table_entails(premises, conclusion)[0]
+        if not holds:
+            assert all(evaluate(premise, counterexample) for premise in premises)
+            assert not evaluate(conclusion, counterexample)
+        other = random_formulas(1, depth=3)[0]
+        assert bdd.equivalent_to(conclusion, other, premises) == TruthTable([conclusion, other]).equivalent(conclusion, other)
+
+
+def test_collection_keeps_live_nodes_canonical(random_formulas):
+    manager = bdd.BDD(("p", "q", "a", "r"))
+    formulas = random_formulas(200, depth=5, names=("p", "q", "a", "r"))
+    nodes = [manager.build(formula) for formula in formulas]
+    size = manager.size()
+    kept = manager.collect(nodes[:20])
+    assert manager.size() < size
+    # Rebuilding after the collection finds the renumbered nodes again
+    manager.built.clear()
+    assert [manager.build(formula) for formula in formulas[:20]] == kept
+
+
+def test_long_chains_do_not_run_out_of_nodes():
+    names = [Var(f"p{index}") for index in range(1000)]
+    premises = tuple(Implies(names[index], names[index + 1]) for index in range(999))
+    assert bdd.entails(premises, Implies(names[0], names[-1]))[0]
+    holds, counterexample = bdd.entails(premises, Implies(names[-1], names[0]))
+    assert not holds and counterexample["p999"] and not counterexample["p0"]
+    # Every prefix of a nested conjunction is a different BDD; they used to fill the manager
+    conjunction = names[0]
+    for name in names[1:700]:
+        conjunction = And(conjunction, name)
+    assert bdd.equivalent_to(conjunction, conjunction)
+    assert bdd.entails([conjunction], names[699])[0]
+
+
+def test_goal_queries_reuse_the_problem_bdds():
+    premises = (parse_formula("p → q"), parse_formula("q → a"))
+    conclusion = parse_formula("p → a")
+    assert bdd.entails(premises, conclusion)[0]
+    problem = bdd.sequent_bdd(premises, conclusion)
+    misses = bdd.sequent_bdd.cache_info().misses
+    steps = {1: ProofLine('Premise', premises[0]), 2: ProofLine('Premise', premises[1]),
+             3: ProofLine('1,2 →E', parse_formula("¬p ∨ a"))}
+    assert proof_concludes(steps, conclusion, semantic=True, premises=premises)
+    assert not proof_concludes(steps, conclusion, semantic=False, premises=premises)
+    assert bdd.sequent_bdd.cache_info().misses == misses
+    assert steps[3].step in problem.bdd.built
+
+
+def test_a_failed_premise_build_is_unpinned_and_not_repeated(monkeypatch):
+    names = [Var(f"p{index}") for index in range(12)]
+    premises = tuple(parse_formula(f"p{index} ↔ p{index + 6}") for index in range(6)) + tuple(names)
+    problem = bdd.SequentBDD(premises, names[0])
+    problem.bdd.max_nodes = 60  # too few for the conjunction of the premises
+    with pytest.raises(bdd.BDDSizeError):
+        problem.entailed()
+    # Only the variables survive; no partial conjunction stays pinned
+    assert not any(type(key) is tuple for key in problem.bdd.pinned)
+    assert problem.bdd.size() == 2 + len(problem.bdd.variables)
+    # Later queries fail straight away instead of building the premises again
+    builds = []
+    monkeypatch.setattr(problem.bdd, 'build', builds.append)
+    for _ in range(2):
+        with pytest.raises(bdd.BDDSizeError):
+            problem.entailed()
+    assert builds == []
@@ -0,0 +1,55 @@
+import copy
+import pickle
+
+import pytest
+
+from formula import parse_formula, FormulaSyntaxError, Var, And, Not
+
+
+def test_pickle_round_trip_keeps_nodes_interned():
+    formula = parse_formula("(p ∧ q) → ¬(a ∨ p)")
+    assert pickle.loads(pickle.dumps(formula)) is formula
+    assert copy.deepcopy(formula) is formula
+    # Nodes inside pickled containers come back as the same interned nodes
+    steps = {1: formula, 2: And(Var("p"), Not(Var("q")))}
+    restored = pickle.loads(pickle.dumps(steps))
+    assert restored[1] is formula and restored[2] is And(Var("p"), Not(Var("q")))
+
+
+def test_printed_formulas_parse_back_to_the_same_node(random_formulas):
+    for formula in random_formulas(500, depth=5):
+        assert parse_formula(str(formula)) is formula
+
+
+def test_right_associative_implication():
+    assert str(parse_formula("p → q → a")) == "p → (q → a)"
+    assert parse_formula("p → q → a") is not parse_formula("(p → q) → a")
+
+
+def test_deep_nesting_does_not_recurse():
+    formula = parse_formula("¬" * 100000 + "p")
+    for _ in range(100000):
+        formula = formula.operand
+    assert formula is Var("p")
+
+
+@pytest.mark.parametrize("text, position", [
+    ("p ∧", 3),
+    ("p ∧ ∧ q", 4),
+    ("(p ∧ q", 0),
+    ("p ∧ q)", 5),
+    ("p # q", 2),
+    ("pq", 1),
+    ("p q", 2),
+    ("", 0),
+])
+def test_syntax_errors_point_at_the_offending_character(text, position):
+    with pytest.raises(FormulaSyntaxError) as error:
+        parse_formula(text)
+    assert error.value.position == position
+
+
+def test_disallowed_variable():
+    with pytest.raises(FormulaSyntaxError) as error:
+        parse_formula("b ∧ p", {"p", "q", "a"})
+    assert error.value.position == 0
@@ -0,0 +1,63 @@
+import io
+import json
+
+import learnerAnalytics
+from learnerAnalytics import Aggregator, OTHER, aggregate, lines_in_range
+
+
+def event_lines(count):
+    # Encoded event lines of varying lengths, some of them with non-ASCII messages
+    lines = []
+    for index in range(count):
+        record = {'t': 'step', 's': f"s{index % 3}", 'ts': index, 'p': f"problem{index % 4}",
+                  'rule': ('∧I', '→E', '¬I')[index % 3], 'ok': index % 2 == 0}
+        if not record['ok']:
+            record['msg'] = "Line " + "x" * (index % 7) + " does not match ∧"
+        lines.append((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+    return lines
+
+
+def write_split_at(path, lines, inside_line):
+    # Write lines to path, padding the last one until the middle of the file, where two
+    # workers split it, falls inside a line or exactly on a line's "\n"
+    lines = list(lines)
+    while True:
+        data = b"".join(lines)
+        middle = -(-len(data) // 2)
+        if (data[middle] != ord("\n") and data[middle - 1] != ord("\n")) if inside_line else data[middle] == ord("\n"):
+            path.write_bytes(data)
+            return middle
+        lines[-1] = lines[-1][:-2] + b' }\n'
+
+
+def test_every_split_point_yields_each_line_once():
+    lines = event_lines(12)
+    data = b"".join(lines)
+    for split in range(len(data) + 1):
+        handle = io.BytesIO(data)
+        assert list(lines_in_range(handle, 0, split)) + list(lines_in_range(handle, split, len(data))) == lines
+
+
+def test_parallel_aggregation_matches_one_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(learnerAnalytics, 'RANGE_BYTES', 64)
+    lines = event_lines(40)
+    for inside_line in (True, False):
+        path = tmp_path / f"events-{inside_line}.jsonl"
+        write_split_at(path, lines, inside_line)
+        expected = aggregate([str(path)], workers=1).summary()
+        assert expected['events'] == 40 and expected['skipped'] == 0
+        assert aggregate([str(path)], workers=2).summary() == expected
+        assert aggregate([str(path), str(path)], workers=3).summary()['events'] == 80
+
+
+def test_rows_beyond_the_limit_fold_into_other():
+    aggregator = Aggregator(max_problems=2)
+    for problem in ("a", "b", "c", "d", "a", "c"):
+        aggregator.add({'t': 'problem', 'p': problem, 'ts': 0})
+    sessions = {record['key']: record['sessions'] for record in aggregator.summary()['problems']}
+    assert sessions == {"a": 2, "b": 1, OTHER: 3}
+    # Merging tables folds the other side's extra keys the same way
+    other = Aggregator(max_problems=2)
+    other.add({'t': 'problem', 'p': "e", 'ts': 0})
+    aggregator.merge(other)
+    assert {record['key']: record['sessions'] for record in aggregator.summary()['problems']}[OTHER] == 4
@@ -0,0 +1,10 @@
+from problemGenerator import generate_stream
+
+
+def test_stream_ends_when_the_settings_run_out_of_new_sequents():
+    settings = {'variables': 1, 'depth': 1, 'premises': (1, 1), 'connectives': None, 'conclusion_depth': 1,
+                'steps': None, 'time_budget': 1.0, 'seed': 1}
+    totals = {}
+    problems = list(generate_stream(settings, 1000, workers=1, chunksize=16, totals=totals))
+    assert 0 < len(problems) < 1000
+    assert totals['duplicate'] > 0
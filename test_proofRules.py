@@ -0,0 +1,116 @@
+from formula import parse_formula, BINARY_OPERATORS
+from proofRules import ProofChecker, VerdictCache, install_rules, ruleChecker, verdict_cache
+
+
+def checker_with(lines, cache=verdict_cache):
+    # ProofChecker holding (line_dep, formula text, rule) lines numbered from 1
+    checker = ProofChecker(cache=cache)
+    for line_number, (line_dep, text, rule) in enumerate(lines, start=1):
+        checker.add_line(line_number, line_dep, parse_formula(text), rule)
+    return checker
+
+
+def test_justify_finds_the_rule_and_lines():
+    checker = checker_with([('Premise', "p ∧ q", None), ('Premise', "q → a", None), ('1', "q", "1 ∧E")])
+    assert checker.justify(parse_formula("p"))[0] == "1 ∧E"
+    assert checker.justify(parse_formula("a"))[0] == "2,3 →E"
+    assert checker.justify(parse_formula("a ∧ q"))[0] is None
+
+
+def test_justified_steps_pass_the_rule_check(random_formulas):
+    premises = random_formulas(4, depth=2)
+    checker = checker_with([('Premise', str(premise), None) for premise in premises])
+    candidates = random_formulas(200, depth=3) + [premise.left for premise in premises if premise.op in BINARY_OPERATORS]
+    for formula in candidates:
+        rule_applied, _ = checker.justify(formula)
+        if rule_applied is not None:
+            assert checker.check(formula, rule_applied)[0], rule_applied
+
+
+def test_line_without_rule_is_an_undischarged_assumption():
+    checker = checker_with([('Premise', "p", None), ('1', "q", "None")])
+    assert checker.undischarged(2, 1) == [2]
+
+
+def derivation():
+    # Premises p ∧ q and q → a, then q, a and a ∧ q derived from them
+    return checker_with([('Premise', "p ∧ q", None), ('Premise', "q → a", None), ('1', "q", "1 ∧E"),
+                         ('1,2', "a", "2,3 →E"), ('1,2', "a ∧ q", "3,4 ∧I")])
+
+
+def test_editing_a_premise_rechecks_every_line_resting_on_it():
+    checker = derivation()
+    results = checker.replace_line(1, 'Premise', parse_formula("p ∧ r"))
+    assert [line for line, _, _ in results] == [3, 4, 5]
+    assert [line for line, valid, _ in results if not valid] == [3]
+    assert list(checker.invalid) == [3]
+    # The lines citing line 3 only through line 4 are reached as well
+    results = checker.replace_line(2, 'Premise', parse_formula("r → a"))
+    assert [(line, valid) for line, valid, _ in results] == [(4, False), (5, True)]
+    assert sorted(checker.invalid) == [3, 4]
+    # Undoing both edits clears the flags again
+    checker.replace_line(1, 'Premise', parse_formula("p ∧ q"))
+    checker.replace_line(2, 'Premise', parse_formula("q → a"))
+    assert checker.invalid == {}
+
+
+def test_inserting_a_line_renumbers_later_citations():
+    checker = derivation()
+    checker.insert_line(3, 'Premise', parse_formula("r"))
+    assert list(checker.proof_steps) == [1, 2, 3, 4, 5, 6]
+    assert checker.proof_steps[5].rule == "2,4 →E"
+    assert checker.proof_steps[6].rule == "4,5 ∧I"
+    assert checker.affected_by(4) == [5, 6]
+    assert checker.verify(6)[0]
+    # The moved lines keep resting on the premises only, not on the inserted assumption
+    assert checker.undischarged(6, 2) == []
+
+
+def test_deleting_a_cited_line_is_refused():
+    checker = derivation()
+    valid, message = checker.delete_line(3)
+    assert not valid and "4, 5" in message
+    assert list(checker.proof_steps) == [1, 2, 3, 4, 5]
+    checker.insert_line(3, 'Premise', parse_formula("r"))
+    assert checker.delete_line(3)[0]
+    assert checker.proof_steps[5].rule == "3,4 ∧I"
+    assert sorted(checker.dependents[3]) == [4, 5]
+    assert checker.verify(5)[0]
+
+
+def test_same_derivation_at_other_line_numbers_shares_a_verdict():
+    cache = VerdictCache()
+    first = checker_with([('Premise', "p ∧ q", None)], cache)
+    assert first.check(parse_formula("p"), "1 ∧E")[0]
+    second = checker_with([('Premise', "r", None), ('Premise', "a", None), ('Premise', "p ∧ q", None)], cache)
+    assert second.check(parse_formula("p"), "3 ∧E")[0]
+    assert cache.stats()['size'] == 1 and cache.stats()['hits'] == 1
+
+
+def test_implication_introduction_needs_an_assumption_despite_a_cached_verdict():
+    cache = VerdictCache()
+    step = parse_formula("p → p ∧ q")
+    assumed = checker_with([('Premise', "q", None), ('Premise', "p", None), ('1,2', "p ∧ q", "2,1 ∧I")], cache)
+    assert assumed.check(step, "2,3 →I")[0]
+    # Same formulas on the cited lines, but line 2 is derived rather than assumed
+    derived = checker_with([('Premise', "p ∧ q", None), ('1', "p", "1 ∧E"), ('1', "q", "1 ∧E"),
+                            ('1', "p ∧ q", "2,3 ∧I")], cache)
+    assert not derived.check(step, "2,4 →I")[0]
+    assert cache.stats()['size'] == 2
+
+
+def test_reversed_subproof_lines_do_not_share_a_verdict():
+    cache = VerdictCache()
+    step = parse_formula("p → q")
+    forward = checker_with([('Premise', "a", None), ('Premise', "p", None), ('Premise', "q", None)], cache)
+    assert forward.check(step, "2,3 →I")[0]
+    # "3,2" cites the same formulas in the same order, but the subproof would end before it starts
+    backward = checker_with([('Premise', "a", None), ('Premise', "q", None), ('Premise', "p", None)], cache)
+    assert not backward.check(step, "3,2 →I")[0]
+
+
+def test_installing_rules_clears_the_verdict_cache():
+    ruleChecker(parse_formula("p"), "1 ∧E", checker_with([('Premise', "p ∧ q", None)]).proof_steps)
+    assert verdict_cache.stats()['size'] > 0
+    install_rules()
+    assert verdict_cache.stats()['size'] == 0
@@ -0,0 +1,44 @@
+from problemGenerator import SequentGenerator
+from proofRules import ProofChecker, proof_concludes
+from prover import prove_sequent, next_step
+
+
+def replay(premises, conclusion, derivation):
+    # Enter a derivation line by line the way the hints tell a student to, checking each
+    # rule application; returns the finished checker
+    checker = ProofChecker()
+    for line_number, premise in enumerate(premises, start=1):
+        checker.add_line(line_number, 'Premise', premise)
+    while True:
+        available = {}
+        for line_number in sorted(checker.proof_steps):
+            available.setdefault(checker.line_formula(line_number), []).append(line_number)
+        step = next_step(derivation, available, checker.dependencies, checker.assumption_bits,
+                         checker.premise_mask(len(premises)))
+        if step is None:
+            return checker
+        node, line_refs, _ = step
+        line_number = max(checker.proof_steps) + 1
+        if node.rule == 'Assume':
+            checker.add_line(line_number, 'Premise', node.formula)
+            continue
+        refs = ",".join(str(line_ref) for line_ref in line_refs)
+        rule_applied = f"{refs} {node.rule}"
+        valid, message = checker.check(node.formula, rule_applied, line_number)
+        assert valid, (premises, conclusion, line_number, rule_applied, message)
+        checker.add_line(line_number, refs, node.formula, rule_applied)
+
+
+def test_hinted_steps_of_generated_sequents_are_accepted():
+    proved = 0
+    for premises, conclusion, _ in SequentGenerator(variables=3, depth=2, seed=5).generate(200):
+        derivation = prove_sequent(premises, conclusion)
+        if derivation is None:
+            continue
+        proved += 1
+        checker = replay(premises, conclusion, derivation)
+        last_line = max(checker.proof_steps)
+        assert proof_concludes(checker.proof_steps, conclusion)
+        assert checker.undischarged(last_line, len(premises)) == []
+        assert checker.invalid == {}
+    assert proved >= 190
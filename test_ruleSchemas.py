@@ -0,0 +1,83 @@
+import json
+import random
+
+import pytest
+
+from formula import Implies, as_formula
+from proofRules import ProofChecker, RULES, install_rules
+from ruleSchemas import BUILTIN_RULES, RuleSchemaError, compile_rule, compile_matcher, instantiate, load_rule_set, unify
+from truthTable import entails
+
+SCHEMA_RULES = [rule for rule, definition in BUILTIN_RULES.items() if 'schemas' in definition]
+
+
+def metavariables(schema):
+    names = set()
+    for node in list(schema.patterns) + [schema.conclusion]:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.op == 'var':
+                names.add(node.name)
+            else:
+                stack.extend(node.args)
+    return sorted(names)
+
+
+def unified(schema, step, formulas):
+    # The interpreted reference for a generated matcher
+    bindings = {}
+    for pattern, node in list(zip(schema.patterns, formulas)) + [(schema.conclusion, step)]:
+        bindings = unify(pattern, node, bindings)
+        if bindings is None:
+            return False
+    return True
+
+
+@pytest.mark.parametrize("rule", SCHEMA_RULES)
+def test_instances_are_accepted_and_sound(rule, random_formulas):
+    for schema in compile_rule(rule, BUILTIN_RULES[rule]).schemas:
+        for _ in range(20):
+            bindings = dict(zip(metavariables(schema), random_formulas(len(metavariables(schema)), depth=3)))
+            lines = [instantiate(pattern, bindings) for pattern in schema.patterns]
+            step = instantiate(schema.conclusion, bindings)
+            assert schema.match(step, *lines), schema.text
+            # Semantically, each subproof stands for assumption → end
+            premises = [line for position, line in enumerate(lines)
+                        if position not in schema.discharges and position not in schema.discharges.values()]
+            premises += [Implies(lines[start], lines[end]) for end, start in schema.discharges.items()]
+            assert entails(premises, step)[0], (schema.text, [str(line) for line in lines], str(step))
+
+
+@pytest.mark.parametrize("rule", SCHEMA_RULES)
+def test_generated_matchers_agree_with_unification(rule, random_formulas):
+    rng = random.Random(rule)
+    for schema in compile_rule(rule, BUILTIN_RULES[rule]).schemas:
+        match = compile_matcher(schema.patterns, schema.conclusion, schema.text)
+        pool = random_formulas(12, depth=2, names=("p", "q"))
+        for _ in range(300):
+            formulas = [rng.choice(pool) for _ in schema.patterns]
+            step = rng.choice(pool)
+            assert match(step, *formulas) == unified(schema, step, formulas), schema.text
+
+
+def test_rule_set_adds_a_rule(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"HS": {"name": "Hypothetical syllogism", "schemas": ["A → B, B → C ⊢ A → C"]}}), encoding="utf-8")
+    try:
+        install_rules(load_rule_set(str(path)))
+        assert "HS" in RULES
+        checker = ProofChecker()
+        checker.add_line(1, 'Premise', as_formula("p → q"))
+        checker.add_line(2, 'Premise', as_formula("q → a"))
+        assert checker.check(as_formula("p → a"), "1,2 HS")[0]
+        assert not checker.check(as_formula("a → p"), "1,2 HS")[0]
+    finally:
+        install_rules()
+
+
+def test_malformed_schema_is_rejected():
+    with pytest.raises(RuleSchemaError):
+        compile_rule("X", {"schemas": ["A ∧ B"]})
+    with pytest.raises(RuleSchemaError):
+        compile_rule("X", {"schemas": ["A ⊢ B", "[A] B ⊢ B"]})
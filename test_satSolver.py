@@ -0,0 +1,54 @@
+import random
+
+import satSolver
+from formula import Var, And, Implies
+from truthTable import TruthTable, entails as table_entails
+
+
+def test_satisfiability_matches_the_truth_table(random_formulas, evaluate):
+    rng = random.Random(7)
+    for _ in range(300):
+        formulas = random_formulas(rng.randint(1, 4), depth=4, names=("p", "q", "a", "r"))
+        assignment = satSolver.satisfying_assignment(formulas)
+        table = TruthTable(formulas)
+        satisfiable = any(all(table.column(formula) >> row & 1 for formula in formulas) for row in range(2 ** len(table.variables)))
+        assert (assignment is not None) == satisfiable
+        if assignment is not None:
+            assert all(evaluate(formula, assignment) for formula in formulas)
+
+
+def test_entailment_and_equivalence_match_the_truth_table(random_formulas, evaluate):
+    rng = random.Random(11)
+    for _ in range(300):
+        premises = random_formulas(rng.randint(0, 3), depth=3)
+        conclusion = random_formulas(1, depth=3)[0]
+        holds, counterexample = satSolver.entails(premises, conclusion)
+        assert holds == table_entails(premises, conclusion)[0]
+        if not holds:
+            assert all(evaluate(premise, counterexample) for premise in premises)
+            assert not evaluate(conclusion, counterexample)
+        other = random_formulas(1, depth=3)[0]
+        assert satSolver.equivalent(conclusion, other) == TruthTable([conclusion, other]).equivalent(conclusion, other)
+
+
+def test_chain_beyond_the_truth_table_limit():
+    names = [Var(f"p{index}") for index in range(60)]
+    premises = [Implies(names[index], names[index + 1]) for index in range(59)]
+    assert satSolver.entails(premises, Implies(names[0], names[-1]))[0]
+    holds, counterexample = satSolver.entails(premises, Implies(names[-1], names[0]))
+    assert not holds and counterexample["p59"] and not counterexample["p0"]
+
+
+def test_luby_sequence():
+    assert [satSolver.luby(index) for index in range(15)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+
+def test_checker_counterexample_for_a_rejected_step():
+    from proofRules import ProofChecker
+    from formula import parse_formula
+    checker = ProofChecker()
+    checker.add_line(1, 'Premise', parse_formula("p ∨ q"))
+    assert checker.counterexample(parse_formula("p"), "1 ∧E") == ([1], {"p": False, "q": True})
+    checker.add_line(2, 'Premise', parse_formula("¬q"))
+    assert checker.counterexample(parse_formula("p"), "1,2 ∧I") == ([1, 2], None)
+    assert checker.counterexample(parse_formula("p"), "1,9 ∧I") is None
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+from formula import parse_formula
+from sequentStore import SequentStore, solved_derivation
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_default_store_lives_in_the_user_cache(tmp_path):
+    environment = {key: value for key, value in os.environ.items() if key != 'LOGIC_TUTOR_STORE'}
+    environment['XDG_CACHE_HOME'] = str(tmp_path)
+    script = "import sequentStore; print(sequentStore.DEFAULT_STORE); sequentStore.default_store().count()"
+    output = subprocess.run([sys.executable, "-c", script], cwd=HERE, env=environment,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == str(tmp_path / "logictutor" / "solved_sequents.db")
+    assert (tmp_path / "logictutor" / "solved_sequents.db").exists()
+
+
+def test_store_keeps_solved_sequents(tmp_path):
+    store = SequentStore(str(tmp_path / "new" / "solved.db"))
+    premises, conclusion = [parse_formula("p ∧ q")], parse_formula("q ∧ p")
+    assert solved_derivation(premises, conclusion, store) is not None
+    assert store.count() == 1
+    store.close()
@@ -0,0 +1,58 @@
+import json
+import os
+
+from sessionJournal import SessionJournal, load_session, snapshot_path
+
+
+def write_session(path, records, resume=None, snapshot_every=1000):
+    journal = SessionJournal(str(path), resume, fsync_interval=0.01, snapshot_every=snapshot_every)
+    for record in records:
+        journal.append(record)
+    journal.close()
+
+
+PROBLEM = {'t': 'problem', 'premises': ["p ∧ q", "q → a"], 'conclusion': "a"}
+STEPS = [{'t': 'step', 'n': 3, 'dep': '1', 'step': "q", 'rule': "1 ∧E"},
+         {'t': 'hint', 'kind': 'LH'},
+         {'t': 'step', 'n': 4, 'dep': '1,2', 'step': "a", 'rule': "2,3 →E"}]
+
+
+def test_snapshot_and_replay_of_the_tail(tmp_path):
+    path = tmp_path / "session.journal"
+    write_session(path, [PROBLEM, *STEPS], snapshot_every=2)
+    write_session(path, [{'t': 'hint', 'kind': 'HH'}, {'t': 'hint', 'kind': 'LH'}], resume=load_session(str(path)))
+    with open(snapshot_path(str(path)), encoding='utf-8') as handle:
+        offset = json.load(handle)['offset']
+    assert 0 < offset < os.path.getsize(path)
+    # Garbling the records the snapshot covers shows they are not read again
+    with open(path, 'r+b') as handle:
+        handle.write(b"x" * offset)
+    state, end = load_session(str(path))
+    assert end == os.path.getsize(path)
+    assert state['premises'] == ["p ∧ q", "q → a"] and state['conclusion'] == "a"
+    assert state['lines'] == [[3, '1', "q", "1 ∧E"], [4, '1,2', "a", "2,3 →E"]]
+    assert state['hints'] == {'LH': 2, 'HH': 1}
+
+
+def test_torn_last_record_is_ignored_and_dropped_on_resume(tmp_path):
+    path = tmp_path / "session.journal"
+    write_session(path, [PROBLEM, *STEPS])
+    size = os.path.getsize(path)
+    with open(path, 'ab') as handle:
+        handle.write(b'{"t":"hint","ki')
+    state, offset = load_session(str(path))
+    assert offset == size and state['hints'] == {'LH': 1, 'HH': 0}
+    write_session(path, [{'t': 'hint', 'kind': 'HH'}], resume=(state, offset))
+    with open(path, 'rb') as handle:
+        assert all(json.loads(raw) for raw in handle)
+    assert load_session(str(path))[0]['hints'] == {'LH': 1, 'HH': 1}
+
+
+def test_resume_without_a_snapshot_replays_the_whole_journal(tmp_path):
+    path = tmp_path / "session.journal"
+    write_session(path, [PROBLEM, *STEPS, {'t': 'reset'}, STEPS[0]])
+    assert not os.path.exists(snapshot_path(str(path)))
+    state, offset = load_session(str(path))
+    assert offset == os.path.getsize(path)
+    assert state['lines'] == [[3, '1', "q", "1 ∧E"]] and state['hints'] == {'LH': 1, 'HH': 0}
+    assert load_session(str(tmp_path / "missing.journal")) is None
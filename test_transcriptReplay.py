@@ -0,0 +1,56 @@
+import json
+
+from logicTutor import LogicProofTutor
+from transcriptReplay import RecordingIO, read_transcripts, replay
+
+# A short session: p ∧ q ⊢ q ∧ p proved in three steps and checked
+ANSWERS = ["p ∧ q", "q ∧ p",
+           "1", "q", "1 ∧E", "",
+           "1", "p", "1 ∧E", "",
+           "1", "q ∧ p", "2,3 ∧I", "check"]
+
+
+class ScriptedIO:
+    # Answers the tutor from a list, then leaves the session like a student closing the terminal
+    def __init__(self, answers):
+        self.answers = list(answers)
+
+    def show(self, text):
+        pass
+
+    def ask(self, prompt):
+        if not self.answers:
+            raise EOFError
+        return self.answers.pop(0)
+
+
+def recorded_transcript(tmp_path):
+    io = RecordingIO(ScriptedIO(ANSWERS))
+    try:
+        LogicProofTutor(io=io).start_tutor()
+    except EOFError:
+        pass
+    path = tmp_path / "transcripts.jsonl"
+    path.write_text(json.dumps({'id': "t1", 'opening': io.opening, 'turns': io.turns}, ensure_ascii=False) + "\n",
+                    encoding='utf-8')
+    return read_transcripts([str(path)])[0]
+
+
+def test_recorded_session_replays_without_differences(tmp_path):
+    transcript = recorded_transcript(tmp_path)
+    assert [turn['answer'] for turn in transcript['turns']] == ANSWERS
+    assert any("Well done" in line for line in transcript['turns'][-1]['output'])
+    latencies, differences, error = replay(transcript)
+    assert differences == [] and error is None
+    assert len(latencies) == len(ANSWERS)
+
+
+def test_changed_output_is_reported(tmp_path):
+    transcript = recorded_transcript(tmp_path)
+    output = transcript['turns'][-1]['output']
+    index = next(index for index, line in enumerate(output) if "Well done" in line)
+    recorded = output[index]
+    output[index] = "The proof is complete."
+    _, differences, error = replay(transcript)
+    assert differences == [(len(ANSWERS), "The proof is complete.", recorded)]
+    assert error is None
@@ -0,0 +1,323 @@
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+
+from logicTutor import ConsoleIO, LogicProofTutor
+from proofRules import install_rules
+from ruleSchemas import RuleSchemaError, load_rule_set
+
+
+# Transcript format, one JSON object per line:
+#   {"id": "t1", "auto_justify": false, "accept_equivalent": false,
+#    "opening": ["", "Welcome to the Logic and Proof Tutor CLI!", ..., "Enter propositional premise ...: "],
+#    "turns": [{"answer": "p ∧ q", "output": ["Enter a propositional goal statement: "]}, ...]}
+# "opening" is everything the tutor shows and asks before the first answer. Each turn's
+# "output" is everything it shows and asks after that answer, up to and including the next
+# prompt, or up to the end of the session for the last turn. A turn without "output" is
+# replayed but not checked. When the answers run out the session ends as if the student had
+# left (EOFError), so a transcript need not finish the proof.
+
+# Fractions of the interactions at or under each reported latency
+PERCENTILES = (0.5, 0.9, 0.99)
+# A concurrency level is within capacity while its p99 latency stays under this many seconds
+DEFAULT_BUDGET = 0.1
+# Output differences printed per run; the rest are only counted
+MAX_REPORTED = 10
+# Answers to the step menu that are reported as their own kind of interaction
+MENU_COMMANDS = frozenset(('lh', 'hh', 'check', 'reset', 'next', 'tt', 'edit', 'insert', 'delete'))
+
+
+class RecordingIO:
+    # Passes a session through to another front end and keeps it as a transcript
+    def __init__(self, io):
+        self.io = io
+        self.opening = []
+        self.turns = []
+        self.output = self.opening
+
+    def show(self, text):
+        self.output.append(text)
+        self.io.show(text)
+
+    def ask(self, prompt):
+        self.output.append(prompt)
+        answer = self.io.ask(prompt)
+        self.output = []
+        self.turns.append({'answer': answer, 'output': self.output})
+        return answer
+
+
+class ReplayIO:
+    # Front end answering the tutor from a transcript, after think seconds or at once. Each
+    # interaction is timed from handing over an answer until the tutor asks its next question
+    # or the session ends, which is the wait a student would see.
+    def __init__(self, transcript, think=0.0):
+        self.answers = [turn['answer'] for turn in transcript.get('turns', [])]
+        self.think = think
+        self.output = []
+        self.outputs = [self.output]  # the opening, then the output after each answer
+        self.latencies = []  # (kind, seconds) per answer
+        self.kind = None
+        self.started = None
+
+    def show(self, text):
+        self.output.append(text)
+
+    def ask(self, prompt):
+        self.finish()
+        self.output.append(prompt)
+        answered = len(self.outputs) - 1
+        if answered == len(self.answers):
+            raise EOFError("The transcript has no more answers.")
+        answer = self.answers[answered]
+        if self.think:
+            time.sleep(self.think)
+        self.kind = interaction_kind(prompt, answer)
+        self.output = []
+        self.outputs.append(self.output)
+        self.started = time.perf_counter()
+        return answer
+
+    def finish(self):
+        # Close the interaction in progress, if any
+        if self.started is not None:
+            self.latencies.append((self.kind, time.perf_counter() - self.started))
+            self.started = None
+
+
+def interaction_kind(prompt, answer):
+    # Step menu commands by name (lh, check, ...), other answers by the field they fill in
+    # (Premise/LineDep, ProofStep, RuleApplied, ...). An empty answer to the step menu is
+    # reported under "Press", the menu's first word.
+    command = answer.strip().split(' ', 1)[0].lower()
+    if command in MENU_COMMANDS:
+        return command
+    words = prompt.split()
+    return words[0].rstrip(':') if words else ''
+
+
+def record_session(path, transcript_id=None, auto_justify=False, accept_equivalent=False):
+    # Run an interactive console session and append its transcript to path
+    io = RecordingIO(ConsoleIO())
+    tutor = LogicProofTutor(auto_justify=auto_justify, io=io, accept_equivalent=accept_equivalent)
+    try:
+        tutor.start_tutor()
+    except (EOFError, KeyboardInterrupt):
+        pass  # the session so far is still worth keeping
+    transcript = {'id': transcript_id, 'auto_justify': auto_justify, 'accept_equivalent': accept_equivalent,
+                  'opening': io.opening, 'turns': io.turns}
+    with open(path, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps(transcript, ensure_ascii=False) + "\n")
+    return transcript
+
+
+def read_transcripts(paths):
+    # Transcripts of every file in order; '-' or no paths reads stdin
+    transcripts = []
+    for path in paths or ['-']:
+        handle = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for number, text in enumerate(handle, start=1):
+                if not text.strip():
+                    continue
+                transcript = json.loads(text)
+                if not isinstance(transcript, dict) or not isinstance(transcript.get('turns'), list):
+                    raise ValueError(f"{path}:{number}: expected a transcript object with a list of turns.")
+                if transcript.get('id') is None:
+                    transcript['id'] = f"{path}:{number}"
+                transcripts.append(transcript)
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+    return transcripts
+
+
+def differences(transcript, outputs):
+    # (turn, expected line, replayed line) for the first difference in every checked turn;
+    # turn 0 is the opening and a missing line is None
+    expected = [transcript.get('opening')] + [turn.get('output') for turn in transcript['turns']]
+    found = []
+    for turn, (wanted, got) in enumerate(zip_longest(expected, outputs)):
+        if wanted is None or wanted == got:
+            continue
+        got = got if got is not None else []
+        for wanted_line, got_line in zip_longest(wanted, got):
+            if wanted_line != got_line:
+                found.append((turn, wanted_line, got_line))
+                break
+    return found
+
+
+def replay(transcript, think=0.0):
+    # Replay one transcript: returns (latencies, differences, error message or None)
+    io = ReplayIO(transcript, think)
+    tutor = LogicProofTutor(auto_justify=transcript.get('auto_justify', False), io=io,
+                            accept_equivalent=transcript.get('accept_equivalent', False))
+    error = None
+    try:
+        tutor.start_tutor()
+    except EOFError:
+        pass
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    io.finish()
+    return io.latencies, differences(transcript, io.outputs), error
+
+
+def run_level(transcripts, sessions, think=0.0):
+    # Replay with `sessions` sessions running at once, one thread each as in TutorServer. Every
+    # thread replays all the transcripts, starting at a different one so the threads are not
+    # all at the same point of the same transcript. Returns ([(id, replay result), ...], seconds).
+    results = []
+
+    def session_thread(offset):
+        for index in range(len(transcripts)):
+            transcript = transcripts[(offset + index) % len(transcripts)]
+            results.append((transcript['id'], replay(transcript, think)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix='replay-session') as executor:
+        for future in [executor.submit(session_thread, offset) for offset in range(sessions)]:
+            future.result()
+    return results, time.perf_counter() - start
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of sorted values
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def summarise(seconds):
+    ordered = sorted(seconds)
+    summary = {'count': len(ordered)}
+    for fraction in PERCENTILES:
+        summary[f"p{fraction * 100:g}"] = percentile(ordered, fraction)
+    summary['max'] = ordered[-1] if ordered else 0.0
+    return summary
+
+
+def level_report(sessions, results, elapsed):
+    latencies = [latency for _, (session_latencies, _, _) in results for latency in session_latencies]
+    kinds = {}
+    for kind, seconds in latencies:
+        kinds.setdefault(kind, []).append(seconds)
+    return {
+        'sessions': sessions,
+        'replayed': len(results),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency': summarise([seconds for _, seconds in latencies]),
+        'by_kind': {kind: summarise(values) for kind, values in sorted(kinds.items())},
+        'differences': [[transcript_id, turn, wanted, got]
+                        for transcript_id, (_, found, _) in results for turn, wanted, got in found],
+        'errors': [[transcript_id, error] for transcript_id, (_, _, error) in results if error is not None],
+    }
+
+
+def format_latency(summary):
+    return "  ".join(f"{name} {summary[name] * 1e3:8.2f} ms" for name in summary if name != 'count')
+
+
+def print_level(report, by_kind=False, output=sys.stdout):
+    print(f"sessions={report['sessions']:<5} {report['latency']['count']:7d} interactions  "
+          f"{report['throughput']:9.1f}/s  {format_latency(report['latency'])}", file=output)
+    if by_kind:
+        width = max((len(kind) for kind in report['by_kind']), default=0)
+        for kind, summary in report['by_kind'].items():
+            print(f"    {kind:<{width}} {summary['count']:7d}  {format_latency(summary)}", file=output)
+
+
+def parse_levels(text):
+    # "1,8,4" -> (1, 4, 8); levels run from fewest sessions up
+    try:
+        levels = tuple(sorted({int(part) for part in text.split(',')}))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated session counts, got {text!r}")
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("session counts must be at least 1")
+    return levels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded tutor sessions, check their output and measure response latency under load.")
+    parser.add_argument("inputs", nargs="*", help="JSON-lines transcript files ('-' or nothing reads stdin).")
+    parser.add_argument("--record", metavar="PATH", help="Run an interactive session and append its transcript to PATH instead of replaying.")
+    parser.add_argument("--id", help="Identifier stored with a recorded transcript.")
+    parser.add_argument("--auto-justify", action="store_true", help="Record with auto-justify on.")
+    parser.add_argument("--accept-equivalent", action="store_true", help="Record with equivalent conclusions accepted.")
+    parser.add_argument("--sessions", type=parse_levels, default=(1,), help="Sessions run at once, or a comma-separated sweep such as 1,4,16,64.")
+    parser.add_argument("--think", type=float, default=0.0, help="Seconds each simulated student waits before answering.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="p99 latency in seconds a level must stay under (default: %(default)s).")
+    parser.add_argument("--by-kind", action="store_true", help="Also break latencies down by kind of interaction.")
+    parser.add_argument("--rules", help="JSON rule set adding, replacing or removing rules (see ruleSchemas.py).")
+    parser.add_argument("-o", "--output", help="Also write the report here as JSON.")
+    args = parser.parse_args(argv)
+
+    if args.rules:
+        try:
+            install_rules(load_rule_set(args.rules))
+        except (OSError, RuleSchemaError) as e:
+            parser.error(f"cannot use the rule set: {e}")
+
+    if args.record:
+        if args.inputs:
+            parser.error("--record takes no transcript files")
+        transcript = record_session(args.record, args.id, args.auto_justify, args.accept_equivalent)
+        print(f"Recorded {len(transcript['turns'])} answers to {args.record}.", file=sys.stderr)
+        return 0
+
+    try:
+        transcripts = read_transcripts(args.inputs)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot read the transcripts: {e}")
+    if not transcripts:
+        parser.error("no transcripts to replay")
+
+    # An untimed pass first, so every level meets the same warm caches (parsed formulas, rule
+    # verdicts, proofs for hints) that a server which has been running for a while has
+    warm_up = level_report(1, *run_level(transcripts, 1))
+    reports = []
+    capacity = 0
+    for sessions in args.sessions:
+        results, elapsed = run_level(transcripts, sessions, args.think)
+        report = level_report(sessions, results, elapsed)
+        reports.append(report)
+        print_level(report, args.by_kind)
+        if report['latency']['p99'] > args.budget:
+            break  # more sessions only get slower
+        capacity = sessions
+
+    # Every replay counts, but a transcript that fails the same way at every level is shown once
+    problems = []
+    for report in [warm_up] + reports:
+        problems += [f"{transcript_id}: replay failed with {error}" for transcript_id, error in report['errors']]
+        problems += [f"{transcript_id}: turn {turn} expected {wanted!r}, got {got!r}"
+                     for transcript_id, turn, wanted, got in report['differences']]
+    for problem in list(dict.fromkeys(problems))[:MAX_REPORTED]:
+        print(problem)
+
+    tested = ", ".join(str(report['sessions']) for report in reports)
+    if capacity == 0:
+        print(f"p99 latency is over {args.budget * 1e3:g} ms even at {args.sessions[0]} session(s) at once.")
+    elif len(args.sessions) > 1:
+        print(f"Up to {capacity} session(s) at once keep p99 latency under {args.budget * 1e3:g} ms (tried {tested}).")
+    if problems:
+        print(f"{len(problems)} replay(s) or turn(s) did not match their transcripts.")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(), 'think': args.think,
+                       'budget': args.budget, 'capacity': capacity, 'levels': reports}, handle, indent=2, ensure_ascii=False)
+            handle.write("\n")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
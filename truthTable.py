@@ -0,0 +1,145 @@
+from formula import VAR, NOT, AND, OR, IMPLIES, XOR, IFF, as_formula
+
+
+# Above this many variables a table has too many rows to build interactively
+MAX_VARIABLES = 24
+
+
+def variables_of(formulas):
+    # Variable names in order of first appearance, scanning the formulas left to right
+    names = []
+    seen = set()
+    visited = set()
+    for formula in formulas:
+        stack = [as_formula(formula)]
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            if node.op == VAR:
+                if node.name not in seen:
+                    seen.add(node.name)
+                    names.append(node.name)
+            else:
+                stack.extend(reversed(node.args))
+    return names
+
+
+def variable_mask(index, count):
+    # Packed column of truth values for variable `index` of `count`: bit r is set when the
+    # variable is true in row r. The first variable is the most significant bit of the row number.
+    block = 1 << (count - 1 - index)  # run length of equal values in this column
+    rows = 1 << count
+    pattern = ((1 << block) - 1) << block  # one false run followed by one true run
+    period = block * 2
+    # Double the pattern until it covers every row
+    while period < rows:
+        pattern |= pattern << period
+        period *= 2
+    return pattern
+
+
+class TruthTable:
+    # Evaluates formulas over all 2^n assignments at once. Each formula compiles to one
+    # packed integer with a bit per row, so every connective is a single bitwise operation.
+    def __init__(self, formulas, variables=None):
+        formulas = [as_formula(formula) for formula in formulas]
+        self.variables = list(variables) if variables is not None else variables_of(formulas)
+        if len(self.variables) > MAX_VARIABLES:
+            raise ValueError(f"Truth tables support at most {MAX_VARIABLES} variables, got {len(self.variables)}.")
+        count = len(self.variables)
+        self.rows = 1 << count
+        self.full = (1 << self.rows) - 1
+        self.masks = {name: variable_mask(index, count) for index, name in enumerate(self.variables)}
+        # Column of every formula compiled so far; shared sub-formulas are only computed once
+        self.columns = {}
+
+    def column(self, formula):
+        # Packed truth values of a formula (bit r is its value in row r)
+        root = as_formula(formula)
+        columns = self.columns
+        full = self.full
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if node in columns:
+                stack.pop()
+                continue
+            if node.op == VAR:
+                if node.name not in self.masks:
+                    raise ValueError(f"Variable {node.name} is not part of this truth table.")
+                columns[node] = self.masks[node.name]
+                stack.pop()
+                continue
+            pending = [child for child in node.args if child not in columns]
+            if pending:
+                stack.extend(pending)
+                continue
+            if node.op == NOT:
+                value = full ^ columns[node.args[0]]
+            else:
+                left = columns[node.args[0]]
+                right = columns[node.args[1]]
+                if node.op == AND:
+                    value = left & right
+                elif node.op == OR:
+                    value = left | right
+                elif node.op == IMPLIES:
+                    value = (full ^ left) | right
+                elif node.op == XOR:
+                    value = left ^ right
+                elif node.op == IFF:
+                    value = full ^ (left ^ right)
+                else:
+                    raise ValueError(f"Unknown connective {node.op}.")
+            columns[node] = value
+            stack.pop()
+        return columns[root]
+
+    def assignment(self, row):
+        # Variable values in a given row
+        count = len(self.variables)
+        return {name: bool((row >> (count - 1 - index)) & 1) for index, name in enumerate(self.variables)}
+
+    def entails(self, premises, conclusion):
+        # Return (True, None) if every row satisfying the premises satisfies the conclusion,
+        # otherwise (False, assignment) with a counterexample row
+        satisfied = self.full
+        for premise in premises:
+            satisfied &= self.column(premise)
+        counterexamples = satisfied & ~self.column(conclusion)
+        if not counterexamples:
+            return True, None
+        # Report the counterexample nearest the top of the printed table
+        return False, self.assignment(counterexamples.bit_length() - 1)
+
+    def equivalent(self, first, second):
+        return self.column(first) == self.column(second)
+
+    def render(self, formulas, max_rows=64):
+        # Compact table as text lines, rows listed from all-true to all-false like a textbook table
+        formulas = [as_formula(formula) for formula in formulas]
+        headers = list(self.variables) + [str(formula) for formula in formulas]
+        columns = [self.masks[name] for name in self.variables] + [self.column(formula) for formula in formulas]
+        widths = [max(len(header), 1) for header in headers]
+        lines = [" | ".join(header.center(width) for header, width in zip(headers, widths)).rstrip()]
+        lines.append("-+-".join("-" * width for width in widths))
+        shown = min(self.rows, max_rows)
+        for row in range(self.rows - 1, self.rows - 1 - shown, -1):
+            cells = ["T" if (column >> row) & 1 else "F" for column in columns]
+            lines.append(" | ".join(cell.center(width) for cell, width in zip(cells, widths)).rstrip())
+        if shown < self.rows:
+            lines.append(f"... {self.rows - shown} more rows")
+        return lines
+
+
+def entails(premises, conclusion):
+    # Convenience check: do the premises semantically entail the conclusion?
+    premises = [as_formula(premise) for premise in premises]
+    conclusion = as_formula(conclusion)
+    return TruthTable(premises + [conclusion]).entails(premises, conclusion)
+
+
+def format_assignment(assignment):
+    return ", ".join(f"{name} = {'T' if value else 'F'}" for name, value in assignment.items())
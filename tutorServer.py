@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import queue
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from logicTutor import LogicProofTutor
+from metrics import instrumented
+from proofRules import install_rules
+from ruleSchemas import RuleSchemaError, load_rule_set
+
+
+# Line protocol: every prompt and every message from the tutor is sent as one or more
+# UTF-8 lines ending in "\n"; each line the client sends answers the pending prompt.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Sessions hosted at once; each running session holds one worker thread
+DEFAULT_MAX_SESSIONS = 500
+# Seconds a session may wait for an answer before it is closed
+DEFAULT_IDLE_TIMEOUT = 1800
+# Lines a client may send ahead of its session; beyond this the socket is not read until the
+# session catches up, so a client sending faster than it is served cannot fill the server's memory
+MAX_PENDING_LINES = 64
+# Seconds between retries while a session's line queue is full
+QUEUE_RETRY_INTERVAL = 0.01
+
+
+class StreamIO:
+    # Front end for one network session. The tutor runs in a worker thread and blocks in ask()
+    # until the event loop hands over the student's next line. Output is passed back to the
+    # loop, so only the event loop thread ever touches the socket.
+    def __init__(self, loop, writer, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.loop = loop
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+        self.lines = queue.Queue(maxsize=MAX_PENDING_LINES)  # lines from the client; None once it has gone
+
+    def send(self, text):
+        self.loop.call_soon_threadsafe(self.writer.write, (text + "\n").encode('utf-8'))
+
+    def show(self, text):
+        self.send(text)
+
+    @instrumented('user_wait', "Waiting for the student's answer", ('front_end', 'stream'))
+    def ask(self, prompt):
+        # Same contract as input(): EOFError once the client has disconnected or gone idle
+        self.send(prompt)
+        try:
+            line = self.lines.get(timeout=self.idle_timeout)
+        except queue.Empty:
+            self.send("Session closed after being idle.")
+            raise EOFError("Session idle timeout.")
+        if line is None:
+            raise EOFError("Client disconnected.")
+        return line
+
+
+class TutorServer:
+    # Hosts many independent tutor sessions in one process. The asyncio event loop only moves
+    # lines between sockets and sessions; each session's logic, including rule checks and
+    # hint searches, runs in the worker pool, so a slow step in one session never holds up
+    # reading and writing for the others.
+    # With metrics_path, the hot paths of every session are timed (see metrics.py) and the
+    # totals are written to that file each time a session ends. With events_path, every
+    # session appends its learner events (see learnerAnalytics.py) to that file.
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, auto_justify=False, idle_timeout=DEFAULT_IDLE_TIMEOUT, metrics_path=None,
+                 events_path=None):
+        self.max_sessions = max_sessions
+        self.auto_justify = auto_justify
+        self.idle_timeout = idle_timeout
+        self.metrics_path = metrics_path
+        self.metrics = None
+        if metrics_path:
+            import metrics
+            self.metrics = metrics.enable()
+        self.events = None
+        if events_path:
+            from learnerAnalytics import EventLog
+            self.events = EventLog(events_path)
+        self.executor = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix='tutor-session')
+        self.active = 0
+        self.served = 0
+
+    def run_session(self, io):
+        # Worker thread: one complete tutor session
+        try:
+            LogicProofTutor(auto_justify=self.auto_justify, io=io, events=self.events).start_tutor()
+        except EOFError:
+            pass  # the client left or went idle
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            io.show("The tutor hit an internal error and has to close this session.")
+        finally:
+            if self.metrics is not None:
+                try:
+                    self.metrics.write(self.metrics_path)
+                except OSError:
+                    traceback.print_exc(file=sys.stderr)
+
+    async def handle(self, reader, writer):
+        if self.active >= self.max_sessions:
+            writer.write("The tutor is full. Please try again later.\n".encode('utf-8'))
+            await writer.drain()
+            writer.close()
+            return
+
+        loop = asyncio.get_running_loop()
+        self.active += 1
+        self.served += 1
+        io = StreamIO(loop, writer, self.idle_timeout)
+        session = loop.run_in_executor(self.executor, self.run_session, io)
+        try:
+            while True:
+                read = asyncio.ensure_future(reader.readline())
+                done, _ = await asyncio.wait({read, session}, return_when=asyncio.FIRST_COMPLETED)
+                if read not in done:
+                    read.cancel()
+                    break  # the session finished
+                data = read.result()
+                if not data:
+                    break  # the client closed the connection
+                await self.hand_over(io, data.decode('utf-8', errors='replace').rstrip('\r\n'), session)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await self.hand_over(io, None, session)  # release a session still waiting for input
+            await asyncio.wait({session})
+            self.active -= 1
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def hand_over(self, io, line, session):
+        # Queue a line for the session without blocking the event loop. While the queue is full
+        # the socket is not read, so TCP flow control slows the client down.
+        while not session.done():
+            try:
+                io.lines.put_nowait(line)
+                return
+            except queue.Full:
+                await asyncio.sleep(QUEUE_RETRY_INTERVAL)
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        # Serve until cancelled; ready (an asyncio.Event) is set once the socket is listening
+        server = await asyncio.start_server(self.handle, host, port)
+        self.sockets = server.sockets
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if self.events is not None:
+                self.events.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many Logic and Proof Tutor sessions over a TCP line protocol.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on (default: %(default)s).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on (default: %(default)s).")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS, help="Sessions hosted at once.")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT, help="Seconds before an idle session is closed.")
+    parser.add_argument("--auto-justify", action="store_true", help="Find the rule and line references when RuleApplied is left empty.")
+    parser.add_argument("--metrics", help="Time the sessions' hot paths and write the totals here after each session (.json for JSON, otherwise Prometheus text).")
+    parser.add_argument("--rules", help="JSON rule set adding, replacing or removing rules (see ruleSchemas.py).")
+    parser.add_argument("--events", help="Append every session's learner events to this file (see learnerAnalytics.py).")
+    args = parser.parse_args(argv)
+
+    if args.rules:
+        try:
+            install_rules(load_rule_set(args.rules))
+        except (OSError, RuleSchemaError) as e:
+            parser.error(f"cannot use the rule set: {e}")
+
+    server = TutorServer(args.max_sessions, args.auto_justify, args.idle_timeout, args.metrics, args.events)
+    print(f"Serving tutor sessions on {args.host}:{args.port} (up to {args.max_sessions} at once).", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())